@@ -16,7 +16,7 @@ export default function TestConnection() {
     try {
       // Test 1: List documents
       console.log("Testing: List documents")
-      const documents = await apiService.listDocuments()
+      const { documents } = await apiService.listDocuments()
       results.documents = documents
       console.log("✅ Documents listed:", documents)
     } catch (error) {
@@ -15,6 +15,21 @@ export interface DocumentResults {
   plagiarismScore?: number;
 }
 
+export interface DocumentListOptions {
+  cursor?: string;
+  limit?: number;
+  fields?: string[];
+  fileType?: string;
+  processed?: boolean;
+  uploadedAfter?: string;
+  uploadedBefore?: string;
+}
+
+export interface DocumentPage {
+  documents: DocumentResults[];
+  nextCursor: string | null;
+}
+
 export interface Summary {
   id: string;
   content: string;
@@ -59,6 +74,87 @@ export interface Analytics {
   updated_at: string;
 }
 
+export interface AnalyticsPoint {
+  bucket: string;
+  count: number;
+  total: number; // seconds for stage.* metrics, tokens for llm.* metrics
+}
+
+export interface AnalyticsTimeseries {
+  granularity: 'hour' | 'day';
+  start: string;
+  end: string;
+  series: Record<string, AnalyticsPoint[]>;
+}
+
+export interface SearchResult {
+  kind: 'document' | 'summary' | 'citation';
+  id: string;
+  document_id: string;
+  document_name: string;
+  snippet: string; // HTML-escaped, matches wrapped in <mark>
+  score: number;
+}
+
+export interface SearchPage {
+  results: SearchResult[];
+  page: number;
+  has_more: boolean;
+}
+
+export interface SimilarDocuments {
+  document_id: string;
+  method: 'exact' | 'ivf';
+  results: Array<{ document_id: string; name: string; score: number }>;
+}
+
+export interface DocumentAnswer {
+  document_id: string;
+  question: string;
+  answer: string;
+  passages: Array<{ position: number; text: string; score: number }>;
+  fallback: boolean;
+}
+
+export interface Job {
+  id: string;
+  kind: string;
+  document: string | null;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  params: Record<string, unknown>;
+  stages: Record<string, { status: string; started_at?: string; finished_at?: string; result?: Record<string, unknown> }>;
+  progress: { total: number; pending: number; running: number; completed: number; failed: number };
+  result: Record<string, unknown>;
+  error: string;
+  attempts: number;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+export type DocumentEventType =
+  | 'job-queued'
+  | 'job-started'
+  | 'stage-started'
+  | 'stage-finished'
+  | 'partial-result'
+  | 'job-finished';
+
+export interface DocumentEvent {
+  id: number;
+  type: DocumentEventType;
+  stage?: string;
+  job_id?: string;
+  created_at: string;
+  // Stage info, or the stored output for partial-result events
+  // (summary, citations, plagiarism_check, conference_suggestions)
+  [key: string]: unknown;
+}
+
+const DOCUMENT_EVENT_TYPES: DocumentEventType[] = [
+  'job-queued', 'job-started', 'stage-started', 'stage-finished', 'partial-result', 'job-finished',
+];
+
 const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
 class ApiService {
@@ -102,13 +198,29 @@ class ApiService {
     };
   }
 
-  async listDocuments(): Promise<DocumentResults[]> {
-    const documents = await this.request<DocumentResults[]>('/documents/');
+  async listDocuments(options: DocumentListOptions = {}): Promise<DocumentPage> {
+    // One keyset-paginated page; pass nextCursor back as `cursor` for the next one
+    const query = new URLSearchParams();
+    if (options.cursor) query.set('cursor', options.cursor);
+    if (options.limit) query.set('limit', String(options.limit));
+    if (options.fields) query.set('fields', options.fields.join(','));
+    if (options.fileType) query.set('file_type', options.fileType);
+    if (options.processed !== undefined) query.set('processed', String(options.processed));
+    if (options.uploadedAfter) query.set('uploaded_after', options.uploadedAfter);
+    if (options.uploadedBefore) query.set('uploaded_before', options.uploadedBefore);
+
+    const queryString = query.toString();
+    const page = await this.request<{ results: DocumentResults[]; next_cursor: string | null }>(
+      `/documents/${queryString ? `?${queryString}` : ''}`
+    );
     // Transform the response to match frontend expectations
-    return documents.map(doc => ({
-      ...doc,
-      uploadedAt: doc.uploaded_at // Add uploadedAt for frontend compatibility
-    }));
+    return {
+      documents: page.results.map(doc => ({
+        ...doc,
+        uploadedAt: doc.uploaded_at // Add uploadedAt for frontend compatibility
+      })),
+      nextCursor: page.next_cursor,
+    };
   }
 
   async getDocumentResults(documentId: string): Promise<{ document: DocumentResults }> {
@@ -122,6 +234,32 @@ class ApiService {
     };
   }
 
+  async getDocumentResultsBulk(
+    documentIds: string[],
+    include?: Array<'summaries' | 'citations' | 'plagiarism_checks' | 'conference_suggestions' | 'plagiarismScore'>
+  ): Promise<{ results: DocumentResults[]; missing: string[] }> {
+    const params = new URLSearchParams({ ids: documentIds.join(',') });
+    if (include?.length) {
+      params.set('include', include.join(','));
+    }
+    const response = await this.request<{ results: DocumentResults[]; missing: string[] }>(`/documents/results/?${params}`);
+    return {
+      ...response,
+      results: response.results.map((document) => ({ ...document, uploadedAt: document.uploaded_at })),
+    };
+  }
+
+  async getSimilarDocuments(documentId: string, k: number = 10): Promise<SimilarDocuments> {
+    return this.request<SimilarDocuments>(`/documents/${documentId}/similar/?k=${k}`);
+  }
+
+  async askDocument(documentId: string, question: string, topK?: number): Promise<DocumentAnswer> {
+    return this.request<DocumentAnswer>(`/documents/${documentId}/ask/`, {
+      method: 'POST',
+      body: JSON.stringify(topK === undefined ? { question } : { question, top_k: topK }),
+    });
+  }
+
   async generateSummary(documentId: string, maxWords: number = 200): Promise<Summary> {
     return this.request<Summary>(`/documents/${documentId}/summary/`, {
       method: 'POST',
@@ -129,12 +267,76 @@ class ApiService {
     });
   }
 
-  async analyzeDocument(documentId: string): Promise<{ message: string; processing_time: number }> {
-    return this.request<{ message: string; processing_time: number }>(`/documents/${documentId}/analyze/`, {
+  async analyzeDocument(documentId: string, onEvent?: (event: DocumentEvent) => void): Promise<Job> {
+    // Analysis runs in a background worker; follow its progress events until it
+    // finishes, falling back to polling the job if the stream is unavailable
+    const queued = await this.request<{ job_id: string }>(`/documents/${documentId}/analyze/`, {
+      method: 'POST',
+    });
+    try {
+      await this.watchDocumentEvents(documentId, onEvent ?? (() => {}), queued.job_id);
+    } catch (error) {
+      console.warn('Event stream unavailable, polling job status', error);
+    }
+    return this.waitForJob(queued.job_id);
+  }
+
+  watchDocumentEvents(documentId: string, onEvent: (event: DocumentEvent) => void, jobId?: string): Promise<void> {
+    // Resolves when the server ends the stream (no active job left); the
+    // browser reconnects with Last-Event-ID if the connection drops
+    const query = jobId ? `?job=${jobId}` : '';
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${API_BASE_URL}/documents/${documentId}/events/${query}`);
+      let received = false;
+      for (const type of DOCUMENT_EVENT_TYPES) {
+        source.addEventListener(type, (message) => {
+          received = true;
+          const data = JSON.parse((message as MessageEvent).data);
+          onEvent({ ...data, id: Number((message as MessageEvent).lastEventId), type });
+        });
+      }
+      source.addEventListener('end', () => {
+        source.close();
+        resolve();
+      });
+      source.onerror = () => {
+        // CLOSED means the browser gave up reconnecting
+        if (source.readyState === EventSource.CLOSED) {
+          if (received) {
+            resolve();
+          } else {
+            reject(new Error('Event stream failed'));
+          }
+        }
+      };
+    });
+  }
+
+  async analyzeBatch(documentIds: string[]): Promise<{ batch_id: string; total: number; status_url: string }> {
+    // One background job for all documents; follow it with getJob/waitForJob
+    return this.request(`/documents/analyze-batch/`, {
       method: 'POST',
+      body: JSON.stringify({ document_ids: documentIds }),
     });
   }
 
+  async getJob(jobId: string): Promise<Job> {
+    return this.request<Job>(`/jobs/${jobId}/`);
+  }
+
+  async waitForJob(jobId: string, intervalMs: number = 1000): Promise<Job> {
+    for (;;) {
+      const job = await this.getJob(jobId);
+      if (job.status === 'completed') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw new Error(`Job ${jobId} failed: ${job.error}`);
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  }
+
 
 
   async getCitations(documentId: string): Promise<Citation[]> {
@@ -153,6 +355,28 @@ class ApiService {
     return this.request<Analytics>('/analytics/');
   }
 
+  async getAnalyticsTimeseries(
+    granularity: 'hour' | 'day' = 'hour',
+    options: { metrics?: string[]; start?: string; end?: string } = {}
+  ): Promise<AnalyticsTimeseries> {
+    const params = new URLSearchParams({ granularity });
+    if (options.metrics?.length) params.set('metrics', options.metrics.join(','));
+    if (options.start) params.set('start', options.start);
+    if (options.end) params.set('end', options.end);
+    return this.request<AnalyticsTimeseries>(`/analytics/timeseries/?${params}`);
+  }
+
+  async search(
+    query: string,
+    options: { kinds?: SearchResult['kind'][]; page?: number; pageSize?: number } = {}
+  ): Promise<SearchPage> {
+    const params = new URLSearchParams({ q: query });
+    if (options.kinds?.length) params.set('kind', options.kinds.join(','));
+    if (options.page) params.set('page', String(options.page));
+    if (options.pageSize) params.set('page_size', String(options.pageSize));
+    return this.request<SearchPage>(`/search/?${params}`);
+  }
+
   async exportDocument(documentId: string): Promise<Blob> {
     const response = await fetch(`${API_BASE_URL}/documents/${documentId}/export/`, {
       method: 'GET',
@@ -165,6 +389,39 @@ class ApiService {
     return response.blob();
   }
 
+  async exportDocumentsBulk(
+    documentIds: string[]
+  ): Promise<{ job_id: string; total: number; status_url: string; download_url: string }> {
+    // Reports are rendered by a background job; waitForJob, then downloadExport
+    return this.request(`/documents/export-batch/`, {
+      method: 'POST',
+      body: JSON.stringify({ document_ids: documentIds }),
+    });
+  }
+
+  async downloadExport(jobId: string): Promise<Blob> {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}/download/`, {
+      method: 'GET',
+    });
+
+    if (!response.ok) {
+      throw new Error(`Download failed: ${response.status} ${response.statusText}`);
+    }
+
+    return response.blob();
+  }
+
+  resultsExportUrl(
+    dataset: 'documents' | 'summaries' | 'citations' | 'plagiarism' | 'conferences',
+    format: 'jsonl' | 'csv' | 'parquet' = 'jsonl',
+    documentId?: string
+  ): string {
+    // Streamed by the server; link to it rather than buffering the whole table in a Blob
+    const params = new URLSearchParams({ format });
+    if (documentId) params.set('document', documentId);
+    return `${API_BASE_URL}/export/${dataset}/?${params}`;
+  }
+
   async healthCheck(): Promise<{ status: string; timestamp: string }> {
     return this.request<{ status: string; timestamp: string }>('/health/');
   }
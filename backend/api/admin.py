@@ -1,5 +1,18 @@
 from django.contrib import admin
-from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics
+from . import search
+from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics, AnalyticsRollup, Job, StageCacheEntry, DocumentResultsSnapshot, AnalysisEvent, DocumentContent, DocumentVector, PassageIndex, SearchEntry, MediaBlob
+
+
+class FullTextSearchMixin:
+    """Match the admin search box against the full-text index (``search.py``)
+    instead of an icontains scan of the text column"""
+    search_kind = None
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            results |= queryset.filter(pk__in=search.matching(self.search_kind, search_term))
+        return results, may_have_duplicates
 
 
 @admin.register(Document)
@@ -12,19 +25,21 @@ class DocumentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Summary)
-class SummaryAdmin(admin.ModelAdmin):
+class SummaryAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['document', 'word_count', 'generated_at']
     list_filter = ['generated_at']
-    search_fields = ['document__name', 'content']
+    search_fields = ['document__name']
+    search_kind = 'summary'
     readonly_fields = ['id', 'generated_at']
     ordering = ['-generated_at']
 
 
 @admin.register(Citation)
-class CitationAdmin(admin.ModelAdmin):
+class CitationAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['document', 'text', 'source', 'confidence', 'detected_at']
     list_filter = ['confidence', 'detected_at']
-    search_fields = ['document__name', 'text', 'source']
+    search_fields = ['document__name', 'source']
+    search_kind = 'citation'
     readonly_fields = ['id', 'detected_at']
     ordering = ['-detected_at']
 
@@ -56,3 +71,88 @@ class AnalyticsAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # Only allow one analytics record
         return not Analytics.objects.exists()
+
+
+@admin.register(AnalyticsRollup)
+class AnalyticsRollupAdmin(admin.ModelAdmin):
+    list_display = ['metric', 'granularity', 'bucket', 'count', 'total']
+    list_filter = ['granularity', 'metric']
+    ordering = ['-bucket']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'document', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['id', 'created_at', 'started_at', 'finished_at']
+    ordering = ['-created_at']
+
+
+@admin.register(StageCacheEntry)
+class StageCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['stage', 'version', 'key', 'created_at']
+    list_filter = ['stage', 'version']
+    search_fields = ['key']
+    readonly_fields = ['id', 'key', 'created_at']
+    ordering = ['-created_at']
+
+
+@admin.register(DocumentResultsSnapshot)
+class DocumentResultsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['document', 'version', 'stale', 'rendered_at']
+    list_filter = ['stale']
+    readonly_fields = ['document', 'content', 'version', 'rendered_at']
+    ordering = ['-rendered_at']
+
+
+@admin.register(AnalysisEvent)
+class AnalysisEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'event', 'stage', 'created_at']
+    list_filter = ['event', 'stage']
+    readonly_fields = ['id', 'created_at']
+    ordering = ['-id']
+
+
+@admin.register(DocumentContent)
+class DocumentContentAdmin(admin.ModelAdmin):
+    list_display = ['document', 'text_sha256', 'extracted_at']
+    readonly_fields = ['document', 'text_sha256', 'extracted_at']
+    ordering = ['-extracted_at']
+
+
+@admin.register(DocumentVector)
+class DocumentVectorAdmin(admin.ModelAdmin):
+    list_display = ['document', 'version', 'updated_at']
+    list_filter = ['version']
+    readonly_fields = ['document', 'vector', 'version', 'text_sha256', 'updated_at']
+    ordering = ['-updated_at']
+
+
+@admin.register(PassageIndex)
+class PassageIndexAdmin(admin.ModelAdmin):
+    list_display = ['document', 'version', 'built_at']
+    list_filter = ['version']
+    # The postings can be large: keep them off the change form
+    exclude = ['postings']
+    readonly_fields = ['document', 'version', 'text_sha256', 'passages', 'lengths', 'built_at']
+    ordering = ['-built_at']
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'extension', 'codec', 'size', 'stored_size', 'references', 'created_at']
+    list_filter = ['extension', 'codec']
+    search_fields = ['sha256']
+    # Maintained by the media store; edits would desynchronise the files
+    readonly_fields = [
+        'name', 'sha256', 'extension', 'codec', 'size', 'stored_size', 'references', 'created_at', 'referenced_at'
+    ]
+    ordering = ['-created_at']
+
+
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'object_id', 'document']
+    list_filter = ['kind']
+    readonly_fields = ['id', 'kind', 'object_id', 'document', 'body']
+    ordering = ['-id']
@@ -0,0 +1,368 @@
+"""
+Admission control for expensive endpoints.
+
+Each scope (summary, analyze, export, ...) allows a fixed number of requests
+to run at once and a bounded number to wait for a slot. Anything beyond that
+is rejected straight away with 429, and a waiter that times out gets 503;
+both carry a Retry-After header.
+
+A request is admitted in two steps. It first waits for a slot of this
+process's limiter, a semaphore with a bounded queue (``queue`` applies per
+process); waiting costs no database queries. It then takes one of the
+scope's ``concurrency`` ``AdmissionSlot`` rows with a conditional UPDATE
+like job claims, which holds the limit across all server processes
+(gunicorn or uvicorn workers, several hosts on one database). When other
+processes hold every row, it retries every GLOBAL_POLL_INTERVAL seconds
+until its timeout.
+
+Rows are leased for ADMISSION_LEASE_SECONDS, and a background thread
+renews the leases of the requests this process is running, so a long
+request keeps its slot and one held by a process that died is free again
+once its lease runs out. A database error while admitting answers 503
+rather than failing the request.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import AdmissionSlot
+
+
+# Seconds between an async waiter's checks for a slot of this process
+POLL_INTERVAL = 0.05
+
+# Seconds between attempts to take a slot held by other processes
+GLOBAL_POLL_INTERVAL = 0.5
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded wait queue, shared by all processes.
+
+    ``acquire`` returns a lease to hand back to ``release``.
+    """
+
+    def __init__(self, name, concurrency, queue=0, timeout=0.0, retry_after=5):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.rejected_unavailable = 0
+        self._condition = threading.Condition()
+
+    def _count(self, counter):
+        with self._condition:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _enter(self, deadline):
+        """Wait for a slot of this process, returns None or the rejection status"""
+        with self._condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                return None
+            if self.waiting >= self.queue:
+                self.rejected_queue_full += 1
+                return status.HTTP_429_TOO_MANY_REQUESTS
+
+            self.waiting += 1
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return status.HTTP_503_SERVICE_UNAVAILABLE
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return None
+
+    async def _aenter(self, deadline):
+        """Async variant of ``_enter`` that waits without blocking the event loop"""
+        with self._condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                return None
+            if self.waiting >= self.queue:
+                self.rejected_queue_full += 1
+                return status.HTTP_429_TOO_MANY_REQUESTS
+            self.waiting += 1
+
+        try:
+            while True:
+                await asyncio.sleep(POLL_INTERVAL)
+                with self._condition:
+                    if self.active < self.concurrency:
+                        self.active += 1
+                        return None
+                    if time.monotonic() >= deadline:
+                        self.rejected_timeout += 1
+                        return status.HTTP_503_SERVICE_UNAVAILABLE
+        finally:
+            with self._condition:
+                self.waiting -= 1
+
+    def _leave(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def _slots(self):
+        return AdmissionSlot.objects.filter(scope=self.name, slot__lt=self.concurrency)
+
+    def _take(self):
+        """Take a free slot row, returns the lease ``(slot, holder)`` or None when all are held"""
+        holder = uuid.uuid4().hex
+        now = timezone.now()
+        slots = self._slots()
+        free = slots.filter(Q(holder='') | Q(expires_at__lt=now))
+        candidates = list(free.values_list('slot', flat=True))
+        if not candidates and slots.count() < self.concurrency:
+            # First use of the scope (or its concurrency was raised)
+            AdmissionSlot.objects.bulk_create(
+                [AdmissionSlot(scope=self.name, slot=slot) for slot in range(self.concurrency)],
+                ignore_conflicts=True
+            )
+            candidates = list(free.values_list('slot', flat=True))
+        expires_at = now + timedelta(seconds=settings.ADMISSION_LEASE_SECONDS)
+        for slot in candidates:
+            # Another process may take the slot between the read and here
+            if free.filter(slot=slot).update(holder=holder, expires_at=expires_at):
+                return slot, holder
+        return None
+
+    def _admitted(self, lease):
+        self._count('admitted')
+        _renewer.hold(lease)
+        return lease, None
+
+    def acquire(self):
+        """Wait for a slot, returns ``(lease, None)`` when admitted or
+        ``(None, status code)`` when rejected. Database errors are raised."""
+        deadline = time.monotonic() + self.timeout
+        rejected = self._enter(deadline)
+        if rejected:
+            return None, rejected
+
+        lease = None
+        try:
+            lease = self._take()
+            while lease is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count('rejected_timeout')
+                    return None, status.HTTP_503_SERVICE_UNAVAILABLE
+                time.sleep(min(GLOBAL_POLL_INTERVAL, remaining))
+                lease = self._take()
+        except DatabaseError:
+            self._count('rejected_unavailable')
+            raise
+        finally:
+            if lease is None:
+                self._leave()
+        return self._admitted(lease)
+
+    async def aacquire(self):
+        """Async variant of ``acquire``"""
+        deadline = time.monotonic() + self.timeout
+        rejected = await self._aenter(deadline)
+        if rejected:
+            return None, rejected
+
+        take = sync_to_async(self._take)
+        lease = None
+        try:
+            lease = await take()
+            while lease is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count('rejected_timeout')
+                    return None, status.HTTP_503_SERVICE_UNAVAILABLE
+                await asyncio.sleep(min(GLOBAL_POLL_INTERVAL, remaining))
+                lease = await take()
+        except DatabaseError:
+            self._count('rejected_unavailable')
+            raise
+        finally:
+            if lease is None:
+                self._leave()
+        return self._admitted(lease)
+
+    def release(self, lease):
+        """Free an admitted request's slot. A database error leaves the row
+        to expire with its lease rather than failing the response."""
+        _renewer.drop(lease)
+        slot, holder = lease
+        try:
+            AdmissionSlot.objects.filter(scope=self.name, slot=slot, holder=holder).update(holder='', expires_at=None)
+        except DatabaseError as e:
+            print(f"⚠️  Could not release {self.name} admission slot {slot}: {e}")
+        finally:
+            self._leave()
+
+    def stats(self):
+        """``active`` counts the slots held across all processes (None when
+        the database cannot be read); ``process`` is this process's view"""
+        try:
+            active = self._slots().filter(expires_at__gte=timezone.now()).exclude(holder='').count()
+        except DatabaseError:
+            active = None
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'active': active,
+                'process': {
+                    'active': self.active,
+                    'queue_size': self.queue,
+                    'queue_depth': self.waiting,
+                    'admitted': self.admitted,
+                    'rejected_queue_full': self.rejected_queue_full,
+                    'rejected_timeout': self.rejected_timeout,
+                    'rejected_unavailable': self.rejected_unavailable,
+                },
+            }
+
+
+class _LeaseRenewer:
+    """Extends the leases of the requests this process is running, every
+    third of ADMISSION_LEASE_SECONDS, with one UPDATE"""
+
+    def __init__(self):
+        self._holders = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def hold(self, lease):
+        with self._lock:
+            self._holders.add(lease[1])
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='admission-leases', daemon=True)
+                self._thread.start()
+
+    def drop(self, lease):
+        with self._lock:
+            self._holders.discard(lease[1])
+
+    def renew(self):
+        """Extend the held leases now, returns the number renewed"""
+        with self._lock:
+            holders = list(self._holders)
+        if not holders:
+            return 0
+        expires_at = timezone.now() + timedelta(seconds=settings.ADMISSION_LEASE_SECONDS)
+        return AdmissionSlot.objects.filter(holder__in=holders).update(expires_at=expires_at)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.ADMISSION_LEASE_SECONDS / 3)
+            try:
+                self.renew()
+            except DatabaseError as e:
+                print(f"⚠️  Could not renew admission leases: {e}")
+            finally:
+                connection.close()
+
+
+_renewer = _LeaseRenewer()
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(scope):
+    """Return this process's limiter for a scope configured in ADMISSION_LIMITS"""
+    with _limiters_lock:
+        if scope not in _limiters:
+            _limiters[scope] = AdmissionLimiter(scope, **settings.ADMISSION_LIMITS[scope])
+        return _limiters[scope]
+
+
+@receiver(setting_changed)
+def _reset_limiters(setting, **kwargs):
+    """Pick up ADMISSION_LIMITS changed by override_settings"""
+    if setting == 'ADMISSION_LIMITS':
+        with _limiters_lock:
+            _limiters.clear()
+
+
+def admission_stats():
+    """Stats for every configured scope"""
+    return {scope: get_limiter(scope).stats() for scope in settings.ADMISSION_LIMITS}
+
+
+def rejection_message(limiter, status_code, error=None):
+    if error is not None:
+        return f'Could not admit the {limiter.name} request ({error}), please retry later'
+    if status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        return f'Too many concurrent {limiter.name} requests, please retry later'
+    return f'Timed out waiting for a {limiter.name} slot, please retry later'
+
+
+def rejection_response(limiter, status_code, error=None):
+    """429/503 response with Retry-After for a rejected request"""
+    response = Response({'error': rejection_message(limiter, status_code, error)}, status=status_code)
+    response['Retry-After'] = str(limiter.retry_after)
+    return response
+
+
+def admission_controlled(scope):
+    """Decorator for APIView handlers that applies the scope's admission limit"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            limiter = get_limiter(scope)
+            try:
+                lease, rejected = limiter.acquire()
+            except DatabaseError as e:
+                return rejection_response(limiter, status.HTTP_503_SERVICE_UNAVAILABLE, error=e)
+            if rejected:
+                return rejection_response(limiter, rejected)
+            try:
+                return handler(view, request, *args, **kwargs)
+            finally:
+                limiter.release(lease)
+        return wrapper
+    return decorator
+
+
+def async_admission_controlled(scope):
+    """Decorator for async function views that applies the scope's admission limit"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request, *args, **kwargs):
+            limiter = get_limiter(scope)
+            error = None
+            try:
+                lease, rejected = await limiter.aacquire()
+            except DatabaseError as e:
+                error, rejected = e, status.HTTP_503_SERVICE_UNAVAILABLE
+            if rejected:
+                response = JsonResponse({'error': rejection_message(limiter, rejected, error)}, status=rejected)
+                response['Retry-After'] = str(limiter.retry_after)
+                return response
+            try:
+                return await handler(request, *args, **kwargs)
+            finally:
+                await sync_to_async(limiter.release)(lease)
+        return wrapper
+    return decorator
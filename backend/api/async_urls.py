@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+# Routes with a native async implementation; everything else falls through
+# to api.urls (see document_summarizer/asgi_urls.py)
+urlpatterns = [
+    path('documents/upload/', async_views.document_upload, name='document-upload'),
+    path('documents/<uuid:document_id>/summary/', async_views.generate_summary, name='generate-summary'),
+    path('documents/<uuid:document_id>/analyze/', async_views.analyze_document, name='analyze-document'),
+    path('documents/<uuid:document_id>/ask/', async_views.ask_document, name='ask-document'),
+    path('documents/<uuid:document_id>/events/', async_views.document_events, name='document-events'),
+    path('export/<str:dataset>/', async_views.export_dataset, name='export-dataset'),
+]
@@ -0,0 +1,257 @@
+"""
+Native async views, served under ASGI (see ``document_summarizer/asgi_urls.py``).
+
+They return the same payloads as their ``APIView`` counterparts in
+``views.py``, but await Gemini and Copyleaks on the event loop, so an ASGI
+worker holds many in-flight LLM requests without a thread per request. Text
+extraction and TF-IDF scoring are CPU work and still run on the
+``StageExecutor`` pools; ORM calls go through the async ORM or
+``sync_to_async``.
+"""
+
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+
+from . import data_export, events, retrieval
+from .admission import async_admission_controlled
+from .analysis_service import DocumentAnalysisService
+from .job_service import JobQueue
+from .models import Document
+from .serializers import DocumentSerializer, SummarySerializer
+from .services import AnalyticsService, DocumentProcessor, GeminiService
+from .stage_executor import StageExecutor
+
+
+def async_api_view(view):
+    """Exempt an async view from CSRF like DRF's APIView (Django 4.2's
+    ``csrf_exempt`` wraps views in a sync function, so set the flag directly)"""
+    view.csrf_exempt = True
+    return view
+
+
+def _request_data(request):
+    """``(data, None)`` with the parsed JSON body or form data, like DRF's
+    ``request.data``, or ``(None, error response)`` for a malformed body
+    (400, as DRF's ``ParseError``)"""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}'), None
+        except ValueError as e:
+            return None, JsonResponse(
+                {'detail': f'JSON parse error - {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    return request.POST, None
+
+
+@async_api_view
+async def document_upload(request):
+    """Handle document upload and processing"""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        if 'file' not in request.FILES:
+            return JsonResponse(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file = request.FILES['file']
+
+        # Extract text from document (CPU-bound, keep it off the event loop)
+        try:
+            text = await asyncio.get_running_loop().run_in_executor(
+                StageExecutor.pool('thread'), DocumentProcessor.extract_text_from_file, file
+            )
+        except Exception as e:
+            return JsonResponse(
+                {'error': f'Error processing file: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Create the document record, already processed, in one INSERT
+        document = await Document.objects.acreate(
+            name=file.name,
+            file=file,
+            file_type=file.name.split('.')[-1].lower(),
+            size=file.size,
+            processed=True
+        )
+        await sync_to_async(DocumentProcessor.store_text)(document, text)
+
+        serializer = DocumentSerializer(document)
+        return JsonResponse({
+            'document': serializer.data,
+            'message': 'Document uploaded successfully'
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Upload failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+@async_admission_controlled('summary')
+async def generate_summary(request, document_id):
+    """Generate summary for a document"""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        document = await sync_to_async(get_object_or_404)(Document, id=document_id)
+
+        # Get word count from request
+        data, error = _request_data(request)
+        if error is not None:
+            return error
+        max_words = data.get('max_words', 200)
+
+        # Generate summary using Gemini (cached per text and length)
+        summary = await DocumentAnalysisService().asummarize(document, max_words)
+
+        serializer = SummarySerializer(summary)
+        return JsonResponse(serializer.data)
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to generate summary: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+@async_admission_controlled('analyze')
+async def analyze_document(request, document_id):
+    """Queue citation, plagiarism and conference analysis for a document.
+
+    With JOB_QUEUE_RUN_IN_ASGI the job is claimed straight away and runs on
+    this process's event loop, up to JOB_QUEUE_ASGI_MAX_RUNNING at a time;
+    otherwise it waits for a job worker.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        document = await sync_to_async(get_object_or_404)(Document, id=document_id)
+
+        if await sync_to_async(JobQueue.is_full)():
+            response = JsonResponse(
+                {'error': 'Analysis queue is full, please retry later'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(settings.ADMISSION_LIMITS['analyze']['retry_after'])
+            return response
+
+        job = await sync_to_async(JobQueue.enqueue)('analysis', document=document)
+        if settings.JOB_QUEUE_RUN_IN_ASGI and job.status == 'queued':
+            job = await JobQueue.astart(job) or job
+
+        return JsonResponse({
+            'message': 'Document analysis queued',
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}/'
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Analysis failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+@async_admission_controlled('ask')
+async def ask_document(request, document_id):
+    """Answer a question about a document from its most relevant passages"""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        data, error = _request_data(request)
+        if error is not None:
+            return error
+        question = str(data.get('question') or '').strip()
+        if not question:
+            return JsonResponse({'error': 'question is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(question) > settings.ASK_MAX_QUESTION_CHARS:
+            return JsonResponse(
+                {'error': f'question is longer than {settings.ASK_MAX_QUESTION_CHARS} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            top_k = int(data.get('top_k', settings.ASK_TOP_PASSAGES))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'top_k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        top_k = max(1, min(top_k, settings.ASK_MAX_TOP_PASSAGES))
+
+        # Loading or building the passage index reads the database
+        started = time.perf_counter()
+        passages = await sync_to_async(retrieval.retrieve)(document_id, question, top_k)
+        if passages is None:
+            return JsonResponse(
+                {'error': 'Document not found or its text has not been extracted'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        gemini_service = GeminiService()
+        answer = await gemini_service.aanswer_question(question, passages)
+        await sync_to_async(AnalyticsService.record_stage)('ask', 'completed', {
+            'elapsed': time.perf_counter() - started,
+            'usage': gemini_service.usage if gemini_service.usage['calls'] else None,
+        })
+
+        return JsonResponse({
+            'document_id': str(document_id),
+            'question': question,
+            'answer': answer,
+            'passages': passages,
+            'fallback': gemini_service.used_fallback,
+        })
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to answer question: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+async def document_events(request, document_id):
+    """Stream analysis progress for a document as Server-Sent Events"""
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    if not await Document.objects.filter(id=document_id).aexists():
+        raise Http404('No Document matches the given query.')
+    response = StreamingHttpResponse(
+        events.aevent_stream(document_id, events.last_event_id(request), request.GET.get('job')),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@async_api_view
+async def export_dataset(request, dataset):
+    """Stream a dataset of analysis results as JSON Lines, CSV or Parquet"""
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    export_format = request.GET.get('format', 'jsonl')
+    try:
+        document_id = data_export.validate(dataset, export_format, request.GET.get('document'))
+    except data_export.InvalidExport as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    response = StreamingHttpResponse(
+        data_export.astream(dataset, export_format, document_id),
+        content_type=data_export.FORMATS[export_format][0]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{data_export.filename(dataset, export_format, timezone.now())}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,176 @@
+"""
+Bulk PDF report export (``/api/documents/export-batch/``).
+
+A ``bulk-export`` job renders the report of every requested document and
+packs them into one ZIP archive, ``<job id>.zip`` under ``BULK_EXPORT_DIR``,
+which ``/api/jobs/<id>/download/`` serves once the job has completed.
+
+ReportLab is pure Python and holds the GIL, so threads would render one
+report at a time; reports are rendered on a pool of ``BULK_EXPORT_PROCESSES``
+processes instead (0 renders them one by one in the job's thread). Each
+worker reads the document with its own database connection and writes the
+report to a file in the job's work directory, and the job moves the files
+into the archive as they complete, so only file paths cross processes and
+neither side holds a whole report in memory. Reports already in the report
+cache (``report_cache.py``) are copied rather than rendered, and rendered
+ones are added to it.
+
+Each document is a stage of the job, so progress is polled like a batch
+analysis. Archives are deleted after ``BULK_EXPORT_RETENTION_HOURS`` by
+``prune``, which the job worker runs on start, after each bulk export and
+every ``--prune-interval`` seconds.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+
+from . import report_cache, snapshots
+from .models import Document
+from .pdf_service import PDFReportService
+from .stage_executor import init_worker, mp_context
+
+
+def archive_path(job_id):
+    return os.path.join(settings.BULK_EXPORT_DIR, f'{job_id}.zip')
+
+
+def archive_name(document_id, name):
+    """File name of a document's report inside the archive"""
+    stem = name.replace('.', '_').replace('/', '_')
+    return f'document_report_{stem}_{str(document_id)[:8]}.pdf'
+
+
+def render_report(document_id, version, directory):
+    """Write the report of a document at results ``version`` to a new file in
+    ``directory`` and return its path. Runs in a pool worker."""
+    descriptor, path = tempfile.mkstemp(dir=directory, suffix='.pdf')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            cached = report_cache.open_report(document_id, PDFReportService.VERSION, version)
+            if cached is not None:
+                with cached:
+                    shutil.copyfileobj(cached, output)
+            else:
+                document = Document.objects.get(id=document_id)
+                PDFReportService().write_document_report(
+                    output,
+                    document=document,
+                    summaries=document.summaries.all(),
+                    citations=document.citations.all(),
+                    plagiarism_checks=document.plagiarism_checks.all(),
+                    conference_suggestions=document.conference_suggestions.all()
+                )
+        if cached is None and report_cache.enabled():
+            with open(path, 'rb') as source:
+                report_cache.store(document_id, PDFReportService.VERSION, version, source).close()
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _rendered(document_ids, versions, directory):
+    """``(document_id, path, error)`` for each document, in completion order"""
+    processes = min(settings.BULK_EXPORT_PROCESSES, len(document_ids))
+    if processes <= 0:
+        for document_id in document_ids:
+            try:
+                yield document_id, render_report(document_id, versions[document_id], directory), None
+            except Exception as e:
+                yield document_id, None, e
+        return
+
+    # Forked workers (STAGE_EXECUTOR_START_METHOD='fork') must not inherit this thread's open connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=mp_context(), initializer=init_worker) as pool:
+        futures = {
+            pool.submit(render_report, document_id, versions[document_id], directory): document_id
+            for document_id in document_ids
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def build_archive(job, report_stage):
+    """Render the reports of ``job.params['document_ids']`` into the job's archive"""
+    start_time = time.time()
+    document_ids = job.params.get('document_ids', [])
+    names = {
+        str(pk): name
+        for pk, name in Document.objects.filter(id__in=document_ids).values_list('id', 'name')
+    }
+    versions = {document_id: snapshots.current_version(document_id) for document_id in names}
+    completed = failed = 0
+
+    for document_id in document_ids:
+        if document_id not in names:
+            report_stage(document_id, 'failed', {'error': 'Document not found'})
+            failed += 1
+
+    os.makedirs(settings.BULK_EXPORT_DIR, exist_ok=True)
+    path = archive_path(job.id)
+    directory = tempfile.mkdtemp(dir=settings.BULK_EXPORT_DIR, prefix=f'{job.id}-')
+    try:
+        # PDF pages are already compressed, so reports are stored as they are
+        with zipfile.ZipFile(path + '.tmp', 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            pending = [document_id for document_id in document_ids if document_id in names]
+            for document_id, report, error in _rendered(pending, versions, directory):
+                if error is not None:
+                    report_stage(document_id, 'failed', {'error': str(error)})
+                    failed += 1
+                    continue
+                archive.write(report, archive_name(document_id, names[document_id]))
+                os.unlink(report)
+                report_stage(document_id, 'completed', {'version': versions[document_id]})
+                completed += 1
+        os.replace(path + '.tmp', path)
+    except BaseException:
+        if os.path.exists(path + '.tmp'):
+            os.unlink(path + '.tmp')
+        raise
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'processing_time': time.time() - start_time,
+        'documents': len(document_ids),
+        'completed': completed,
+        'failed': failed,
+        'size': os.path.getsize(path),
+        'download_url': f'/api/jobs/{job.id}/download/',
+    }
+
+
+def prune(max_age_hours=None):
+    """Delete archives (and leftover work files) older than
+    BULK_EXPORT_RETENTION_HOURS, returns the number of archives deleted"""
+    max_age_hours = settings.BULK_EXPORT_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    cutoff = time.time() - max_age_hours * 3600
+    deleted = 0
+    try:
+        entries = list(os.scandir(settings.BULK_EXPORT_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.unlink(entry.path)
+                deleted += entry.name.endswith('.zip')
+        except FileNotFoundError:
+            # Removed by another worker
+            continue
+    return deleted
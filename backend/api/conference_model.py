@@ -0,0 +1,236 @@
+"""
+Versioned, memory-mappable conference model artifacts.
+
+An artifact directory is produced by ``manage.py train_conference_model`` and
+contains everything needed to score a document against the conference corpus
+without importing pandas or scikit-learn at serving time:
+
+    vocabulary.json       term -> column index
+    analyzer.json         tokenizer settings and stop words used at training
+    idf.npy               IDF weight per column (float32)
+    tfidf_matrix.npz      sparse L2-normalised TF-IDF matrix (CSR)
+    embeddings.npy        the same matrix densified, loaded with mmap_mode='r'
+    labels.npy            conference label per row (fixed-width unicode)
+    manifest.json         version, parameters and SHA-256 of every file above
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+ARTIFACT_FILES = [
+    'vocabulary.json',
+    'analyzer.json',
+    'idf.npy',
+    'tfidf_matrix.npz',
+    'embeddings.npy',
+    'labels.npy',
+]
+MANIFEST_NAME = 'manifest.json'
+LATEST_NAME = 'LATEST'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_artifact(dataset_path, output_root, version=None, max_features=1000, ngram_range=(1, 2)):
+    """Fit the TF-IDF model on the conference dataset and write a new artifact.
+
+    Returns the path of the artifact directory. The ``LATEST`` pointer in
+    ``output_root`` is only updated once every file has been written.
+    """
+    import pandas as pd
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
+
+    data = pd.read_csv(dataset_path)
+    titles = data['Title'].fillna('').astype(str).tolist()
+    labels = data['Conference'].fillna('').astype(str).tolist()
+
+    vectorizer = TfidfVectorizer(
+        max_features=max_features,
+        stop_words='english',
+        ngram_range=tuple(ngram_range)
+    )
+    matrix = vectorizer.fit_transform(titles).astype(np.float32).tocsr()
+
+    dataset_sha = file_sha256(dataset_path)
+    if not version:
+        version = f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{dataset_sha[:8]}"
+
+    os.makedirs(output_root, exist_ok=True)
+    artifact_dir = os.path.join(output_root, version)
+    if os.path.exists(artifact_dir):
+        raise ValueError(f"Artifact version already exists: {version}")
+    staging_dir = artifact_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+    with open(os.path.join(staging_dir, 'vocabulary.json'), 'w', encoding='utf-8') as handle:
+        json.dump(vocabulary, handle, ensure_ascii=False, sort_keys=True)
+
+    analyzer = {
+        'lowercase': True,
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(ngram_range),
+        'stop_words': sorted(ENGLISH_STOP_WORDS),
+        'norm': 'l2',
+    }
+    with open(os.path.join(staging_dir, 'analyzer.json'), 'w', encoding='utf-8') as handle:
+        json.dump(analyzer, handle, ensure_ascii=False)
+
+    np.save(os.path.join(staging_dir, 'idf.npy'), vectorizer.idf_.astype(np.float32))
+    sparse.save_npz(os.path.join(staging_dir, 'tfidf_matrix.npz'), matrix)
+    np.save(os.path.join(staging_dir, 'embeddings.npy'), np.ascontiguousarray(matrix.toarray()))
+    np.save(os.path.join(staging_dir, 'labels.npy'), np.array(labels, dtype=str))
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'dataset': {
+            'path': os.path.basename(dataset_path),
+            'sha256': dataset_sha,
+            'rows': len(titles),
+        },
+        'parameters': {
+            'max_features': max_features,
+            'ngram_range': list(ngram_range),
+            'stop_words': 'english',
+        },
+        'shape': [int(matrix.shape[0]), int(matrix.shape[1])],
+        'files': {
+            name: {
+                'sha256': file_sha256(os.path.join(staging_dir, name)),
+                'bytes': os.path.getsize(os.path.join(staging_dir, name)),
+            }
+            for name in ARTIFACT_FILES
+        },
+    }
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+
+    os.rename(staging_dir, artifact_dir)
+    _write_latest(output_root, version)
+    return artifact_dir
+
+
+def _write_latest(output_root, version):
+    """Atomically point ``LATEST`` at a version"""
+    pointer = os.path.join(output_root, LATEST_NAME)
+    tmp_pointer = pointer + '.tmp'
+    with open(tmp_pointer, 'w', encoding='utf-8') as handle:
+        handle.write(version + '\n')
+    os.replace(tmp_pointer, pointer)
+
+
+def resolve_artifact_dir(output_root, version=None):
+    """Return the directory of ``version`` or of the latest artifact, if any"""
+    if not output_root or not os.path.isdir(output_root):
+        return None
+    if not version:
+        pointer = os.path.join(output_root, LATEST_NAME)
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, encoding='utf-8') as handle:
+            version = handle.read().strip()
+    artifact_dir = os.path.join(output_root, version)
+    if not os.path.exists(os.path.join(artifact_dir, MANIFEST_NAME)):
+        return None
+    return artifact_dir
+
+
+def verify_artifact(artifact_dir):
+    """Check every file against the manifest, returning a list of problems"""
+    try:
+        with open(os.path.join(artifact_dir, MANIFEST_NAME), encoding='utf-8') as handle:
+            files = json.load(handle)['files']
+        missing = [name for name in ARTIFACT_FILES if name not in files]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return [f"{MANIFEST_NAME}: unreadable ({e!r})"]
+
+    problems = [f"{name}: not in manifest" for name in missing]
+    for name, expected in files.items():
+        path = os.path.join(artifact_dir, name)
+        if not os.path.exists(path):
+            problems.append(f"{name}: missing")
+        elif os.path.getsize(path) != expected['bytes']:
+            problems.append(f"{name}: size mismatch")
+        elif file_sha256(path) != expected['sha256']:
+            problems.append(f"{name}: checksum mismatch")
+    return problems
+
+
+class ConferenceModel:
+    """Read-only view over a conference model artifact.
+
+    The dense embedding matrix is memory-mapped so that it is paged in lazily
+    and shared between every process that opens the same artifact.
+    """
+
+    def __init__(self, artifact_dir, mmap=True):
+        self.artifact_dir = artifact_dir
+        with open(os.path.join(artifact_dir, MANIFEST_NAME), encoding='utf-8') as handle:
+            self.manifest = json.load(handle)
+        self.version = self.manifest['version']
+
+        with open(os.path.join(artifact_dir, 'vocabulary.json'), encoding='utf-8') as handle:
+            self.vocabulary = json.load(handle)
+        with open(os.path.join(artifact_dir, 'analyzer.json'), encoding='utf-8') as handle:
+            analyzer = json.load(handle)
+
+        self.lowercase = analyzer['lowercase']
+        self.token_pattern = re.compile(analyzer['token_pattern'])
+        self.ngram_range = tuple(analyzer['ngram_range'])
+        self.stop_words = frozenset(analyzer['stop_words'])
+
+        mmap_mode = 'r' if mmap else None
+        self.idf = np.load(os.path.join(artifact_dir, 'idf.npy'))
+        self.embeddings = np.load(os.path.join(artifact_dir, 'embeddings.npy'), mmap_mode=mmap_mode)
+        self.labels = np.load(os.path.join(artifact_dir, 'labels.npy'), mmap_mode=mmap_mode)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def _analyze(self, text):
+        """Tokenise the same way as the TfidfVectorizer used at training time"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = [token for token in self.token_pattern.findall(text) if token not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        terms = []
+        for n in range(min_n, max_n + 1):
+            for start in range(len(tokens) - n + 1):
+                terms.append(' '.join(tokens[start:start + n]))
+        return terms
+
+    def transform(self, text):
+        """Return the L2-normalised TF-IDF vector for ``text`` as a dense array"""
+        vector = np.zeros(len(self.idf), dtype=np.float32)
+        for term in self._analyze(text):
+            index = self.vocabulary.get(term)
+            if index is not None:
+                vector[index] += 1.0
+
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def similarities(self, text):
+        """Cosine similarity between ``text`` and every row of the corpus"""
+        return self.embeddings @ self.transform(text)
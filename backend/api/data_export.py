@@ -0,0 +1,302 @@
+"""
+Machine-readable exports of analysis results (``/api/export/<dataset>/`` and
+``manage.py export_results``).
+
+A dataset is one table (documents, summaries, citations, plagiarism checks
+or conference suggestions) written as JSON Lines, CSV or Parquet. Rows are
+read as tuples with ``values_list`` (result rows get their document's name
+from a join, not a query per row) through ``.iterator(chunk_size=...)``,
+and each chunk of ``EXPORT_CHUNK_SIZE`` rows is encoded and handed on
+before the next is read, so memory stays the same however many rows are
+exported. Rows come in table order: sorting millions of rows would make the
+database materialise them all before the first byte is sent.
+
+Parquet needs the optional ``pyarrow`` package; each chunk is written as
+one row group.
+"""
+
+import csv
+import io
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion
+
+try:
+    import orjson
+except ImportError:  # Optional: JSON Lines fall back to the json module
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: Parquet exports are unavailable without it
+    pyarrow = None
+
+
+class Dataset:
+    """An exported table: ``columns`` are ``(name, lookup, type)``, type one of
+    ``string``, ``int``, ``float``, ``bool``, ``datetime`` or ``json``"""
+
+    def __init__(self, model, columns, document_lookup='document_id'):
+        self.model = model
+        self.columns = columns
+        self.document_lookup = document_lookup
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.columns]
+
+    def queryset(self, document_id=None):
+        queryset = self.model.objects.order_by().values_list(*(lookup for _, lookup, _ in self.columns))
+        if document_id is not None:
+            queryset = queryset.filter(**{self.document_lookup: document_id})
+        return queryset
+
+
+def _result_columns(*columns):
+    return [
+        ('id', 'id', 'string'),
+        ('document_id', 'document_id', 'string'),
+        ('document_name', 'document__name', 'string'),
+        *columns,
+    ]
+
+
+DATASETS = {
+    'documents': Dataset(Document, [
+        ('id', 'id', 'string'),
+        ('name', 'name', 'string'),
+        ('file_type', 'file_type', 'string'),
+        ('size', 'size', 'int'),
+        ('uploaded_at', 'uploaded_at', 'datetime'),
+        ('processed', 'processed', 'bool'),
+    ], document_lookup='id'),
+    'summaries': Dataset(Summary, _result_columns(
+        ('content', 'content', 'string'),
+        ('word_count', 'word_count', 'int'),
+        ('generated_at', 'generated_at', 'datetime'),
+    )),
+    'citations': Dataset(Citation, _result_columns(
+        ('text', 'text', 'string'),
+        ('source', 'source', 'string'),
+        ('confidence', 'confidence', 'float'),
+        ('detected_at', 'detected_at', 'datetime'),
+    )),
+    'plagiarism': Dataset(PlagiarismCheck, _result_columns(
+        ('similarity_percentage', 'similarity_percentage', 'float'),
+        ('matched_sources', 'matched_sources', 'json'),
+        ('status', 'status', 'string'),
+        ('checked_at', 'checked_at', 'datetime'),
+    )),
+    'conferences': Dataset(ConferenceSuggestion, _result_columns(
+        ('conference_name', 'conference_name', 'string'),
+        ('confidence_score', 'confidence_score', 'float'),
+        ('reasoning', 'reasoning', 'string'),
+        ('suggested_at', 'suggested_at', 'datetime'),
+    )),
+}
+
+# Format: (content type, file extension)
+FORMATS = {
+    'jsonl': ('application/x-ndjson', '.jsonl'),
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+
+class InvalidExport(ValueError):
+    """Raised for an export request naming an unknown dataset or format;
+    ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def validate(dataset, export_format, document_id=None):
+    """Check an export request, returns ``document_id`` normalised (or None)"""
+    if dataset not in DATASETS:
+        raise InvalidExport(f"Unknown dataset '{dataset}', expected one of: {', '.join(DATASETS)}", status=404)
+    if export_format not in FORMATS:
+        raise InvalidExport(f"Unknown format '{export_format}', expected one of: {', '.join(FORMATS)}")
+    if export_format == 'parquet' and pyarrow is None:
+        raise InvalidExport('Parquet exports require the pyarrow package', status=501)
+    if document_id is None:
+        return None
+    try:
+        return str(uuid.UUID(str(document_id)))
+    except ValueError:
+        raise InvalidExport('document must be a document UUID')
+
+
+def filename(dataset, export_format, timestamp):
+    return f"{dataset}_{timestamp.strftime('%Y%m%d_%H%M%S')}{FORMATS[export_format][1]}"
+
+
+def chunks(dataset, document_id=None, chunk_size=None):
+    """Rows of a dataset as lists of up to ``chunk_size`` tuples"""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    chunk = []
+    for row in DATASETS[dataset].queryset(document_id).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _json_default(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _jsonl(dataset, rows):
+    names = DATASETS[dataset].names
+    for chunk in rows:
+        if orjson is not None:
+            yield b''.join(orjson.dumps(dict(zip(names, row)), option=orjson.OPT_APPEND_NEWLINE) for row in chunk)
+        else:
+            yield ''.join(
+                json.dumps(dict(zip(names, row)), default=_json_default, ensure_ascii=False) + '\n' for row in chunk
+            ).encode('utf-8')
+
+
+def _csv_json(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _csv_datetime(value):
+    return value.isoformat()
+
+
+def _csv_bool(value):
+    return 'true' if value else 'false'
+
+
+# Columns the csv module would write differently (str() of a datetime has no 'T')
+_CSV_CONVERTERS = {
+    'json': _csv_json,
+    'datetime': _csv_datetime,
+    'bool': _csv_bool,
+}
+
+
+def _csv_rows(chunk, converters):
+    for row in chunk:
+        row = list(row)
+        for position, convert in converters:
+            value = row[position]
+            row[position] = '' if value is None else convert(value)
+        yield row
+
+
+def _csv(dataset, rows):
+    converters = [
+        (position, _CSV_CONVERTERS[kind])
+        for position, (_, _, kind) in enumerate(DATASETS[dataset].columns) if kind in _CSV_CONVERTERS
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(DATASETS[dataset].names)
+    for chunk in rows:
+        writer.writerows(_csv_rows(chunk, converters))
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # The header when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file that keeps what was written until ``take``n, so the
+    Parquet writer's output can be streamed as it is produced"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+_ARROW_TYPES = {
+    'string': 'string',
+    'int': 'int64',
+    'float': 'float64',
+    'bool': 'bool_',
+    'json': 'string',
+}
+
+
+def _arrow_type(kind):
+    if kind == 'datetime':
+        return pyarrow.timestamp('us', tz='UTC')
+    return getattr(pyarrow, _ARROW_TYPES[kind])()
+
+
+def _parquet(dataset, rows):
+    columns = DATASETS[dataset].columns
+    schema = pyarrow.schema([(name, _arrow_type(kind)) for name, _, kind in columns])
+    sink = _ParquetSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        for chunk in rows:
+            arrays = []
+            for (_, _, kind), values in zip(columns, zip(*chunk)):
+                if kind == 'json':
+                    values = [json.dumps(value, ensure_ascii=False) for value in values]
+                elif kind == 'string':
+                    values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+                arrays.append(pyarrow.array(values, type=_arrow_type(kind)))
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+_ENCODERS = {
+    'jsonl': _jsonl,
+    'csv': _csv,
+    'parquet': _parquet,
+}
+
+
+def stream(dataset, export_format, document_id=None, chunk_size=None):
+    """The export as an iterator of byte strings, one per chunk of rows"""
+    for data in _ENCODERS[export_format](dataset, chunks(dataset, document_id, chunk_size)):
+        if data:
+            yield data
+
+
+async def astream(dataset, export_format, document_id=None, chunk_size=None):
+    """``stream`` for ASGI responses: each chunk is read and encoded on the
+    sync thread, which keeps the database cursor"""
+    iterator = stream(dataset, export_format, document_id, chunk_size)
+    read = sync_to_async(next, thread_sensitive=True)
+    while True:
+        data = await read(iterator, None)
+        if data is None:
+            return
+        yield data
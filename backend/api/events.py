@@ -0,0 +1,127 @@
+"""
+Analysis progress events, streamed to clients as Server-Sent Events.
+
+Whoever runs the analysis (a job worker, an ASGI task or an eager request)
+publishes events as ``AnalysisEvent`` rows; the stream endpoint tails that
+table for one document. Events therefore cross process boundaries without a
+message broker, and the sequential row id doubles as the SSE event id, so a
+reconnecting client resumes from ``Last-Event-ID`` without gaps.
+
+Streams are only served under ASGI, where an open stream is a coroutine
+waiting between polls. A WSGI worker would be held for the whole stream, so
+the WSGI endpoint answers 501 and clients poll the job instead.
+
+Event types: ``job-queued``, ``job-started``, ``stage-started``,
+``stage-finished``, ``partial-result`` (the stored output of a stage, e.g.
+the citations found) and ``job-finished``. A stream ends with an ``end``
+event once no job is active for the document.
+"""
+
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AnalysisEvent, Job
+
+
+def publish(document, event, stage='', data=None, job=None):
+    """Record an event for a document's stream"""
+    return AnalysisEvent.objects.create(
+        document_id=getattr(document, 'id', document),
+        job_id=getattr(job, 'id', job),
+        event=event,
+        stage=stage,
+        data=data or {}
+    )
+
+
+def prune(max_age_hours=None):
+    """Delete events older than EVENT_RETENTION_HOURS, returns the count"""
+    max_age_hours = settings.EVENT_RETENTION_HOURS if max_age_hours is None else max_age_hours
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    deleted, _ = AnalysisEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def format_event(event):
+    """Serialise an AnalysisEvent in the SSE wire format"""
+    payload = dict(event.data, stage=event.stage) if event.stage else dict(event.data)
+    if event.job_id:
+        payload['job_id'] = str(event.job_id)
+    payload['created_at'] = event.created_at.isoformat()
+    return f"id: {event.id}\nevent: {event.event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def last_event_id(request):
+    """Resume position from the Last-Event-ID header or the ``after`` query parameter"""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('after') or 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _poll(document_id, after, job_id=None):
+    """Return (events after ``after``, whether a job is still active for the document).
+
+    Activity is checked first: ``job-finished`` is published before the job's
+    final status is saved, so an inactive job's events are always visible.
+    """
+    jobs = Job.objects.filter(status__in=['queued', 'running'])
+    events = AnalysisEvent.objects.filter(document_id=document_id, id__gt=after)
+    if job_id:
+        # May be a batch job that covers this document without pointing at it
+        jobs = jobs.filter(id=job_id)
+        events = events.filter(job_id=job_id)
+    else:
+        jobs = jobs.filter(document_id=document_id)
+    active = jobs.exists()
+    return list(events[:100]), active
+
+
+class _StreamState:
+    """Bookkeeping of an open stream"""
+
+    def __init__(self, after):
+        self.after = after
+        self.deadline = time.monotonic() + settings.EVENT_STREAM_TIMEOUT
+        self.last_sent = time.monotonic()
+
+    def open(self):
+        return f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n"
+
+    def take(self, events, active):
+        """Return (chunks to send, whether the stream is finished)"""
+        if events:
+            self.after = events[-1].id
+            self.last_sent = time.monotonic()
+            return [format_event(event) for event in events], False
+        if not active:
+            return ["event: end\ndata: {}\n\n"], True
+        if time.monotonic() >= self.deadline:
+            # The client reconnects with Last-Event-ID
+            return [], True
+        if time.monotonic() - self.last_sent >= settings.EVENT_STREAM_HEARTBEAT:
+            self.last_sent = time.monotonic()
+            return [": keep-alive\n\n"], False
+        return [], False
+
+
+async def aevent_stream(document_id, after=0, job_id=None):
+    """Yield SSE chunks for a document until its analysis finishes"""
+    state = _StreamState(after)
+    yield state.open()
+    while True:
+        events, active = await sync_to_async(_poll)(document_id, state.after, job_id)
+        chunks, finished = state.take(events, active)
+        for chunk in chunks:
+            yield chunk
+        if finished:
+            return
+        if not events:
+            await asyncio.sleep(settings.EVENT_STREAM_POLL_INTERVAL)
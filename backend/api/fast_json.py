@@ -0,0 +1,130 @@
+"""
+Read-only serialization fast path for list endpoints.
+
+``ModelSerializer(many=True)`` builds a model instance and walks every field
+serializer for each row, which dominates CPU time on long citation lists.
+``ValuesSerializer`` reads the same columns with ``.values()`` and only
+converts the fields whose representation differs from the database value
+(datetimes), and ``dumps`` encodes with orjson. The output is byte-identical
+to DRF's ``JSONRenderer``: U+2028/U+2029 are escaped the same way, and
+anything orjson would format differently (floats in exponent notation,
+unsupported types) is encoded with the DRF renderer instead.
+"""
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the DRF renderer
+    orjson = None
+
+
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def _same_as_stdlib(value):
+    """Whether orjson encodes ``value`` exactly like ``json.dumps``.
+
+    They differ on floats Python writes in exponent notation: orjson gives
+    ``1e16`` for ``1e+16`` and ``0.00001`` for ``1e-05``.
+    """
+    kind = type(value)
+    if kind is float:
+        return value == 0.0 or 1e-4 <= abs(value) < 1e16
+    if kind is dict:
+        value = value.values()
+    elif kind is not list and kind is not tuple:
+        return True
+    for item in value:
+        kind = type(item)
+        if (kind is float or kind is dict or kind is list or kind is tuple) and not _same_as_stdlib(item):
+            return False
+    return True
+
+
+def dumps(data):
+    """``data`` as JSON bytes, identical to ``JSONRenderer().render(data)``"""
+    if orjson is not None and _same_as_stdlib(data):
+        try:
+            content = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # e.g. integers beyond 64 bits or types orjson does not encode like DRF
+            return JSONRenderer().render(data)
+        # DRF escapes the JavaScript line terminators
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return JSONRenderer().render(data)
+
+
+def stream_array(items, batch_size=500):
+    """Encode an iterable as a JSON array, yielding ``batch_size`` items per chunk"""
+    yield b'['
+    batch = []
+    separator = b''
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
+
+
+def _datetime_converter(field):
+    """``field.to_representation`` for aware datetimes in ISO 8601, with the
+    field's timezone resolved once instead of per value"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class ValuesSerializer:
+    """Produce ``serializer.data`` rows from ``.values()`` without model instances.
+
+    ``serializer`` is an instance of a plain ModelSerializer (every field
+    maps to a column of the same name), e.g. ``DocumentSerializer(fields=[...])``.
+    """
+
+    # Fields whose representation is the database value unchanged (UUIDs
+    # are encoded identically by orjson and DRF's encoder)
+    PASSTHROUGH_FIELDS = (
+        serializers.CharField, serializers.IntegerField, serializers.FloatField,
+        serializers.BooleanField, serializers.JSONField, serializers.UUIDField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, serializer):
+        self.names = list(serializer.fields)
+        self.converters = {}
+        for name, field in serializer.fields.items():
+            if field.source != name or isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+                raise ValueError(f"Field '{name}' is not a plain model column")
+            if isinstance(field, serializers.DateTimeField):
+                self.converters[name] = _datetime_converter(field)
+            elif not isinstance(field, self.PASSTHROUGH_FIELDS):
+                self.converters[name] = field.to_representation
+
+    def row(self, values):
+        """Representation of one ``.values()`` row (extra keys are dropped)"""
+        data = {name: values[name] for name in self.names}
+        for name, convert in self.converters.items():
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
+    def rows(self, queryset):
+        """Iterate over the representations of a queryset's rows in chunks"""
+        for values in queryset.values(*self.names).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            yield self.row(values)
@@ -0,0 +1,351 @@
+"""
+Database-backed job queue.
+
+Web requests enqueue a ``Job`` row and return immediately; one or more
+``manage.py run_job_worker`` processes claim queued jobs and run them.
+Claiming is a conditional UPDATE, so any number of workers can poll the same
+table without running a job twice.
+
+A running job records a heartbeat (``heartbeat_at``) as its stages progress.
+Only jobs whose heartbeat stopped are requeued, so a long job is not handed
+to a second worker while the first is still busy with it, and a job whose
+worker died JOB_MAX_ATTEMPTS times is failed rather than retried forever.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import bulk_export, events
+from .analysis_service import DocumentAnalysisService
+from .models import Document, Job
+from .services import AnalyticsService
+
+
+def run_analysis_job(job, report_stage):
+    """Run the analysis stages for the job's document"""
+    start_time = time.time()
+    DocumentAnalysisService().analyze(job.document, on_stage=report_stage, job=job)
+    return {'processing_time': time.time() - start_time}
+
+
+async def arun_analysis_job(job, report_stage):
+    """Run the analysis stages for the job's document on the event loop"""
+    start_time = time.time()
+    await DocumentAnalysisService().aanalyze(job.document, on_stage=report_stage, job=job)
+    return {'processing_time': time.time() - start_time}
+
+
+def run_batch_analysis_job(job, report_stage):
+    """Analyze every document in ``job.params['document_ids']``.
+
+    Documents run BATCH_ANALYSIS_CONCURRENCY at a time and share one
+    DocumentAnalysisService, so the pipeline, Gemini client and conference
+    model are set up once for the batch. Each document is a stage of the
+    batch job (its ``stages`` hold per-document progress), and stage events
+    go to each document's own event stream.
+    """
+    start_time = time.time()
+    document_ids = job.params.get('document_ids', [])
+    documents = {str(pk): document for pk, document in Document.objects.in_bulk(document_ids).items()}
+    service = DocumentAnalysisService()
+    lock = threading.Lock()
+
+    def report(document_id, status, info=None):
+        # job.stages is shared between the batch threads
+        with lock:
+            report_stage(document_id, status, info)
+
+    def on_document_stage(document, stage, status, info=None):
+        JobQueue.heartbeat(job)
+        JobQueue.publish_stage_event(job, document.id, stage, status, info)
+
+    def analyze(document_id):
+        document = documents.get(document_id)
+        if document is None:
+            report(document_id, 'failed', {'error': 'Document not found'})
+            return False
+        report(document_id, 'running')
+        try:
+            results = service.analyze(
+                document,
+                on_stage=lambda stage, status, info=None: on_document_stage(document, stage, status, info),
+                job=job
+            )
+            report(document_id, 'completed', {
+                'failed_stages': [name for name, result in results.items() if not result.ok]
+            })
+            return True
+        except Exception as e:
+            report(document_id, 'failed', {'error': str(e)})
+            return False
+        finally:
+            # Each batch thread has its own connection
+            connection.close()
+
+    concurrency = max(1, min(settings.BATCH_ANALYSIS_CONCURRENCY, len(document_ids)))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as pool:
+        outcomes = list(pool.map(analyze, document_ids))
+
+    return {
+        'processing_time': time.time() - start_time,
+        'documents': len(document_ids),
+        'completed': outcomes.count(True),
+        'failed': outcomes.count(False),
+    }
+
+
+def run_bulk_export_job(job, report_stage):
+    """Render the PDF reports of ``job.params['document_ids']`` into one ZIP
+    archive (see ``bulk_export.py``); each document is a stage of the job"""
+    return bulk_export.build_archive(job, report_stage)
+
+
+JOB_HANDLERS = {
+    'analysis': run_analysis_job,
+    'batch-analysis': run_batch_analysis_job,
+    'bulk-export': run_bulk_export_job,
+}
+
+# Coroutine handlers used when an ASGI process runs the job itself
+ASYNC_JOB_HANDLERS = {
+    'analysis': arun_analysis_job,
+}
+
+JOB_STAGES = {
+    'analysis': ['extract'] + DocumentAnalysisService.STAGES,
+}
+
+
+# Strong references to jobs running on the event loop, so they are not
+# garbage collected before they finish
+_running_tasks = set()
+# Jobs ``astart`` is claiming, counted against JOB_QUEUE_ASGI_MAX_RUNNING
+# until their task exists
+_starting = 0
+
+
+class JobQueue:
+    """Service for enqueuing, claiming and running background jobs"""
+
+    @staticmethod
+    def enqueue(kind, document=None, params=None, stages=None):
+        """Create a queued job, or run it straight away when JOB_QUEUE_EAGER is set.
+
+        ``stages`` defaults to the kind's entry in JOB_STAGES.
+        """
+        if stages is None:
+            stages = JOB_STAGES.get(kind, [])
+        job = Job.objects.create(
+            kind=kind,
+            document=document,
+            params=params or {},
+            stages={stage: {'status': 'pending'} for stage in stages}
+        )
+        JobQueue._publish(job, 'job-queued', data={'kind': kind})
+        if settings.JOB_QUEUE_EAGER:
+            if JobQueue._claim(job.id, 'eager'):
+                job.refresh_from_db()
+                JobQueue.run(job)
+        return job
+
+    @staticmethod
+    def depth():
+        """Number of jobs waiting for a worker"""
+        return Job.objects.filter(status='queued').count()
+
+    @staticmethod
+    def is_full():
+        """True when JOB_QUEUE_MAX_DEPTH jobs are already waiting"""
+        max_depth = settings.JOB_QUEUE_MAX_DEPTH
+        return bool(max_depth) and Job.objects.filter(status='queued')[max_depth - 1:max_depth].exists()
+
+    @staticmethod
+    def worker_name():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _claim(job_id, worker):
+        """Atomically move a queued job to running, returns True if we got it"""
+        now = timezone.now()
+        return Job.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1
+        ) == 1
+
+    @staticmethod
+    def heartbeat(job):
+        """Record that the job's worker is alive, at most every JOB_HEARTBEAT_INTERVAL seconds"""
+        now = timezone.now()
+        if job.heartbeat_at and (now - job.heartbeat_at).total_seconds() < settings.JOB_HEARTBEAT_INTERVAL:
+            return
+        job.heartbeat_at = now
+        Job.objects.filter(id=job.id, status='running').update(heartbeat_at=now)
+
+    @staticmethod
+    def claim_next(worker, kinds=None):
+        """Claim the oldest queued job, returns None when the queue is empty"""
+        candidates = Job.objects.filter(status='queued')
+        if kinds:
+            candidates = candidates.filter(kind__in=kinds)
+        for job_id in candidates.order_by('created_at').values_list('id', flat=True)[:10]:
+            if JobQueue._claim(job_id, worker):
+                return Job.objects.select_related('document').get(id=job_id)
+        return None
+
+    @staticmethod
+    async def astart(job):
+        """Claim a queued job and run it as a task on the running event loop.
+
+        Returns the claimed job, or None if another worker got it first or
+        this process already runs JOB_QUEUE_ASGI_MAX_RUNNING jobs; the job
+        then stays queued for ``run_job_worker``. If the process dies
+        mid-job, ``requeue_stale`` hands it to a worker.
+        """
+        global _starting
+        if len(_running_tasks) + _starting >= settings.JOB_QUEUE_ASGI_MAX_RUNNING:
+            return None
+        _starting += 1
+        try:
+            worker = f"asgi:{JobQueue.worker_name()}"
+            if not await sync_to_async(JobQueue._claim)(job.id, worker):
+                return None
+            job = await Job.objects.select_related('document').aget(id=job.id)
+            task = asyncio.create_task(JobQueue.arun(job))
+            _running_tasks.add(task)
+            task.add_done_callback(_running_tasks.discard)
+            return job
+        finally:
+            _starting -= 1
+
+    @staticmethod
+    def requeue_stale(timeout_seconds):
+        """Put jobs back on the queue whose heartbeat is older than
+        ``timeout_seconds`` (their worker died), or fail them once they have
+        been attempted JOB_MAX_ATTEMPTS times. Returns ``(requeued, failed)``.
+        """
+        cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+        stale = Job.objects.filter(status='running').filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        )
+        requeued = stale.filter(attempts__lt=settings.JOB_MAX_ATTEMPTS).update(status='queued')
+
+        failed = 0
+        for job in stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).select_related('document'):
+            job.status = 'failed'
+            job.error = f"Worker stopped responding ({job.attempts} attempts)"
+            for entry in job.stages.values():
+                if entry.get('status') == 'running':
+                    entry['status'] = 'failed'
+            JobQueue._save_outcome(job)
+            failed += 1
+        return requeued, failed
+
+    @staticmethod
+    def _publish(job, event, stage='', data=None):
+        """Publish a progress event on the job's document stream"""
+        if job.document_id:
+            events.publish(job.document_id, event, stage=stage, data=data, job=job)
+
+    @staticmethod
+    def publish_stage_event(job, document_id, stage, status, info=None):
+        """Publish a stage transition on a document's event stream"""
+        events.publish(
+            document_id,
+            'stage-started' if status == 'running' else 'stage-finished',
+            stage=stage,
+            data=dict(info or {}, status=status),
+            job=job
+        )
+
+    @staticmethod
+    def _stage_reporter(job):
+        """Callback that records stage progress on the job row and publishes it"""
+        def report_stage(stage, status, info=None):
+            entry = job.stages.get(stage, {})
+            entry['status'] = status
+            if status == 'running':
+                entry['started_at'] = timezone.now().isoformat()
+            else:
+                entry['finished_at'] = timezone.now().isoformat()
+            if info is not None:
+                entry['result'] = info
+            job.stages[stage] = entry
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['stages', 'heartbeat_at'])
+            if job.document_id:
+                JobQueue.publish_stage_event(job, job.document_id, stage, status, info)
+        return report_stage
+
+    @staticmethod
+    def _record_failure(job, error):
+        traceback.print_exc()
+        job.status = 'failed'
+        job.error = str(error)
+        for entry in job.stages.values():
+            if entry.get('status') == 'running':
+                entry['status'] = 'failed'
+        print(f"❌ Job {job.id} ({job.kind}) failed: {error}")
+
+    @staticmethod
+    def _save_outcome(job):
+        """Publish job-finished, then save the final status.
+
+        Event streams close once no job is active, so the event has to be
+        visible before the status changes.
+        """
+        JobQueue._publish(job, 'job-finished', data={'status': job.status, 'error': job.error})
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error', 'stages', 'finished_at'])
+        if job.status == 'failed':
+            AnalyticsService.rollup(f'job_failed.{job.kind}')
+
+    @staticmethod
+    def run(job):
+        """Run a claimed job and record its outcome"""
+        handler = JOB_HANDLERS.get(job.kind)
+        JobQueue._publish(job, 'job-started', data={'worker': job.worker})
+
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            job.result = handler(job, JobQueue._stage_reporter(job)) or {}
+            job.status = 'completed'
+            print(f"✅ Job {job.id} ({job.kind}) completed")
+        except Exception as e:
+            JobQueue._record_failure(job, e)
+
+        JobQueue._save_outcome(job)
+        return job
+
+    @staticmethod
+    async def arun(job):
+        """Async variant of ``run`` for jobs executed inside an ASGI process"""
+        handler = ASYNC_JOB_HANDLERS.get(job.kind)
+        await sync_to_async(JobQueue._publish)(job, 'job-started', data={'worker': job.worker})
+
+        try:
+            if handler is None:
+                raise ValueError(f"No async handler for job kind: {job.kind}")
+            job.result = await handler(job, JobQueue._stage_reporter(job)) or {}
+            job.status = 'completed'
+            print(f"✅ Job {job.id} ({job.kind}) completed")
+        except Exception as e:
+            JobQueue._record_failure(job, e)
+
+        await sync_to_async(JobQueue._save_outcome)(job)
+        return job
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api import services
+
+
+SAMPLE_TEXT = "A scalable query optimizer for distributed database storage and indexing"
+
+# name -> (settings overrides, load in the parent before forking)
+SCENARIOS = {
+    'csv': ({'CONFERENCE_MODEL_ARTIFACTS_DIR': ''}, False),
+    'artifact': ({'CONFERENCE_MODEL_MMAP': False}, False),
+    'artifact-mmap': ({'CONFERENCE_MODEL_MMAP': True}, False),
+    'artifact-preload': ({'CONFERENCE_MODEL_MMAP': True}, True),
+}
+
+
+def _memory_kb():
+    """Return (rss, pss) of the current process in kB from /proc"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as handle:
+        for line in handle:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0][:-1]] = int(parts[1])
+    return values.get('Rss', 0), values.get('Pss', 0)
+
+
+def _worker(overrides, results, done):
+    """Simulate a prefork worker: load (if needed), serve one request, report memory"""
+    with override_settings(**overrides):
+        base_rss, base_pss = _memory_kb()
+        services.get_conference_suggestion_service().suggest_conferences(SAMPLE_TEXT)
+        rss, pss = _memory_kb()
+    results.put((os.getpid(), base_rss, rss, pss))
+    # Stay alive until every worker has reported so PSS reflects the sharing
+    done.wait()
+
+
+class Command(BaseCommand):
+    help = 'Measure per-worker RSS/PSS of the conference model under different loading strategies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(SCENARIOS),
+            help='Scenario to run (repeatable, default: all)'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('This benchmark needs /proc/self/smaps_rollup (Linux)')
+
+        context = multiprocessing.get_context('fork')
+        for name in options['scenario'] or list(SCENARIOS):
+            # Each scenario runs in its own process so models from earlier runs are not inherited
+            process = context.Process(target=self._run_scenario, args=(name, options['workers']))
+            process.start()
+            process.join()
+
+    def _run_scenario(self, name, worker_count):
+        overrides, preload = SCENARIOS[name]
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        done = context.Event()
+
+        with override_settings(**overrides):
+            if preload:
+                services.get_conference_suggestion_service()
+            master_rss, _ = _memory_kb()
+
+            workers = [context.Process(target=_worker, args=(overrides, results, done)) for _ in range(worker_count)]
+            for worker in workers:
+                worker.start()
+            rows = [results.get() for _ in workers]
+            done.set()
+            for worker in workers:
+                worker.join()
+
+        total_pss = sum(row[3] for row in rows)
+        self.stdout.write(f"\n📊 {name} ({worker_count} workers, master RSS {master_rss / 1024:.1f} MB)")
+        self.stdout.write(f"   {'pid':>8} {'RSS before':>12} {'RSS after':>12} {'PSS after':>12}")
+        for pid, base_rss, rss, pss in rows:
+            self.stdout.write(
+                f"   {pid:>8} {base_rss / 1024:>9.1f} MB {rss / 1024:>9.1f} MB {pss / 1024:>9.1f} MB"
+            )
+        self.stdout.write(f"   Total worker PSS: {total_pss / 1024:.1f} MB")
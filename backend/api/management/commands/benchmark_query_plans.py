@@ -0,0 +1,152 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from api.models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion
+
+
+ALIAS = 'query_plan_benchmark'
+MODELS = [Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion]
+
+
+def _queries(document_ids):
+    """The access patterns used by the API, as (name, queryset factory)"""
+    sample = random.Random(1)
+
+    def one():
+        return sample.choice(document_ids)
+
+    return [
+        ('document list page', lambda: Document.objects.using(ALIAS).order_by('-uploaded_at', '-id')[:50]),
+        ('citations of a document', lambda: Citation.objects.using(ALIAS).filter(document_id=one()).order_by('-detected_at')),
+        ('citation prefetch (50 documents)', lambda: Citation.objects.using(ALIAS).filter(
+            document_id__in=sample.sample(document_ids, 50)
+        ).order_by('-detected_at')),
+        ('summaries of a document', lambda: Summary.objects.using(ALIAS).filter(document_id=one()).order_by('-generated_at')),
+        ('plagiarism checks of a document', lambda: PlagiarismCheck.objects.using(ALIAS).filter(
+            document_id=one()
+        ).order_by('-checked_at')),
+        ('latest plagiarism score (subquery)', lambda: Document.objects.using(ALIAS).filter(id=one()).annotate(
+            score=Subquery(PlagiarismCheck.objects.filter(
+                document=OuterRef('pk')
+            ).order_by('-checked_at').values('similarity_percentage')[:1])
+        )),
+        ('conference suggestions of a document', lambda: ConferenceSuggestion.objects.using(ALIAS).filter(
+            document_id=one()
+        ).order_by('-confidence_score')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scratch SQLite database and print query plans and timings for the API access '
+        'patterns without and with the composite indexes declared on the models'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000)
+        parser.add_argument('--citations-per-document', type=int, default=50)
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--path', help='Database file (default: a temporary file, deleted afterwards)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join(tempfile.mkdtemp(), 'query_plans.sqlite3')
+        settings_dict = dict(connections.databases['default'], ENGINE='django.db.backends.sqlite3', NAME=path)
+        connections.databases[ALIAS] = settings_dict
+        connection = connections[ALIAS]
+
+        try:
+            with connection.schema_editor() as editor:
+                for model in MODELS:
+                    editor.create_model(model)
+            document_ids = self._seed(options['documents'], options['citations_per_document'])
+
+            # Indexes added by this change (Meta.indexes on the related models)
+            indexes = [(model, index) for model in MODELS[1:] for index in model._meta.indexes]
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            self._report('BEFORE (foreign key indexes only)', document_ids, options['runs'])
+
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self._report('AFTER (composite indexes)', document_ids, options['runs'])
+        finally:
+            connection.close()
+            del connections.databases[ALIAS]
+            if not options['path'] and os.path.exists(path):
+                os.remove(path)
+
+    def _seed(self, documents, citations_per_document):
+        now = timezone.now()
+        rng = random.Random(0)
+        document_ids = [uuid.uuid4() for _ in range(documents)]
+        started = time.perf_counter()
+
+        Document.objects.using(ALIAS).bulk_create([
+            Document(
+                id=document_id, name=f'document-{i}.pdf', file='documents/seed.pdf',
+                file_type=rng.choice(['pdf', 'docx', 'txt']), size=rng.randint(1000, 10 ** 7),
+                uploaded_at=now - timedelta(minutes=i), processed=True
+            )
+            for i, document_id in enumerate(document_ids)
+        ], batch_size=5000)
+
+        def related(model, per_document, build):
+            batch = []
+            for document_id in document_ids:
+                for j in range(per_document):
+                    batch.append(build(document_id, j))
+                if len(batch) >= 20000:
+                    model.objects.using(ALIAS).bulk_create(batch, batch_size=5000)
+                    batch = []
+            model.objects.using(ALIAS).bulk_create(batch, batch_size=5000)
+
+        related(Summary, 1, lambda d, j: Summary(
+            document_id=d, content='Seeded summary', word_count=2, generated_at=now - timedelta(seconds=rng.random() * 1e6)
+        ))
+        related(Citation, citations_per_document, lambda d, j: Citation(
+            document_id=d, text=f'Citation {j}', source='Seed', confidence=rng.random(),
+            detected_at=now - timedelta(seconds=rng.random() * 1e6)
+        ))
+        related(PlagiarismCheck, 2, lambda d, j: PlagiarismCheck(
+            document_id=d, similarity_percentage=rng.random() * 30, status='completed',
+            checked_at=now - timedelta(seconds=rng.random() * 1e6)
+        ))
+        related(ConferenceSuggestion, 5, lambda d, j: ConferenceSuggestion(
+            document_id=d, conference_name=f'Conference {j}', confidence_score=rng.random(), reasoning='Seed'
+        ))
+
+        total = documents * (1 + 1 + citations_per_document + 2 + 5)
+        self.stdout.write(f"📊 Seeded {total:,} rows in {time.perf_counter() - started:.1f}s")
+        return document_ids
+
+    def _report(self, title, document_ids, runs):
+        self.stdout.write(f"\n=== {title} ===")
+        for name, build in _queries(document_ids):
+            plan = build().explain()
+            # Time the SQL alone; model instantiation would hide the index effect
+            statements = [build().query.sql_with_params() for _ in range(runs + 1)]
+            timings = []
+            with connections[ALIAS].cursor() as cursor:
+                for sql, params in statements:
+                    started = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings = timings[1:]  # the first run warms the page cache
+            self.stdout.write(f"\n{name}: median {statistics.median(timings):.2f} ms")
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
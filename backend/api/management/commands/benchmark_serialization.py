@@ -0,0 +1,127 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api import fast_json
+from api.fast_json import ValuesSerializer
+from api.models import Document, Citation, PlagiarismCheck, ConferenceSuggestion
+from api.serializers import (
+    DocumentSerializer, CitationSerializer, PlagiarismCheckSerializer, ConferenceSuggestionSerializer
+)
+
+
+ALIAS = 'serialization_benchmark'
+MODELS = [Document, Citation, PlagiarismCheck, ConferenceSuggestion]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of DRF ModelSerializer(many=True) + JSONRenderer with the fast_json '
+        '.values() path for the list endpoints, and check that both produce the same bytes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Rows per list')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per path')
+        parser.add_argument('--path', help='Database file (default: a temporary file, deleted afterwards)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join(tempfile.mkdtemp(), 'serialization.sqlite3')
+        connections.databases[ALIAS] = dict(
+            connections.databases['default'], ENGINE='django.db.backends.sqlite3', NAME=path
+        )
+        connection = connections[ALIAS]
+
+        try:
+            with connection.schema_editor() as editor:
+                for model in MODELS:
+                    editor.create_model(model)
+            document = self._seed(options['rows'])
+
+            self.stdout.write(f"\n{'list':<24}{'DRF rows/s':>14}{'fast rows/s':>14}{'speedup':>10}")
+            lists = [
+                ('documents', DocumentSerializer, Document.objects.using(ALIAS).order_by('-uploaded_at', '-id')),
+                ('citations', CitationSerializer, Citation.objects.using(ALIAS).filter(document=document)),
+                ('plagiarism checks', PlagiarismCheckSerializer, PlagiarismCheck.objects.using(ALIAS).filter(
+                    document=document
+                )),
+                ('conference suggestions', ConferenceSuggestionSerializer, ConferenceSuggestion.objects.using(
+                    ALIAS
+                ).filter(document=document)),
+            ]
+            for name, serializer_class, queryset in lists:
+                self._compare(name, serializer_class, queryset, options['rows'], options['runs'])
+        finally:
+            connection.close()
+            del connections.databases[ALIAS]
+            if not options['path'] and os.path.exists(path):
+                os.remove(path)
+
+    def _seed(self, rows):
+        now = timezone.now()
+        rng = random.Random(0)
+        documents = Document.objects.using(ALIAS).bulk_create([
+            Document(
+                id=uuid.uuid4(), name=f'document-{i}.pdf', file='documents/seed.pdf',
+                file_type=rng.choice(['pdf', 'docx', 'txt']), size=rng.randint(1000, 10 ** 7),
+                uploaded_at=now - timedelta(minutes=i), processed=True
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        document = documents[0]
+
+        Citation.objects.using(ALIAS).bulk_create([
+            Citation(
+                document=document, text=f'Smith et al. ({1990 + i % 30}) – finding {i}', source='Reference list item',
+                confidence=rng.random(), detected_at=now - timedelta(seconds=i)
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        PlagiarismCheck.objects.using(ALIAS).bulk_create([
+            PlagiarismCheck(
+                document=document, similarity_percentage=rng.random() * 30, status='completed',
+                matched_sources=[{'url': f'https://example.org/{i}', 'similarity': rng.random()}],
+                checked_at=now - timedelta(seconds=i)
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        ConferenceSuggestion.objects.using(ALIAS).bulk_create([
+            ConferenceSuggestion(
+                document=document, conference_name=f'Conference {i % 50}', confidence_score=rng.random(),
+                reasoning='Similar to previously accepted papers'
+            )
+            for i in range(rows)
+        ], batch_size=5000)
+        self.stdout.write(f"📊 Seeded {rows:,} rows per list")
+        return document
+
+    def _compare(self, name, serializer_class, queryset, rows, runs):
+        def drf():
+            return JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+
+        def fast():
+            return b''.join(fast_json.stream_array(ValuesSerializer(serializer_class()).rows(queryset.all())))
+
+        if drf() != fast():
+            raise CommandError(f"{name}: fast path output differs from DRF")
+
+        results = []
+        for path in (drf, fast):
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                path()
+                timings.append(time.perf_counter() - started)
+            results.append(rows / statistics.median(timings))
+        self.stdout.write(
+            f"{name:<24}{results[0]:>14,.0f}{results[1]:>14,.0f}{results[1] / results[0]:>9.1f}x"
+        )
@@ -0,0 +1,67 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _request(url, method, body):
+    """Send one request, returns (status, seconds)"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            code = response.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    except OSError:
+        code = 0
+    return code, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure request throughput and latency of a running server, e.g. the summary '
+        'endpoint under gunicorn (WSGI) and uvicorn (ASGI)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', required=True, help='Endpoint to call, e.g. http://localhost:8000/api/documents/<id>/summary/')
+        parser.add_argument('--method', default='POST')
+        parser.add_argument('--data', default='{"max_words": 100}', help='JSON body ("" for none)')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        body = json.loads(options['data']) if options['data'] else None
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            outcomes = list(pool.map(
+                lambda _: _request(options['url'], options['method'].upper(), body),
+                range(options['requests'])
+            ))
+        elapsed = time.perf_counter() - started
+
+        codes = {}
+        for code, _ in outcomes:
+            codes[code] = codes.get(code, 0) + 1
+        latencies = sorted(seconds for _, seconds in outcomes)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+        self.stdout.write(f"📊 {options['requests']} requests, concurrency {options['concurrency']}")
+        self.stdout.write(f"   throughput: {options['requests'] / elapsed:.1f} req/s ({elapsed:.2f}s)")
+        self.stdout.write(
+            f"   latency: p50 {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p95 {p95 * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms"
+        )
+        self.stdout.write(f"   status codes: {', '.join(f'{code}={count}' for code, count in sorted(codes.items()))}")
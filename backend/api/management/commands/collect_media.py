@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api import media_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount media blob references from the documents and delete unreferenced blobs. '
+        'With --import-legacy, first move files stored as plain copies into the content-addressed store'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--import-legacy', action='store_true', help='Import files saved before the media store')
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            help='Leave blobs referenced this recently alone (default MEDIA_COLLECT_GRACE_HOURS)'
+        )
+
+    def handle(self, *args, **options):
+        if options['import_legacy']:
+            imported, missing = media_store.import_legacy()
+            self.stdout.write(f"📦 Imported {imported} document files ({missing} missing)")
+            if missing:
+                self.stderr.write(f"⚠️ {missing} documents refer to files that do not exist")
+
+        corrected, collected = media_store.recount(options['grace_hours'])
+        self.stdout.write(f"✅ Corrected {corrected} reference counts, deleted {collected} unreferenced blobs")
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import data_export
+
+
+class Command(BaseCommand):
+    help = (
+        'Export documents or analysis results as JSON Lines, CSV or Parquet, streamed in chunks '
+        '(memory does not grow with the number of rows). Writes to stdout unless --output is given'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(data_export.DATASETS), help='Table to export')
+        parser.add_argument('--format', dest='export_format', choices=list(data_export.FORMATS), default='jsonl')
+        parser.add_argument('--output', help='File to write (default stdout)')
+        parser.add_argument('--document', help='Only rows of this document')
+        parser.add_argument('--chunk-size', type=int, help='Rows read and encoded at a time (default EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        try:
+            document_id = data_export.validate(options['dataset'], options['export_format'], options['document'])
+        except data_export.InvalidExport as e:
+            raise CommandError(str(e))
+
+        started = time.time()
+        chunks = data_export.stream(options['dataset'], options['export_format'], document_id, options['chunk_size'])
+        if not options['output']:
+            for data in chunks:
+                sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            return
+
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for data in chunks:
+                output.write(data)
+                size += len(data)
+        self.stdout.write(
+            f"✅ Exported {options['dataset']} to {options['output']} "
+            f"({size / 1024 / 1024:.1f} MB in {time.time() - started:.1f}s)"
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import search
+from api.models import Document
+from api.services import DocumentProcessor
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the full-text search entries from the stored document texts, summaries and citations. '
+        'With --extract, first extract and store the text of documents that have none '
+        '(uploaded before texts were stored)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--extract', action='store_true', help='Extract missing document texts from the files')
+
+    def handle(self, *args, **options):
+        if options['extract']:
+            extracted = failed = 0
+            for document in Document.objects.filter(content__isnull=True).iterator(chunk_size=100):
+                try:
+                    with document.file.open('rb'):
+                        text = DocumentProcessor.extract_text_from_file(document.file)
+                    DocumentProcessor.store_text(document, text)
+                    extracted += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"⚠️ Could not extract {document.name} ({document.id}): {e}")
+            self.stdout.write(f"📄 Extracted {extracted} document texts ({failed} failed)")
+
+        with transaction.atomic():
+            entries = search.rebuild()
+        self.stdout.write(f"✅ Search index rebuilt: {entries} entries ({search.backend()} backend)")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api import similarity
+from api.models import DocumentContent, DocumentVector
+
+
+class Command(BaseCommand):
+    help = (
+        'Vectorise every stored document text that has no current similarity vector '
+        '(e.g. after the vectoriser version changed)'
+    )
+
+    def handle(self, *args, **options):
+        stored = 0
+        for content in DocumentContent.objects.iterator(chunk_size=100):
+            similarity.store_vector(content)
+            stored += 1
+        removed, _ = DocumentVector.objects.exclude(version=similarity.VERSION).delete()
+        self.stdout.write(
+            f"✅ Similarity index up to date: {stored} document texts checked, "
+            f"{removed} outdated vectors removed ({similarity.VERSION})"
+        )
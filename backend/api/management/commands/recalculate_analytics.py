@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.services import AnalyticsService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the analytics counters from a full recount of documents and results'
+
+    def handle(self, *args, **options):
+        analytics = AnalyticsService.recalculate()
+        self.stdout.write(
+            f"✅ Analytics recalculated: {analytics.total_documents} documents, "
+            f"{analytics.citations_found} citations, {analytics.plagiarism_detected} plagiarism checks, "
+            f"{analytics.conferences_matched} conference suggestions"
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import bulk_export, events
+from api.analysis_service import DocumentAnalysisService
+from api.job_service import JobQueue
+from api.stage_executor import StageExecutor
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs (document analysis). Run several for more throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+        parser.add_argument('--kind', action='append', help='Only process jobs of this kind (repeatable)')
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=1800,
+            help='Requeue running jobs without a heartbeat for this many seconds (crashed workers)'
+        )
+        parser.add_argument(
+            '--prune-interval',
+            type=float,
+            default=3600,
+            help='Seconds between deletions of expired export archives (also done after each bulk export)'
+        )
+
+    def handle(self, *args, **options):
+        worker = JobQueue.worker_name()
+        processed = 0
+        self.stdout.write(f"🚀 Job worker {worker} started")
+
+        requeued, failed = JobQueue.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f"⚠️  Requeued {requeued} stale jobs")
+        if failed:
+            self.stdout.write(f"❌ Failed {failed} stale jobs out of attempts")
+        pruned = events.prune()
+        if pruned:
+            self.stdout.write(f"✅ Pruned {pruned} old analysis events")
+        self.prune_exports()
+        pruned = DocumentAnalysisService().prune_cache()
+        if pruned:
+            self.stdout.write(f"✅ Pruned {pruned} stage cache entries")
+
+        last_pruned = time.monotonic()
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_pruned >= options['prune_interval']:
+                    self.prune_exports()
+                    last_pruned = time.monotonic()
+
+                job = JobQueue.claim_next(worker, kinds=options['kind'])
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                JobQueue.run(job)
+                processed += 1
+                if job.kind == 'bulk-export':
+                    # Each export adds an archive; expired ones go as new ones arrive
+                    self.prune_exports()
+                    last_pruned = time.monotonic()
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write("\n🛑 Job worker stopped by user")
+        finally:
+            StageExecutor.shutdown()
+
+        self.stdout.write(f"✅ Job worker {worker} processed {processed} jobs")
+
+    def prune_exports(self):
+        pruned = bulk_export.prune()
+        if pruned:
+            self.stdout.write(f"✅ Pruned {pruned} expired export archives")
@@ -0,0 +1,67 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.conference_model import ConferenceModel, build_artifact, resolve_artifact_dir, verify_artifact
+
+
+class Command(BaseCommand):
+    help = 'Train the conference suggestion model and write a versioned artifact directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset',
+            default=os.path.join(settings.CONFERENCE_MODELS_DIR, 'conference_dataset_clean.csv'),
+            help='CSV file with Title and Conference columns'
+        )
+        parser.add_argument(
+            '--output',
+            default=settings.CONFERENCE_MODEL_ARTIFACTS_DIR,
+            help='Directory that holds versioned artifacts and the LATEST pointer'
+        )
+        parser.add_argument('--artifact-version', help='Artifact version name (default: timestamp and dataset hash)')
+        parser.add_argument('--max-features', type=int, default=1000)
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only verify the checksums of an existing artifact (LATEST unless --artifact-version is given)'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self._verify(options['output'], options['artifact_version'])
+
+        if not os.path.exists(options['dataset']):
+            raise CommandError(f"Dataset not found: {options['dataset']}")
+
+        started = time.perf_counter()
+        try:
+            artifact_dir = build_artifact(
+                options['dataset'],
+                options['output'],
+                version=options['artifact_version'],
+                max_features=options['max_features']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        model = ConferenceModel(artifact_dir)
+        rows, features = model.manifest['shape']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Trained conference model {model.version}: {rows} papers, {features} features "
+            f"in {elapsed:.2f}s"
+        ))
+        self.stdout.write(f"   Artifact written to {artifact_dir}")
+
+    def _verify(self, output_root, version):
+        artifact_dir = resolve_artifact_dir(output_root, version)
+        if not artifact_dir:
+            raise CommandError(f"No artifact found in {output_root}")
+
+        problems = verify_artifact(artifact_dir)
+        if problems:
+            raise CommandError(f"Artifact {artifact_dir} failed verification: " + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f"✅ Artifact {artifact_dir} verified"))
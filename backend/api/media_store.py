@@ -0,0 +1,359 @@
+"""
+Content-addressed storage for uploaded files (the ``default`` storage in
+``STORAGES``).
+
+A file is stored once per content: it is named after the SHA-256 of its
+bytes, ``blobs/<2 hex>/<2 hex>/<sha256>[.<codec>].<extension>``, so uploading
+the same file again adds a reference to the existing blob instead of another
+copy. The two directory levels keep every directory small (about 150
+entries per directory at ten million blobs). The extension stays last
+because text extraction picks the parser from it.
+
+Text formats (``TEXT_EXTENSIONS``) are compressed with ``MEDIA_COMPRESSION``
+(zstd with the optional ``zstandard`` package, else zlib) when that saves at
+least ``MIN_SAVING``; the codec is part of the name, so opening a blob
+decompresses it without a database lookup. Other formats (PDF, DOCX) are
+already compressed and stored as they are.
+
+``MediaBlob`` rows count the documents referring to each blob. Adding a
+reference increments the count before the file is (re)written, and the
+last reference deletes the row and the file in one transaction, so an
+upload racing with a deletion either keeps the blob alive or writes it
+again. ``manage.py collect_media`` recounts references from the documents
+(a document insert that failed after its file was saved leaves one too
+many), collects unreferenced blobs and imports files stored as plain
+copies by earlier versions.
+
+Names outside ``blobs/`` are ordinary files and are served as before.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+try:
+    import zstandard
+except ImportError:  # Optional: text files are compressed with zlib instead
+    zstandard = None
+
+
+PREFIX = 'blobs/'
+
+TEXT_EXTENSIONS = frozenset(['txt', 'md', 'csv', 'json', 'xml', 'html', 'htm', 'tex', 'rtf'])
+
+# Compressed copies are only kept when they are at least this much smaller
+MIN_SAVING = 0.1
+
+CODECS = ['zst', 'zlib']
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+# Longer extensions are cut, so names fit the FileField's 100 characters
+MAX_EXTENSION_CHARS = 10
+
+# Blob rows checked per query by ``recount``
+RECOUNT_BATCH = 1000
+
+# Decompressed blobs are read into memory up to this size, then a temporary file
+SPOOL_BYTES = 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(PREFIX)
+
+
+def blob_name(sha256, extension, codec=''):
+    suffix = ''.join(f'.{part}' for part in (codec, extension) if part)
+    return f'{PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{suffix}'
+
+
+def codec_of(name):
+    """Codec a blob is compressed with, '' for none"""
+    parts = os.path.basename(name).split('.')
+    return parts[1] if len(parts) > 2 and parts[1] in CODECS else ''
+
+
+def _codec_for(extension):
+    if extension not in TEXT_EXTENSIONS or settings.MEDIA_COMPRESSION == 'none':
+        return ''
+    if settings.MEDIA_COMPRESSION == 'zstd' and zstandard is not None:
+        return 'zst'
+    return 'zlib'
+
+
+def _compressor(codec):
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(ZLIB_LEVEL)
+
+
+def _decompressor(codec):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError('Reading zstd-compressed media requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that deduplicates and compresses uploads (see module docstring)"""
+
+    def get_available_name(self, name, max_length=None):
+        # The saved name comes from the content, never from the upload name
+        return name
+
+    def _temporary(self):
+        directory = self.path(PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    def _encode(self, source, codec):
+        """Copy the file at ``source`` to a new temporary file compressed with
+        ``codec``, returns its path"""
+        descriptor, temporary = self._temporary()
+        try:
+            compressor = _compressor(codec)
+            with open(source, 'rb') as raw, os.fdopen(descriptor, 'wb') as encoded:
+                for chunk in iter(lambda: raw.read(CHUNK_SIZE), b''):
+                    encoded.write(compressor.compress(chunk))
+                encoded.write(compressor.flush())
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return temporary
+
+    def _place(self, name, source):
+        """Write the blob ``name`` from the uncompressed file at ``source``
+        (which is moved into place when the blob is not compressed)"""
+        codec = codec_of(name)
+        temporary = self._encode(source, codec) if codec else source
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        os.replace(temporary, self.path(name))
+
+    def _reference(self, sha256, extension, source):
+        """Add a reference to an existing blob, rewriting its file if it is
+        missing; returns its name, or None when there is no such blob"""
+        from .models import MediaBlob
+
+        rows = MediaBlob.objects.filter(sha256=sha256, extension=extension)
+        if not rows.update(references=F('references') + 1, referenced_at=timezone.now()):
+            return None
+        name = rows.values_list('name', flat=True).first()
+        if not os.path.exists(self.path(name)):
+            # Removed by a deletion whose transaction then failed; the
+            # reference held now keeps the rewritten file
+            self._place(name, source)
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        extension = os.path.splitext(name)[1][1:].lower()[:MAX_EXTENSION_CHARS]
+        # Hash the upload while copying it, so it is read once
+        digest = hashlib.sha256()
+        size = 0
+        descriptor, source = self._temporary()
+        try:
+            with os.fdopen(descriptor, 'wb') as raw:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    raw.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+
+            while True:
+                existing = self._reference(sha256, extension, source)
+                if existing is not None:
+                    return existing
+
+                codec = _codec_for(extension)
+                stored = self._encode(source, codec) if codec else source
+                stored_size = os.path.getsize(stored)
+                if codec and stored_size > size * (1 - MIN_SAVING):
+                    os.unlink(stored)
+                    codec, stored, stored_size = '', source, size
+                blob = blob_name(sha256, extension, codec)
+                try:
+                    with transaction.atomic():
+                        MediaBlob.objects.create(
+                            name=blob, sha256=sha256, extension=extension, codec=codec,
+                            size=size, stored_size=stored_size, references=1
+                        )
+                except IntegrityError:
+                    # Stored concurrently by another upload of the same file: reference that
+                    if stored != source:
+                        os.unlink(stored)
+                    continue
+                os.makedirs(os.path.dirname(self.path(blob)), exist_ok=True)
+                os.replace(stored, self.path(blob))
+                return blob
+        finally:
+            if os.path.exists(source):
+                os.unlink(source)
+
+    def _open(self, name, mode='rb'):
+        codec = codec_of(name) if is_blob(name) else ''
+        if not codec:
+            return super()._open(name, mode)
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError('Stored blobs are read-only')
+        return DecodedBlob(self, name)
+
+    def decode(self, name):
+        """The content of a compressed blob in a temporary file, positioned at its start"""
+        decompressor = _decompressor(codec_of(name))
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        try:
+            with open(self.path(name), 'rb') as encoded:
+                for chunk in iter(lambda: encoded.read(CHUNK_SIZE), b''):
+                    output.write(decompressor.decompress(chunk))
+            output.write(decompressor.flush())
+        except BaseException:
+            output.close()
+            raise
+        output.seek(0)
+        return output
+
+    def delete(self, name):
+        """Drop one reference to a blob (deleting it with the last one); other names are plain files"""
+        if is_blob(name):
+            release(name)
+        else:
+            super().delete(name)
+
+    def size(self, name):
+        """Original size of a blob, not its compressed size on disk"""
+        if is_blob(name) and codec_of(name):
+            from .models import MediaBlob
+            size = MediaBlob.objects.filter(name=name).values_list('size', flat=True).first()
+            if size is not None:
+                return size
+        return super().size(name)
+
+
+class DecodedBlob(File):
+    """A compressed blob opened for reading; reopening it decompresses it again"""
+
+    def __init__(self, storage, name):
+        self._storage = storage
+        super().__init__(storage.decode(name), name=name)
+
+    def open(self, mode=None):
+        if self.closed:
+            self.file = self._storage.decode(self.name)
+        else:
+            self.seek(0)
+        return self
+
+
+def release(name):
+    """Drop one reference to a blob; the last one deletes the row and the file"""
+    from .models import MediaBlob
+
+    with transaction.atomic():
+        MediaBlob.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+        deleted, _ = MediaBlob.objects.filter(name=name, references=0).delete()
+        if deleted:
+            # Inside the transaction: an upload of the same file waits for it,
+            # then finds no blob and writes a new one
+            _remove(default_storage.path(name))
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def recount(grace_hours=None):
+    """Set each blob's reference count to the number of documents using it
+    and delete unreferenced blobs and abandoned temporary files.
+
+    Blobs referenced in the last ``grace_hours`` (MEDIA_COLLECT_GRACE_HOURS)
+    are skipped: their documents may not be saved yet. Returns
+    ``(corrected, collected)`` counts.
+    """
+    from .models import MediaBlob
+
+    grace_hours = settings.MEDIA_COLLECT_GRACE_HOURS if grace_hours is None else grace_hours
+    cutoff = timezone.now() - timedelta(hours=grace_hours)
+    corrected = collected = 0
+
+    blobs = MediaBlob.objects.filter(referenced_at__lt=cutoff).values_list('name', 'references')
+    iterator = blobs.iterator(chunk_size=RECOUNT_BATCH)
+    while True:
+        batch = list(islice(iterator, RECOUNT_BATCH))
+        if not batch:
+            break
+        fixed, removed = _recount_batch(batch, cutoff)
+        corrected += fixed
+        collected += removed
+
+    try:
+        with os.scandir(default_storage.path(PREFIX)) as scan:
+            for entry in scan:
+                if entry.name.endswith('.tmp') and entry.stat().st_mtime < time.time() - grace_hours * 3600:
+                    _remove(entry.path)
+    except FileNotFoundError:
+        pass
+    return corrected, collected
+
+
+def _recount_batch(blobs, cutoff):
+    from .models import Document, MediaBlob
+
+    counts = dict(
+        Document.objects.filter(file__in=[name for name, _ in blobs])
+        .values_list('file').annotate(count=Count('id')).order_by()
+    )
+    corrected = collected = 0
+    for name, references in blobs:
+        actual = counts.get(name, 0)
+        if references != actual:
+            # Skipped if referenced meanwhile
+            corrected += MediaBlob.objects.filter(name=name, referenced_at__lt=cutoff).update(references=actual)
+        if actual == 0:
+            with transaction.atomic():
+                deleted, _ = MediaBlob.objects.filter(name=name, references=0, referenced_at__lt=cutoff).delete()
+                if deleted:
+                    _remove(default_storage.path(name))
+                    collected += 1
+    return corrected, collected
+
+
+def import_legacy():
+    """Move document files stored as plain copies into the store, returns
+    ``(imported, missing)`` counts"""
+    from .models import Document
+
+    imported = missing = 0
+    documents = Document.objects.exclude(file__startswith=PREFIX).exclude(file='').values_list('id', 'file')
+    for document_id, old in documents.iterator(chunk_size=RECOUNT_BATCH):
+        try:
+            with default_storage.open(old, 'rb') as content:
+                name = default_storage.save(old, content)
+        except FileNotFoundError:
+            missing += 1
+            continue
+        if not Document.objects.filter(id=document_id, file=old).update(file=name):
+            # The document was deleted or changed meanwhile
+            release(name)
+            continue
+        imported += 1
+        if not Document.objects.filter(file=old).exists():
+            default_storage.delete(old)
+    return imported, missing
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:20
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageCacheEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('stage', models.CharField(max_length=100)),
+                ('version', models.CharField(max_length=100)),
+                ('output', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Stage cache entries',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_stage_cache_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event', models.CharField(max_length=50)),
+                ('stage', models.CharField(blank=True, default='', max_length=100)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.document')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.job')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['document', 'id'], name='api_analysi_documen_855912_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_analysis_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='params',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_job_params'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='document_uploaded_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['file_type', '-uploaded_at', '-id'], name='document_type_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['processed', '-uploaded_at', '-id'], name='document_processed_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_document_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='citation',
+            index=models.Index(fields=['document', '-detected_at'], name='citation_doc_detected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conferencesuggestion',
+            index=models.Index(fields=['document', '-confidence_score'], name='conference_doc_confidence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plagiarismcheck',
+            index=models.Index(fields=['document', '-checked_at'], name='plagiarism_doc_checked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='summary',
+            index=models.Index(fields=['document', '-generated_at'], name='summary_doc_generated_idx'),
+        ),
+    ]
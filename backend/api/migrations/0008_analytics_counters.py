@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:50
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_existing_rows(apps, schema_editor):
+    """Seed the single counters row from the current tables. The old
+    processing time was an estimate (2.5s per document), so start it at zero."""
+    Analytics = apps.get_model('api', 'Analytics')
+    Document = apps.get_model('api', 'Document')
+    today = timezone.localdate()
+
+    counts = {
+        'total_documents': Document.objects.count(),
+        'processed_documents': Document.objects.filter(processed=True).count(),
+        'documents_today': Document.objects.filter(uploaded_at__date=today).count(),
+        'documents_today_date': today,
+        'citations_found': apps.get_model('api', 'Citation').objects.count(),
+        'plagiarism_detected': apps.get_model('api', 'PlagiarismCheck').objects.count(),
+        'conferences_matched': apps.get_model('api', 'ConferenceSuggestion').objects.count(),
+        'total_processing_time': 0.0,
+        'average_accuracy': 95.5,
+        'updated_at': timezone.now(),
+    }
+    analytics = Analytics.objects.order_by('id').first()
+    if analytics is None:
+        Analytics.objects.create(**counts)
+    else:
+        Analytics.objects.exclude(id=analytics.id).delete()
+        Analytics.objects.filter(id=analytics.id).update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_related_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analytics',
+            name='documents_today_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analytics',
+            name='processed_documents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
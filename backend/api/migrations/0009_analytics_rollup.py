@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_analytics_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(max_length=10)),
+                ('metric', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['granularity', 'metric', 'bucket'],
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='analytics_rollup_range_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='analyticsrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'metric', 'bucket'), name='analytics_rollup_bucket_uniq'),
+        ),
+    ]
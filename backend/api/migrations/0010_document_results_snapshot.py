@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_analytics_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentResultsSnapshot',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='results_snapshot', serialize=False, to='api.document')),
+                ('content', models.BinaryField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('stale', models.BooleanField(default=False)),
+                ('rendered_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
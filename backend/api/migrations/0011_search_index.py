@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:10
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+SQLITE_INDEX = [
+    # External-content FTS5 table: the text stays in api_searchentry
+    """CREATE VIRTUAL TABLE api_searchentry_fts USING fts5(
+        body, content='api_searchentry', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER api_searchentry_fts_insert AFTER INSERT ON api_searchentry BEGIN
+        INSERT INTO api_searchentry_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER api_searchentry_fts_delete AFTER DELETE ON api_searchentry BEGIN
+        INSERT INTO api_searchentry_fts(api_searchentry_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER api_searchentry_fts_update AFTER UPDATE OF body ON api_searchentry BEGIN
+        INSERT INTO api_searchentry_fts(api_searchentry_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO api_searchentry_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_searchentry_fts_insert',
+    'DROP TRIGGER IF EXISTS api_searchentry_fts_delete',
+    'DROP TRIGGER IF EXISTS api_searchentry_fts_update',
+    'DROP TABLE IF EXISTS api_searchentry_fts',
+]
+
+POSTGRES_INDEX = [
+    "CREATE INDEX api_searchentry_body_tsv ON api_searchentry USING GIN (to_tsvector('english', body))",
+]
+
+POSTGRES_DROP = ['DROP INDEX IF EXISTS api_searchentry_body_tsv']
+
+
+def create_text_index(apps, schema_editor):
+    """Create the backend's full-text index over api_searchentry.body, then
+    index the existing summaries and citations (document texts were not
+    stored before this migration; see ``manage.py rebuild_search_index``)"""
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}.get(vendor, [])
+    try:
+        for statement in statements:
+            schema_editor.execute(statement)
+    except OperationalError as e:
+        # SQLite built without FTS5: search.py falls back to substring matching
+        print(f"⚠️ Full-text index not created ({e}); search will use substring matching")
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+    for kind, table, column in [('summary', 'api_summary', 'content'), ('citation', 'api_citation', 'text')]:
+        schema_editor.execute(
+            f"INSERT INTO api_searchentry (kind, object_id, document_id, body) "
+            f"SELECT '{kind}', id, document_id, {column} FROM {table}"
+        )
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_document_results_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='api.document')),
+                ('text', models.TextField()),
+                ('text_sha256', models.CharField(max_length=64)),
+                ('extracted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.UUIDField(unique=True)),
+                ('body', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='api.document')),
+            ],
+            options={
+                'verbose_name_plural': 'Search entries',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
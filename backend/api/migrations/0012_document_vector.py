@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentVector',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vector', serialize=False, to='api.document')),
+                ('vector', models.BinaryField()),
+                ('version', models.CharField(max_length=50)),
+                ('text_sha256', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_document_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassageIndex',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='passage_index', serialize=False, to='api.document')),
+                ('version', models.CharField(max_length=50)),
+                ('text_sha256', models.CharField(max_length=64)),
+                ('passages', models.JSONField(default=list)),
+                ('lengths', models.JSONField(default=list)),
+                ('postings', models.JSONField(default=dict)),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Passage indexes',
+            },
+        ),
+    ]
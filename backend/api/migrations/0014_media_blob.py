@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_passage_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('sha256', models.CharField(max_length=64)),
+                ('extension', models.CharField(blank=True, default='', max_length=10)),
+                ('codec', models.CharField(blank=True, default='', max_length=10)),
+                ('size', models.BigIntegerField()),
+                ('stored_size', models.BigIntegerField()),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('referenced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mediablob',
+            constraint=models.UniqueConstraint(fields=('sha256', 'extension'), name='media_blob_content_uniq'),
+        ),
+    ]
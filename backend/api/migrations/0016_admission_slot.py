@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50)),
+                ('slot', models.IntegerField()),
+                ('holder', models.CharField(blank=True, default='', max_length=32)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['scope', 'slot'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='admissionslot',
+            constraint=models.UniqueConstraint(fields=('scope', 'slot'), name='admission_slot_uniq'),
+        ),
+    ]
@@ -7,6 +7,8 @@ class Document(models.Model):
     """Model for uploaded documents"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
+    # Saved to the content-addressed media store (``media_store.py``), which
+    # names files by their hash; only the extension of the upload name is kept
     file = models.FileField(upload_to='documents/')
     file_type = models.CharField(max_length=50)
     size = models.BigIntegerField()
@@ -18,6 +20,12 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination of the document list, unfiltered and per filter
+            models.Index(fields=['-uploaded_at', '-id'], name='document_uploaded_id_idx'),
+            models.Index(fields=['file_type', '-uploaded_at', '-id'], name='document_type_uploaded_idx'),
+            models.Index(fields=['processed', '-uploaded_at', '-id'], name='document_processed_idx'),
+        ]
 
 
 class Summary(models.Model):
@@ -33,6 +41,9 @@ class Summary(models.Model):
     
     class Meta:
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['document', '-generated_at'], name='summary_doc_generated_idx'),
+        ]
 
 
 class Citation(models.Model):
@@ -49,6 +60,9 @@ class Citation(models.Model):
     
     class Meta:
         ordering = ['-detected_at']
+        indexes = [
+            models.Index(fields=['document', '-detected_at'], name='citation_doc_detected_idx'),
+        ]
 
 
 class PlagiarismCheck(models.Model):
@@ -65,6 +79,9 @@ class PlagiarismCheck(models.Model):
     
     class Meta:
         ordering = ['-checked_at']
+        indexes = [
+            models.Index(fields=['document', '-checked_at'], name='plagiarism_doc_checked_idx'),
+        ]
 
 
 class ConferenceSuggestion(models.Model):
@@ -81,16 +98,155 @@ class ConferenceSuggestion(models.Model):
     
     class Meta:
         ordering = ['-confidence_score']
+        indexes = [
+            models.Index(fields=['document', '-confidence_score'], name='conference_doc_confidence_idx'),
+        ]
+
+
+class DocumentResultsSnapshot(models.Model):
+    """Pre-rendered ``/api/documents/<id>/`` response (see ``snapshots.py``).
+
+    ``version`` increases on every rewrite and is served as the ETag;
+    ``stale`` marks a snapshot whose rows changed since it was rendered.
+    """
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, primary_key=True, related_name='results_snapshot'
+    )
+    content = models.BinaryField()
+    version = models.PositiveIntegerField(default=1)
+    stale = models.BooleanField(default=False)
+    rendered_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Results snapshot v{self.version} - {self.document_id}"
+
+
+class DocumentContent(models.Model):
+    """Text extracted from a document, stored once at upload and refreshed by
+    analysis runs. ``text_sha256`` identifies the text, so derived indexes
+    can tell whether it changed."""
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, primary_key=True, related_name='content'
+    )
+    text = models.TextField()
+    text_sha256 = models.CharField(max_length=64)
+    extracted_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Text of {self.document_id} ({len(self.text)} characters)"
+
+
+class DocumentVector(models.Model):
+    """Hashed term vector of a document's text for similarity search (see ``similarity.py``).
+
+    ``version`` names the vectoriser that produced it; rows from another
+    version are ignored until ``manage.py rebuild_similarity_index`` runs.
+    """
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, primary_key=True, related_name='vector'
+    )
+    vector = models.BinaryField()
+    version = models.CharField(max_length=50)
+    text_sha256 = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Vector {self.version} - {self.document_id}"
+
+
+class PassageIndex(models.Model):
+    """BM25 index over a document's text split into passages, for questions
+    about the document (see ``retrieval.py``).
+
+    Built from the text with hash ``text_sha256`` by the ``version`` of the
+    chunker and tokenizer; either changing makes the next question rebuild it.
+    ``postings`` maps each term to a flat ``[passage, frequency, ...]`` list.
+    """
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, primary_key=True, related_name='passage_index'
+    )
+    version = models.CharField(max_length=50)
+    text_sha256 = models.CharField(max_length=64)
+    passages = models.JSONField(default=list)
+    lengths = models.JSONField(default=list)
+    postings = models.JSONField(default=dict)
+    built_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Passage index {self.version} - {self.document_id} ({len(self.passages)} passages)"
+    
+    class Meta:
+        verbose_name_plural = 'Passage indexes'
+
+
+class SearchEntry(models.Model):
+    """Full-text search index entry for a document text, summary or citation (see ``search.py``).
+
+    On SQLite the ``api_searchentry_fts`` FTS5 table indexes ``body`` and is
+    kept in step by triggers on this table. The SQLite schema editor rebuilds
+    a table to alter it, which drops the triggers, so migrations that change
+    this model must recreate them.
+    """
+    KINDS = ['document', 'summary', 'citation']
+
+    # Integer id: it is the FTS5 rowid
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20)
+    object_id = models.UUIDField(unique=True)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='search_entries')
+    body = models.TextField()
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'Search entries'
+
+
+class MediaBlob(models.Model):
+    """A file in the content-addressed media store (see ``media_store.py``).
+
+    ``name`` is the storage name documents refer to, derived from the SHA-256
+    of the content, the ``codec`` it is compressed with (if any) and its
+    extension. ``references`` counts the documents using it; the file is
+    deleted when the last one goes. ``size`` is the original size in bytes,
+    ``stored_size`` the size on disk.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    sha256 = models.CharField(max_length=64)
+    extension = models.CharField(max_length=10, blank=True, default='')
+    codec = models.CharField(max_length=10, blank=True, default='')
+    size = models.BigIntegerField()
+    stored_size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    referenced_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'extension'], name='media_blob_content_uniq'),
+        ]
 
 
 class Analytics(models.Model):
-    """Model for analytics data"""
+    """Model for analytics data.
+
+    A single row of counters, kept up to date by ``AnalyticsService.record``
+    as documents and results are created and deleted (see ``signals.py``).
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     total_documents = models.IntegerField(default=0)
+    processed_documents = models.IntegerField(default=0)
     total_processing_time = models.FloatField(default=0.0)
     average_accuracy = models.FloatField(default=0.0)
     success_rate = models.FloatField(default=100.0)
     documents_today = models.IntegerField(default=0)
+    documents_today_date = models.DateField(null=True, blank=True)
     citations_found = models.IntegerField(default=0)
     plagiarism_detected = models.IntegerField(default=0)
     conferences_matched = models.IntegerField(default=0)
@@ -102,3 +258,117 @@ class Analytics(models.Model):
     class Meta:
         ordering = ['-updated_at']
         verbose_name_plural = 'Analytics'
+
+
+class AnalyticsRollup(models.Model):
+    """Hourly and daily totals of one metric, maintained by ``AnalyticsService.rollup``.
+
+    ``count`` is the number of occurrences in the bucket and ``total`` an
+    optional amount summed over them (seconds for stage latencies, tokens
+    for LLM usage).
+    """
+    GRANULARITIES = ['hour', 'day']
+
+    granularity = models.CharField(max_length=10)
+    metric = models.CharField(max_length=100)
+    bucket = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    
+    def __str__(self):
+        return f"{self.metric} @ {self.bucket.isoformat()} ({self.granularity}): {self.count}"
+    
+    class Meta:
+        ordering = ['granularity', 'metric', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'metric', 'bucket'], name='analytics_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket'], name='analytics_rollup_range_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Model for background jobs processed by `manage.py run_job_worker`"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    kind = models.CharField(max_length=50, default='analysis')
+    status = models.CharField(max_length=20, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    stages = models.JSONField(default=dict)
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class StageCacheEntry(models.Model):
+    """Model for cached pipeline stage outputs, keyed by a hash of the stage inputs"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=64, unique=True)
+    stage = models.CharField(max_length=100)
+    version = models.CharField(max_length=100)
+    output = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.stage} v{self.version} ({self.key[:12]})"
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Stage cache entries'
+
+
+class AnalysisEvent(models.Model):
+    """Model for analysis progress events streamed to clients over SSE"""
+    # Sequential id rather than a UUID: it orders the stream and is the SSE event id
+    id = models.BigAutoField(primary_key=True)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='events')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='events', null=True, blank=True)
+    event = models.CharField(max_length=50)
+    stage = models.CharField(max_length=100, blank=True, default='')
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.event} {self.stage} for {self.document.name}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['document', 'id']),
+        ]
+
+
+class AdmissionSlot(models.Model):
+    """A running-request slot of an admission-controlled scope (see ``admission.py``).
+
+    A scope has one row per unit of concurrency. A slot is free when it has
+    no holder or its lease expired (the holding process died).
+    """
+    scope = models.CharField(max_length=50)
+    slot = models.IntegerField()
+    holder = models.CharField(max_length=32, blank=True, default='')
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.scope} slot {self.slot} ({self.holder or 'free'})"
+    
+    class Meta:
+        ordering = ['scope', 'slot']
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'slot'], name='admission_slot_uniq'),
+        ]
@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are ordered on ``(uploaded_at, id)`` descending. The cursor carries the
+sort key of the last row served, and the next page is the rows strictly
+after it. With an index on the same columns each page is an index range
+scan, so fetch time does not depend on how deep the client has paged or on
+the size of the table (unlike OFFSET, which reads and discards every
+skipped row).
+"""
+
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``"""
+
+
+def encode_cursor(obj):
+    """Opaque cursor pointing just after ``obj`` (a model instance or ``.values()`` dict)"""
+    if isinstance(obj, dict):
+        uploaded_at, pk = obj['uploaded_at'], obj['id']
+    else:
+        uploaded_at, pk = obj.uploaded_at, obj.id
+    payload = json.dumps([uploaded_at.isoformat(), str(pk)])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (uploaded_at, id) from a cursor"""
+    try:
+        uploaded_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        uploaded_at = parse_datetime(uploaded_at)
+        if uploaded_at is None:
+            raise ValueError(uploaded_at)
+        return uploaded_at, uuid.UUID(pk)
+    except (ValueError, TypeError, UnicodeEncodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def paginate(queryset, cursor=None, limit=50):
+    """Return (rows, next_cursor) for one page of ``queryset``, newest first.
+
+    ``next_cursor`` is None on the last page.
+    """
+    queryset = queryset.order_by('-uploaded_at', '-id')
+    if cursor:
+        uploaded_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+
+    # One extra row tells us whether there is another page
+    rows = list(queryset[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
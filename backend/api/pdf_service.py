@@ -4,19 +4,55 @@ PDF Report Service for generating document analysis reports
 """
 
 from io import BytesIO
+from itertools import islice
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from django.db.models import Avg, Count
 from django.utils import timezone
 import json
 
 
+class _LazyStory(list):
+    """A story that is generated while ReportLab draws it.
+    
+    ``doc.build`` only looks at the first few flowables, deletes each one
+    once it is drawn and puts split remainders back at the front, so the
+    list is refilled from ``flowables`` (an iterator) as it drains and only
+    a few flowables exist at a time.
+    """
+    
+    LOOKAHEAD = 8
+    
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+        self._fill()
+    
+    def _fill(self):
+        while self._source is not None and len(self) < self.LOOKAHEAD:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+    
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._fill()
+
+
 class PDFReportService:
     """Service for generating PDF reports"""
     
+    # Part of the report cache key (``report_cache.py``): bump when the layout changes
+    VERSION = 2
+    
+    # Citation rows per table chunk, about one A4 page
+    CITATION_TABLE_ROWS = 30
+    
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
@@ -66,54 +102,63 @@ class PDFReportService:
     
     def generate_document_report(self, document, summaries, citations, plagiarism_checks, conference_suggestions):
         """Generate a comprehensive PDF report for a document"""
-        
-        # Create PDF buffer
         buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+        self.write_document_report(buffer, document, summaries, citations, plagiarism_checks, conference_suggestions)
         
-        # Build story (content)
-        story = []
+        # Get PDF content
+        pdf_content = buffer.getvalue()
+        buffer.close()
         
+        return pdf_content
+    
+    def write_document_report(self, output, document, summaries, citations, plagiarism_checks, conference_suggestions):
+        """Write the PDF report for a document to ``output`` (a binary file).
+        
+        ``citations`` is a queryset: its rows are read in chunks while the
+        citation tables are drawn, so memory use does not grow with the
+        number of citations (see ``_LazyStory``).
+        """
+        doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+        citation_stats = citations.aggregate(count=Count('pk'), average=Avg('confidence'))
+        
+        # Build PDF
+        doc.build(_LazyStory(self._story(
+            document, summaries, citations, citation_stats, plagiarism_checks, conference_suggestions
+        )))
+    
+    def _story(self, document, summaries, citations, citation_stats, plagiarism_checks, conference_suggestions):
+        """The report's flowables, in order"""
         # Title page
-        story.extend(self._create_title_page(document))
-        story.append(PageBreak())
+        yield from self._create_title_page(document)
+        yield PageBreak()
         
         # Executive summary
-        story.extend(self._create_executive_summary(document, summaries, citations, plagiarism_checks, conference_suggestions))
-        story.append(PageBreak())
+        yield from self._create_executive_summary(document, summaries, citation_stats, plagiarism_checks, conference_suggestions)
+        yield PageBreak()
         
         # Document details
-        story.extend(self._create_document_details(document))
-        story.append(Spacer(1, 20))
+        yield from self._create_document_details(document)
+        yield Spacer(1, 20)
         
         # Summaries section
         if summaries:
-            story.extend(self._create_summaries_section(summaries))
-            story.append(Spacer(1, 20))
+            yield from self._create_summaries_section(summaries)
+            yield Spacer(1, 20)
         
         # Citations section
-        if citations:
-            story.extend(self._create_citations_section(citations))
-            story.append(Spacer(1, 20))
+        if citation_stats['count']:
+            yield from self._create_citations_section(citations, citation_stats)
+            yield Spacer(1, 20)
         
         # Plagiarism analysis section
         if plagiarism_checks:
-            story.extend(self._create_plagiarism_section(plagiarism_checks))
-            story.append(Spacer(1, 20))
+            yield from self._create_plagiarism_section(plagiarism_checks)
+            yield Spacer(1, 20)
         
         # Conference suggestions section
         if conference_suggestions:
-            story.extend(self._create_conference_section(conference_suggestions))
-            story.append(Spacer(1, 20))
-        
-        # Build PDF
-        doc.build(story)
-        
-        # Get PDF content
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_content
+            yield from self._create_conference_section(conference_suggestions)
+            yield Spacer(1, 20)
     
     def _create_title_page(self, document):
         """Create the title page"""
@@ -162,7 +207,7 @@ class PDFReportService:
         
         return story
     
-    def _create_executive_summary(self, document, summaries, citations, plagiarism_checks, conference_suggestions):
+    def _create_executive_summary(self, document, summaries, citation_stats, plagiarism_checks, conference_suggestions):
         """Create executive summary section"""
         story = []
         
@@ -176,7 +221,7 @@ class PDFReportService:
             ["Metric", "Value"],
             ["Document Name", document.name],
             ["Total Summaries", str(len(summaries))],
-            ["Citations Detected", str(len(citations))],
+            ["Citations Detected", str(citation_stats['count'])],
             ["Plagiarism Checks", str(len(plagiarism_checks))],
             ["Conference Suggestions", str(len(conference_suggestions))],
         ]
@@ -209,7 +254,7 @@ class PDFReportService:
         findings = []
         if summaries:
             findings.append("• AI-generated summaries provide concise document overview")
-        if citations:
+        if citation_stats['count']:
             findings.append("• Multiple citations detected and analyzed for accuracy")
         if plagiarism_checks:
             findings.append("• Plagiarism analysis completed with similarity scoring")
@@ -285,25 +330,47 @@ class PDFReportService:
         
         return story
     
-    def _create_citations_section(self, citations):
-        """Create citations section"""
-        story = []
-        
+    def _create_citations_section(self, citations, citation_stats):
+        """Create citations section.
+        
+        The table is split into tables of CITATION_TABLE_ROWS rows, each about
+        a page long: ReportLab lays out a table as a whole and re-splits it at
+        every page break, which is quadratic in its length. Rows are read
+        from the database only when their table is reached.
+        """
         title = Paragraph("Detected Citations", self.section_style)
-        story.append(title)
-        story.append(Spacer(1, 12))
+        yield title
+        yield Spacer(1, 12)
+        
+        rows = citations.values_list('text', 'source', 'confidence').iterator(chunk_size=self.CITATION_TABLE_ROWS * 10)
+        while True:
+            chunk = list(islice(rows, self.CITATION_TABLE_ROWS))
+            if not chunk:
+                break
+            yield self._create_citations_table(chunk)
+        yield Spacer(1, 12)
+        
+        # Summary stats
+        total_citations = citation_stats['count']
+        avg_confidence = citation_stats['average'] or 0
         
-        # Citations table
+        stats_text = f"<b>Citation Analysis:</b> {total_citations} citations detected with average confidence of {avg_confidence:.1%}"
+        stats_para = Paragraph(stats_text, self.normal_style)
+        yield stats_para
+    
+    def _create_citations_table(self, rows):
+        """One chunk of the citations table, with its own header row"""
         citations_data = [["Citation Text", "Source", "Confidence"]]
-        for citation in citations:
-            text = citation.text[:50] + "..." if len(citation.text) > 50 else citation.text
+        for text, source, confidence in rows:
+            text = text[:50] + "..." if len(text) > 50 else text
             citations_data.append([
                 text,
-                citation.source,
-                f"{citation.confidence:.1%}"
+                source,
+                f"{confidence:.1%}"
             ])
         
-        citations_table = Table(citations_data, colWidths=[3*inch, 2*inch, 1*inch])
+        # The header is repeated if a chunk starting low on a page is split
+        citations_table = Table(citations_data, colWidths=[3*inch, 2*inch, 1*inch], repeatRows=1)
         citations_table.setStyle(TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
@@ -313,19 +380,7 @@ class PDFReportService:
             ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
             ('GRID', (0, 0), (-1, -1), 1, colors.grey),
         ]))
-        
-        story.append(citations_table)
-        story.append(Spacer(1, 12))
-        
-        # Summary stats
-        total_citations = len(citations)
-        avg_confidence = sum(citation.confidence for citation in citations) / total_citations if citations else 0
-        
-        stats_text = f"<b>Citation Analysis:</b> {total_citations} citations detected with average confidence of {avg_confidence:.1%}"
-        stats_para = Paragraph(stats_text, self.normal_style)
-        story.append(stats_para)
-        
-        return story
+        return citations_table
     
     def _create_plagiarism_section(self, plagiarism_checks):
         """Create plagiarism analysis section"""
@@ -0,0 +1,351 @@
+"""
+Declarative document pipeline with per-stage result caching.
+
+A pipeline is a DAG of ``PipelineStage`` objects. Each stage names its inputs
+(pipeline parameters or other stages) and a version. Its cache key is the
+hash of the stage name, version and the digests of its inputs, so an output
+is only recomputed when something it depends on changed: new file content,
+new parameters, a bumped stage version or a new conference model version.
+Stages whose inputs are all available run concurrently on the
+``StageExecutor`` (or as coroutines under ``Pipeline.arun``); ``persist``
+hooks run on the calling thread afterwards and are never cached.
+
+Cache entries are only written, never updated on a hit, so ``prune_cache``
+removes entries written for older stage versions (they can never be hit
+again) and any older than STAGE_CACHE_RETENTION_DAYS.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .models import StageCacheEntry
+from .stage_executor import Stage, StageExecutor, StageResult, timed
+
+
+def digest(value):
+    """Stable SHA-256 digest of a JSON-serialisable value"""
+    payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Uncached:
+    """Return value wrapper for stage functions whose output must not be cached
+    (for example a fallback produced because an external API failed)"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Metered:
+    """Return value wrapper reporting the resources a stage used (for example
+    LLM tokens) as ``info['usage']`` when the stage finishes. Only the wrapped
+    value is cached, so cache hits report no usage."""
+
+    def __init__(self, value, usage):
+        self.value = value
+        self.usage = usage
+
+
+class PipelineStage:
+    """A node in the pipeline.
+
+    ``func`` is called with the values of ``inputs`` as positional arguments,
+    in order (preceded by ``context`` when ``pass_context`` is set; context is
+    never hashed, so it must only carry handles such as the Document instance).
+    ``afunc`` is an optional coroutine function with the same signature,
+    awaited instead of ``func`` by ``Pipeline.arun``.
+    ``version`` may be a callable, evaluated when the pipeline runs.
+    ``persist(context, result, inputs)`` stores the output and returns a
+    small JSON summary for progress reporting.
+    """
+
+    def __init__(self, name, func, inputs=(), version='1', kind='thread',
+                 cacheable=True, pass_context=False, persist=None, afunc=None):
+        self.name = name
+        self.func = func
+        self.afunc = afunc
+        self.inputs = list(inputs)
+        self.version = version
+        self.kind = kind
+        self.cacheable = cacheable
+        self.pass_context = pass_context
+        self.persist = persist
+
+    def resolve_version(self):
+        return str(self.version() if callable(self.version) else self.version)
+
+
+class Pipeline:
+    """Runs the stages needed for a set of targets, reusing cached outputs"""
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def required_stages(self, targets):
+        """Return the targets and every stage they depend on"""
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in required:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage: {name}")
+            required.add(name)
+            pending.extend(dep for dep in self.stages[name].inputs if dep in self.stages)
+        return required
+
+    def _ready(self, required, results):
+        """Required stages that have not run yet and whose inputs are all available"""
+        return [
+            self.stages[name] for name in sorted(required - set(results))
+            if all(dep in results or dep not in self.stages for dep in self.stages[name].inputs)
+        ]
+
+    def _prepare(self, stage, results, digests, on_stage):
+        """Return the cache key of a ready stage, or None if an input stage failed"""
+        failed_inputs = [dep for dep in stage.inputs if dep in results and not results[dep].ok]
+        if failed_inputs:
+            results[stage.name] = StageResult(
+                stage.name, error=RuntimeError(f"Input stage failed: {', '.join(failed_inputs)}")
+            )
+            on_stage(stage.name, 'failed', {'error': str(results[stage.name].error)})
+            return None
+
+        missing = [name for name in stage.inputs if name not in digests]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' is missing inputs: {', '.join(missing)}")
+
+        return digest({
+            'stage': stage.name,
+            'version': stage.resolve_version(),
+            'inputs': {name: digests[name] for name in stage.inputs},
+        })
+
+    def run(self, params, targets, context=None, on_stage=None):
+        """Run ``targets`` and their dependencies, returns ``{stage: StageResult}``.
+
+        ``on_stage(stage, status, info)`` reports ``'running'``, ``'cached'``,
+        ``'completed'`` and ``'failed'`` transitions.
+        """
+        context = context or {}
+        on_stage = on_stage or (lambda stage, status, info=None: None)
+        required = self.required_stages(targets)
+
+        results = {}
+        digests = {name: digest(value) for name, value in params.items()}
+        executor = StageExecutor()
+
+        while len(results) < len(required):
+            to_compute = []
+            keys = {}
+            for stage in self._ready(required, results):
+                keys[stage.name] = self._prepare(stage, results, digests, on_stage)
+                if keys[stage.name] is None:
+                    continue
+
+                cached = None
+                if stage.cacheable:
+                    cached = StageCacheEntry.objects.filter(key=keys[stage.name]).values_list('output', flat=True).first()
+                if cached is not None:
+                    result = StageResult(stage.name, value=cached, cached=True)
+                    self._finish(stage, result, keys, results, digests, context, on_stage, params)
+                else:
+                    to_compute.append(stage)
+
+            if not to_compute:
+                continue
+
+            def start(name):
+                on_stage(name, 'running')
+
+            def finish(result):
+                self._finish(self.stages[result.name], result, keys, results, digests, context, on_stage, params)
+
+            executor.run(
+                [
+                    Stage(
+                        stage.name,
+                        _call_stage,
+                        (stage.func, self._inputs(stage, results, params), context if stage.pass_context else None),
+                        kind=stage.kind
+                    )
+                    for stage in to_compute
+                ],
+                on_start=start,
+                on_finish=finish
+            )
+        return results
+
+    async def arun(self, params, targets, context=None, on_stage=None):
+        """Async variant of ``run`` for ASGI views.
+
+        Stages with an ``afunc`` are awaited on the event loop; the others are
+        offloaded to the StageExecutor pools. Cache lookups use the async ORM,
+        and ``_finish`` (cache writes, persist hooks, ``on_stage``) runs
+        through ``sync_to_async`` so blocking ORM calls stay off the loop.
+        """
+        context = context or {}
+        on_stage = on_stage or (lambda stage, status, info=None: None)
+        report = sync_to_async(on_stage)
+        finish = sync_to_async(self._finish)
+        required = self.required_stages(targets)
+
+        results = {}
+        digests = {name: digest(value) for name, value in params.items()}
+        loop = asyncio.get_running_loop()
+
+        async def compute(stage, inputs):
+            stage_context = context if stage.pass_context else None
+            try:
+                if stage.afunc is not None:
+                    started = time.perf_counter()
+                    args = ([stage_context] if stage_context is not None else []) + list(inputs.values())
+                    value = await stage.afunc(*args)
+                    return StageResult(stage.name, value=value, elapsed=time.perf_counter() - started)
+                value, elapsed = await loop.run_in_executor(
+                    StageExecutor.pool(stage.kind), timed, _call_stage, (stage.func, inputs, stage_context)
+                )
+                return StageResult(stage.name, value=value, elapsed=elapsed)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    StageExecutor._discard_broken_process_pool()
+                return StageResult(stage.name, error=e)
+
+        while len(results) < len(required):
+            to_compute = []
+            keys = {}
+            for stage in self._ready(required, results):
+                keys[stage.name] = await sync_to_async(self._prepare)(stage, results, digests, on_stage)
+                if keys[stage.name] is None:
+                    continue
+
+                cached = None
+                if stage.cacheable:
+                    cached = await StageCacheEntry.objects.filter(
+                        key=keys[stage.name]
+                    ).values_list('output', flat=True).afirst()
+                if cached is not None:
+                    result = StageResult(stage.name, value=cached, cached=True)
+                    await finish(stage, result, keys, results, digests, context, on_stage, params)
+                else:
+                    to_compute.append(stage)
+
+            tasks = []
+            for stage in to_compute:
+                await report(stage.name, 'running')
+                tasks.append(asyncio.ensure_future(compute(stage, self._inputs(stage, results, params))))
+
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                await finish(self.stages[result.name], result, keys, results, digests, context, on_stage, params)
+        return results
+
+    def prune_cache(self, max_age_days=None):
+        """Delete cache entries of this pipeline's stages written for another
+        version, and all entries older than ``max_age_days``
+        (STAGE_CACHE_RETENTION_DAYS). Returns the number deleted."""
+        max_age_days = settings.STAGE_CACHE_RETENTION_DAYS if max_age_days is None else max_age_days
+        deleted = 0
+        for stage in self.stages.values():
+            if stage.cacheable:
+                removed, _ = StageCacheEntry.objects.filter(stage=stage.name).exclude(
+                    version=stage.resolve_version()
+                ).delete()
+                deleted += removed
+        removed, _ = StageCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=max_age_days)
+        ).delete()
+        return deleted + removed
+
+    def _inputs(self, stage, results, params):
+        return {
+            name: results[name].value if name in self.stages else params[name]
+            for name in stage.inputs
+        }
+
+    def _finish(self, stage, result, keys, results, digests, context, on_stage, params):
+        """Cache, persist and report a finished stage (runs on the calling thread)"""
+        cacheable = stage.cacheable
+        usage = None
+        if isinstance(result.value, Metered):
+            usage = result.value.usage
+            result.value = result.value.value
+        if isinstance(result.value, Uncached):
+            result.value = result.value.value
+            cacheable = False
+        cached = result.cached
+
+        if result.ok:
+            digests[stage.name] = digest(result.value)
+            if cacheable and not cached:
+                _store_cache_entry(keys[stage.name], {
+                    'stage': stage.name,
+                    'version': stage.resolve_version(),
+                    'output': result.value,
+                })
+        results[stage.name] = result
+
+        info = {'elapsed': result.elapsed, 'cached': cached}
+        if usage:
+            info['usage'] = usage
+        if stage.persist:
+            info.update(stage.persist(context, result, self._inputs(stage, results, params)) or {})
+
+        if result.ok:
+            on_stage(stage.name, 'cached' if cached else 'completed', info)
+        elif stage.persist:
+            # The persist hook stored a fallback, so the stage still completed
+            info['error'] = str(result.error)
+            on_stage(stage.name, 'completed', info)
+        else:
+            on_stage(stage.name, 'failed', {'error': str(result.error)})
+
+
+def _store_cache_entry(key, values):
+    """Insert or refresh a cache entry.
+
+    Avoids update_or_create: its read-then-write transaction fails straight
+    away with "database is locked" on SQLite when several threads write.
+    """
+    if StageCacheEntry.objects.filter(key=key).update(**values):
+        return
+    try:
+        StageCacheEntry.objects.create(key=key, **values)
+    except IntegrityError:
+        # Another worker stored the same key first
+        StageCacheEntry.objects.filter(key=key).update(**values)
+
+
+def _call_stage(func, inputs, context):
+    """Invoke a stage function in a pool worker"""
+    if context is not None:
+        return func(context, *inputs.values())
+    return func(*inputs.values())
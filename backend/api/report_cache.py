@@ -0,0 +1,119 @@
+"""
+On-disk cache of rendered PDF reports (``/api/documents/<id>/export/``).
+
+Building a report with ReportLab takes seconds for long citation tables, and
+the same report is often downloaded many times. Reports are stored under
+``PDF_REPORT_CACHE_DIR`` as ``<document id>-r<layout>-v<results version>.pdf``:
+the results version is the document's results snapshot version
+(``snapshots.py``), which changes whenever new results are stored, results
+are deleted or the document is edited, so an outdated report is never
+served. ``layout`` is ``PDFReportService.VERSION``, bumped when the report
+layout changes.
+
+Writing a report removes the document's other versions, then evicts the
+least recently used files until the directory is within
+``PDF_REPORT_CACHE_MAX_BYTES``. A hit touches the file's modification time,
+which is what recency is measured by (access times are often not kept).
+The directory is shared by every process; files are written under a
+temporary name and renamed into place, so readers never see a partial
+report.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+
+SUFFIX = '.pdf'
+
+
+def _path(document_id, layout, version):
+    return os.path.join(settings.PDF_REPORT_CACHE_DIR, f'{document_id}-r{layout}-v{version}{SUFFIX}')
+
+
+def enabled():
+    return settings.PDF_REPORT_CACHE_MAX_BYTES > 0
+
+
+def open_report(document_id, layout, version):
+    """The cached report opened for reading, or None.
+
+    The open file stays readable even if another process evicts it meanwhile.
+    """
+    if not enabled():
+        return None
+    path = _path(document_id, layout, version)
+    try:
+        report = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return report
+
+
+def store(document_id, layout, version, source):
+    """Cache a rendered report read from ``source`` (a binary file positioned
+    at its start), returns the cached copy opened for reading"""
+    os.makedirs(settings.PDF_REPORT_CACHE_DIR, exist_ok=True)
+    path = _path(document_id, layout, version)
+    descriptor, temporary = tempfile.mkstemp(dir=settings.PDF_REPORT_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as report:
+            shutil.copyfileobj(source, report)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    report = open(path, 'rb')
+    discard(document_id, keep=path)
+    evict()
+    return report
+
+
+def discard(document_id, keep=None):
+    """Delete a document's cached reports (except ``keep``)"""
+    prefix = f'{document_id}-'
+    try:
+        names = os.listdir(settings.PDF_REPORT_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(settings.PDF_REPORT_CACHE_DIR, name)
+        if name.startswith(prefix) and name.endswith(SUFFIX) and path != keep:
+            _remove(path)
+
+
+def evict(max_bytes=None):
+    """Delete the least recently used reports until the cache fits in ``max_bytes``"""
+    max_bytes = settings.PDF_REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        with os.scandir(settings.PDF_REPORT_CACHE_DIR) as scan:
+            for entry in scan:
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        # Removed by another process
+        pass
@@ -0,0 +1,175 @@
+"""
+Passage retrieval for questions about a document (``/api/documents/<id>/ask/``).
+
+Sending a whole document to Gemini makes the prompt, the token bill and the
+latency grow with its length. Instead the stored text (``DocumentContent``)
+is split once into passages of about ``ASK_PASSAGE_WORDS`` words and
+indexed for BM25 ranking in a ``PassageIndex`` row. A question is scored
+against the postings of its own terms only, and the best few passages are
+all that reaches the prompt, so both stay the same size however long the
+document is.
+
+The index is built by the first question about a text and reused by the
+following ones; a changed text (new ``text_sha256``) or chunker/tokenizer
+``VERSION`` makes the next question rebuild it. Each process also keeps the
+last ``ASK_INDEX_CACHE_SIZE`` indexes loaded, so repeated questions about a
+document skip reading the postings.
+"""
+
+import math
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .analysis_service import segment_text
+from .models import DocumentContent, PassageIndex
+from .similarity import STOP_WORDS, TOKEN_PATTERN, top_k
+
+
+VERSION = 'bm25-v1'
+
+# BM25 term-frequency saturation and length normalisation
+K1 = 1.5
+B = 0.75
+
+
+def _fold(token):
+    """Fold plurals, so 'methods' matches 'method' and 'studies' matches 'study'"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Index terms of ``text``: lowercased words, stop words removed, plurals folded"""
+    return [_fold(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def version():
+    """Version of the stored indexes; includes the passage size, which settings may change"""
+    return f'{VERSION}-{settings.ASK_PASSAGE_WORDS}w'
+
+
+class BM25Index:
+    """Passages of one document with their term postings"""
+
+    def __init__(self, passages, lengths, postings):
+        self.passages = passages
+        self.lengths = lengths
+        self.postings = postings
+        lengths = np.asarray(lengths, dtype=np.float32)
+        average = lengths.mean() if len(lengths) else 0.0
+        self._norms = K1 * (1 - B + B * lengths / (average or 1.0))
+        # Postings as (passages, frequencies) arrays, converted on first use
+        self._arrays = {}
+
+    @classmethod
+    def build(cls, text, chunk_words):
+        passages = segment_text(text, chunk_words)
+        lengths = []
+        postings = {}
+        for position, passage in enumerate(passages):
+            tokens = tokenize(passage)
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).extend((position, count))
+        return cls(passages, lengths, postings)
+
+    def _posting(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            flat = np.asarray(self.postings.get(term, ()), dtype=np.int64).reshape(-1, 2)
+            arrays = self._arrays[term] = (flat[:, 0], flat[:, 1].astype(np.float32))
+        return arrays
+
+    def search(self, question, k):
+        """Top ``k`` passages for ``question`` as ``(position, score)``, best first;
+        passages sharing no term with the question are left out"""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for term in set(tokenize(question)):
+            if term not in self.postings:
+                continue
+            rows, frequencies = self._posting(term)
+            idf = math.log(1 + (len(self.passages) - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (K1 + 1) / (frequencies + self._norms[rows])
+        return [(int(row), float(scores[row])) for row in top_k(scores, k) if scores[row] > 0]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _store(document_id, text_sha256, index):
+    values = {
+        'version': version(),
+        'text_sha256': text_sha256,
+        'passages': index.passages,
+        'lengths': index.lengths,
+        'postings': index.postings,
+        'built_at': timezone.now(),
+    }
+    rows = PassageIndex.objects.filter(document_id=document_id)
+    if rows.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            PassageIndex.objects.create(document_id=document_id, **values)
+    except IntegrityError:
+        # Built concurrently by another question
+        rows.update(**values)
+
+
+def load(document_id):
+    """The current BM25Index of a document, building and storing it if needed.
+
+    Returns None when the document has no stored text.
+    """
+    document_id = str(document_id)
+    text_sha256 = DocumentContent.objects.filter(document_id=document_id).values_list('text_sha256', flat=True).first()
+    if text_sha256 is None:
+        return None
+    key = (text_sha256, version())
+    with _cache_lock:
+        cached = _cache.get(document_id)
+        if cached is not None and cached[0] == key:
+            _cache.move_to_end(document_id)
+            return cached[1]
+
+    stored = PassageIndex.objects.filter(
+        document_id=document_id, text_sha256=text_sha256, version=key[1]
+    ).values_list('passages', 'lengths', 'postings').first()
+    if stored is not None:
+        index = BM25Index(*stored)
+    else:
+        content = DocumentContent.objects.filter(document_id=document_id).values_list('text', 'text_sha256').first()
+        if content is None:
+            return None
+        text, text_sha256 = content
+        key = (text_sha256, key[1])
+        index = BM25Index.build(text, settings.ASK_PASSAGE_WORDS)
+        _store(document_id, text_sha256, index)
+
+    with _cache_lock:
+        _cache[document_id] = (key, index)
+        _cache.move_to_end(document_id)
+        while len(_cache) > settings.ASK_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def retrieve(document_id, question, k):
+    """Best passages of a document for ``question`` as dicts with ``position``,
+    ``text`` and ``score``, or None when the document has no stored text"""
+    index = load(document_id)
+    if index is None:
+        return None
+    return [
+        {'position': position, 'text': index.passages[position], 'score': score}
+        for position, score in index.search(question, k)
+    ]
@@ -0,0 +1,242 @@
+"""
+Full-text search over document texts, summaries and citations.
+
+Every searchable row has a ``SearchEntry`` holding its text. The entries
+are maintained on write: ``signals.py`` indexes saved and deleted
+summaries, citations and document texts, and code that bulk-inserts them
+calls ``index`` itself. The database does the matching and ranking:
+
+- SQLite: the ``api_searchentry_fts`` FTS5 table (porter-stemmed), kept in
+  step with ``api_searchentry`` by triggers, ranked with BM25.
+- PostgreSQL: a GIN index on ``to_tsvector('english', body)``, ranked with
+  ``ts_rank_cd``.
+- Anything else (or SQLite without FTS5): substring matching, unranked.
+
+A query matches entries containing all of its words (stemmed), so user
+input never reaches the FTS query syntax. Only the newest
+``SEARCH_MAX_CANDIDATES`` matches are ranked: scoring every match of a
+word found in most rows takes seconds on a million entries, while the
+capped query stays in the tens of milliseconds.
+"""
+
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Document, DocumentContent, Summary, Citation, SearchEntry
+
+
+# kind: (model, text field); each model has a ``document`` foreign key
+SOURCES = {
+    'document': (DocumentContent, 'text'),
+    'summary': (Summary, 'content'),
+    'citation': (Citation, 'text'),
+}
+
+MAX_TERMS = 32
+SNIPPET_TOKENS = 24
+
+# Highlight markers, replaced by <mark> after the snippet is HTML-escaped
+_START, _STOP = '\x02', '\x03'
+
+_backends = {}
+
+
+def backend():
+    """'fts5', 'postgresql' or 'basic' for the default database"""
+    alias = connection.alias
+    if alias not in _backends:
+        if connection.vendor == 'postgresql':
+            _backends[alias] = 'postgresql'
+        elif connection.vendor == 'sqlite' and 'api_searchentry_fts' in connection.introspection.table_names():
+            _backends[alias] = 'fts5'
+        else:
+            _backends[alias] = 'basic'
+    return _backends[alias]
+
+
+def terms(query):
+    """The words of a search query, lowercased"""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def index(kind, objects):
+    """Add or refresh the entries for ``objects`` of one kind"""
+    field = SOURCES[kind][1]
+    bodies = {obj.pk: (obj.document_id, getattr(obj, field)) for obj in objects}
+    if not bodies:
+        return
+    existing = set(SearchEntry.objects.filter(object_id__in=bodies).values_list('object_id', flat=True))
+    for object_id in existing:
+        SearchEntry.objects.filter(object_id=object_id).update(body=bodies[object_id][1])
+    SearchEntry.objects.bulk_create([
+        SearchEntry(kind=kind, object_id=object_id, document_id=document_id, body=body)
+        for object_id, (document_id, body) in bodies.items() if object_id not in existing
+    ], ignore_conflicts=True)
+
+
+def unindex(object_ids):
+    """Remove the entries of deleted objects (one DELETE; the FTS triggers follow)"""
+    SearchEntry.objects.filter(object_id__in=list(object_ids)).delete()
+
+
+def rebuild():
+    """Re-create every entry from the source tables, returns the entry count"""
+    SearchEntry.objects.all().delete()
+    for kind, (model, field) in SOURCES.items():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO api_searchentry (kind, object_id, document_id, body) "
+                f"SELECT %s, {model._meta.pk.column}, document_id, {model._meta.get_field(field).column} "
+                f"FROM {model._meta.db_table}",
+                [kind]
+            )
+    if backend() == 'fts5':
+        with connection.cursor() as cursor:
+            # Merge the index segments written by the inserts
+            cursor.execute("INSERT INTO api_searchentry_fts(api_searchentry_fts) VALUES ('optimize')")
+    return SearchEntry.objects.count()
+
+
+def _highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    return html.escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _basic_snippet(body, words):
+    """A window of the text around the first matching word"""
+    position = min((body.lower().find(word) for word in words if word in body.lower()), default=0)
+    start = max(0, position - 80)
+    excerpt = body[start:start + 200]
+    for word in words:
+        excerpt = re.sub(f'({re.escape(word)})', f'{_START}\\1{_STOP}', excerpt, flags=re.IGNORECASE)
+    return ('…' if start else '') + excerpt + ('…' if start + 200 < len(body) else '')
+
+
+def _kind_filter(kinds, column):
+    if not kinds:
+        return '', []
+    return f" AND {column} IN ({', '.join(['%s'] * len(kinds))})", list(kinds)
+
+
+def search(query, kinds=None, limit=20, offset=0):
+    """Entries matching every word of ``query``, best first (among the
+    newest ``SEARCH_MAX_CANDIDATES`` matches).
+
+    Returns ``(results, has_more)``; each result is a dict with ``kind``,
+    ``id`` (of the summary or citation, or the document for texts),
+    ``document_id``, ``document_name``, ``snippet`` (HTML-escaped, matches
+    wrapped in ``<mark>``) and ``score`` (higher is better).
+    """
+    words = terms(query)
+    if not words:
+        return [], False
+
+    candidates = settings.SEARCH_MAX_CANDIDATES
+    if backend() == 'fts5':
+        kind_sql, kind_params = _kind_filter(kinds, 'e.kind')
+        match = ' '.join(f'"{word}"' for word in words)
+        # Rank the newest matches only, then build snippets for the page
+        sql = f"""
+            WITH candidates AS (
+                SELECT api_searchentry_fts.rowid AS id, api_searchentry_fts.rank AS rank
+                FROM api_searchentry_fts JOIN api_searchentry e ON e.id = api_searchentry_fts.rowid
+                WHERE api_searchentry_fts MATCH %s{kind_sql}
+                ORDER BY api_searchentry_fts.rowid DESC
+                LIMIT %s
+            ),
+            page AS (SELECT id, rank FROM candidates ORDER BY rank, id LIMIT %s OFFSET %s)
+            SELECT e.kind, e.object_id, e.document_id, d.name,
+                   snippet(api_searchentry_fts, 0, %s, %s, '…', %s), -page.rank
+            FROM page
+            JOIN api_searchentry_fts ON api_searchentry_fts.rowid = page.id
+            JOIN api_searchentry e ON e.id = page.id
+            JOIN api_document d ON d.id = e.document_id
+            WHERE api_searchentry_fts MATCH %s
+            ORDER BY page.rank, page.id
+        """
+        params = [match] + kind_params + [candidates, limit + 1, offset, _START, _STOP, SNIPPET_TOKENS, match]
+    elif backend() == 'postgresql':
+        kind_sql, kind_params = _kind_filter(kinds, 'e.kind')
+        sql = f"""
+            WITH q AS (SELECT plainto_tsquery('english', %s) AS query),
+            candidates AS (
+                SELECT e.id FROM api_searchentry e, q
+                WHERE to_tsvector('english', e.body) @@ q.query{kind_sql}
+                ORDER BY e.id DESC
+                LIMIT %s
+            ),
+            page AS (
+                SELECT e.id, e.kind, e.object_id, e.document_id, e.body,
+                       ts_rank_cd(to_tsvector('english', e.body), q.query) AS score
+                FROM candidates JOIN api_searchentry e ON e.id = candidates.id, q
+                ORDER BY score DESC, e.id
+                LIMIT %s OFFSET %s
+            )
+            SELECT page.kind, page.object_id, page.document_id, d.name,
+                   ts_headline('english', page.body, q.query, %s), page.score
+            FROM page JOIN api_document d ON d.id = page.document_id, q
+            ORDER BY page.score DESC, page.id
+        """
+        params = [' '.join(words)] + kind_params + [candidates, limit + 1, offset]
+        params.append(f'StartSel={_START}, StopSel={_STOP}, MaxFragments=1, MaxWords={SNIPPET_TOKENS}, MinWords=8')
+    else:
+        entries = SearchEntry.objects.all()
+        for word in words:
+            entries = entries.filter(body__icontains=word)
+        if kinds:
+            entries = entries.filter(kind__in=kinds)
+        rows = [
+            (entry['kind'], entry['object_id'], entry['document_id'], entry['document__name'],
+             _basic_snippet(entry['body'], words), 0.0)
+            for entry in entries.order_by('id').values(
+                'kind', 'object_id', 'document_id', 'document__name', 'body'
+            )[offset:offset + limit + 1]
+        ]
+        return _results(rows, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return _results(rows, limit)
+
+
+def _results(rows, limit):
+    field = SearchEntry._meta.get_field('object_id')
+    document_field = Document._meta.pk
+    results = [
+        {
+            'kind': kind,
+            'id': str(field.to_python(object_id)),
+            'document_id': str(document_field.to_python(document_id)),
+            'document_name': document_name,
+            'snippet': _highlight(snippet),
+            'score': score,
+        }
+        for kind, object_id, document_id, document_name, snippet, score in rows[:limit]
+    ]
+    return results, len(rows) > limit
+
+
+def matching(kind, query):
+    """Expression for ``filter(pk__in=...)`` selecting the ``kind`` objects matching ``query``"""
+    words = terms(query)
+    if backend() == 'fts5':
+        return RawSQL(
+            "SELECT e.object_id FROM api_searchentry_fts JOIN api_searchentry e ON e.id = api_searchentry_fts.rowid "
+            "WHERE api_searchentry_fts MATCH %s AND e.kind = %s",
+            [' '.join(f'"{word}"' for word in words) or '""', kind]
+        )
+    if backend() == 'postgresql':
+        return RawSQL(
+            "SELECT object_id FROM api_searchentry "
+            "WHERE to_tsvector('english', body) @@ plainto_tsquery('english', %s) AND kind = %s",
+            [' '.join(words), kind]
+        )
+    entries = SearchEntry.objects.filter(kind=kind)
+    for word in words:
+        entries = entries.filter(body__icontains=word)
+    return entries.values('object_id')
@@ -1,11 +1,20 @@
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
-from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics
+from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics, Job
 
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ['id', 'name', 'file_type', 'size', 'uploaded_at', 'processed']
+    
+    def __init__(self, *args, **kwargs):
+        # Optional subset of Meta.fields to include, e.g. fields=['id', 'name']
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
 
 class SummarySerializer(serializers.ModelSerializer):
@@ -50,6 +59,9 @@ class DocumentResultsSerializer(serializers.ModelSerializer):
     conference_suggestions = ConferenceSuggestionSerializer(many=True, read_only=True)
     plagiarismScore = serializers.SerializerMethodField()
     
+    # Fields that can be left out with ``include``; the document's own fields are always present
+    INCLUDABLE = ['summaries', 'citations', 'plagiarism_checks', 'conference_suggestions', 'plagiarismScore']
+    
     class Meta:
         model = Document
         fields = [
@@ -57,9 +69,62 @@ class DocumentResultsSerializer(serializers.ModelSerializer):
             'summaries', 'citations', 'plagiarism_checks', 'conference_suggestions', 'plagiarismScore'
         ]
     
+    def __init__(self, *args, **kwargs):
+        # Optional subset of INCLUDABLE to serialize, e.g. include=['summaries']
+        include = kwargs.pop('include', None)
+        super().__init__(*args, **kwargs)
+        if include is not None:
+            for field_name in set(self.INCLUDABLE) - set(include):
+                self.fields.pop(field_name)
+    
+    @staticmethod
+    def prefetch(queryset, include=None):
+        """Load everything the serializer reads in a fixed number of queries:
+        one for the documents (with the latest plagiarism score annotated) and
+        one per related list, however many rows each document has.
+        ``include`` limits the work to the fields that will be serialized."""
+        include = DocumentResultsSerializer.INCLUDABLE if include is None else include
+        if 'plagiarismScore' in include:
+            latest_score = PlagiarismCheck.objects.filter(
+                document=OuterRef('pk')
+            ).order_by('-checked_at').values('similarity_percentage')[:1]
+            queryset = queryset.annotate(latest_plagiarism_score=Subquery(latest_score))
+        related = {
+            'summaries': Summary.objects.order_by('-generated_at'),
+            'citations': Citation.objects.order_by('-detected_at'),
+            'plagiarism_checks': PlagiarismCheck.objects.order_by('-checked_at'),
+            'conference_suggestions': ConferenceSuggestion.objects.order_by('-confidence_score'),
+        }
+        return queryset.prefetch_related(*[
+            Prefetch(name, queryset=related_queryset)
+            for name, related_queryset in related.items() if name in include
+        ])
+    
     def get_plagiarismScore(self, obj):
         """Get the plagiarism score from the most recent plagiarism check"""
-        latest_check = obj.plagiarism_checks.order_by('-checked_at').first()
-        if latest_check:
-            return latest_check.similarity_percentage
-        return 0.0
+        if hasattr(obj, 'latest_plagiarism_score'):
+            score = obj.latest_plagiarism_score
+        else:
+            latest_check = obj.plagiarism_checks.order_by('-checked_at').first()
+            score = latest_check.similarity_percentage if latest_check else None
+        return score if score is not None else 0.0
+
+
+class JobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'document', 'status', 'params', 'stages', 'progress', 'result', 'error',
+            'attempts', 'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def get_progress(self, obj):
+        """Stage counts by status (documents, for batch jobs)"""
+        counts = {'total': len(obj.stages), 'pending': 0, 'running': 0, 'completed': 0, 'failed': 0}
+        for entry in obj.stages.values():
+            status = entry.get('status', 'pending')
+            status = 'completed' if status == 'cached' else status
+            counts[status] = counts.get(status, 0) + 1
+        return counts
@@ -0,0 +1,156 @@
+"""
+Keep the ``Analytics`` counters in step with the tables they count, and
+roll up creations into the hourly and daily ``AnalyticsRollup`` buckets.
+
+Each created or deleted document and result adjusts the counters with a
+single UPDATE (``AnalyticsService.record``). ``bulk_create`` does not send
+signals, so code that bulk-inserts results records its counts itself.
+Deleting a document uncounts its results in one go rather than once per
+cascaded row.
+
+Saving or deleting a result or editing a document also marks the
+document's results snapshot stale (``snapshots.py``), so results added or
+changed outside a pipeline run (the admin, a shell) reach the next read and
+the report cache keyed on the snapshot version. Pipeline runs re-render the
+snapshot when they finish; their bulk inserts send no signals.
+
+Saved and deleted summaries, citations and document texts update their
+full-text search entries (``search.py``), and a saved document text is
+vectorised for similarity search (``similarity.py``). A document's entries
+and vector are deleted with it by the foreign key cascade, and its cached
+PDF reports (``report_cache.py``) by ``discard_reports``. Its file's
+reference in the media store (``media_store.py``) is released once the
+deletion commits.
+"""
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import media_store, report_cache, search, similarity, snapshots
+from .models import Document, DocumentContent, Summary, Citation, PlagiarismCheck, ConferenceSuggestion
+from .services import AnalyticsService
+
+
+RESULT_COUNTERS = {
+    Citation: 'citations_found',
+    PlagiarismCheck: 'plagiarism_detected',
+    ConferenceSuggestion: 'conferences_matched',
+}
+
+SEARCH_KINDS = {
+    DocumentContent: 'document',
+    Summary: 'summary',
+    Citation: 'citation',
+}
+
+RESULT_METRICS = {
+    Citation: 'citations',
+    PlagiarismCheck: 'plagiarism_checks',
+    ConferenceSuggestion: 'conference_suggestions',
+}
+
+
+def _uploaded_today(document):
+    return timezone.localdate(document.uploaded_at) == timezone.localdate()
+
+
+def _cascaded_from_document(origin):
+    """Whether a delete was started by deleting documents"""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is Document
+
+
+@receiver(post_save, sender=Document)
+def count_document(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AnalyticsService.record(
+            total_documents=1,
+            processed_documents=int(instance.processed),
+            documents_today=int(_uploaded_today(instance))
+        )
+        AnalyticsService.rollup('documents', at=instance.uploaded_at)
+
+
+@receiver(pre_delete, sender=Document)
+def uncount_document(sender, instance, **kwargs):
+    AnalyticsService.record(
+        total_documents=-1,
+        processed_documents=-int(instance.processed),
+        documents_today=-int(_uploaded_today(instance)),
+        citations_found=-instance.citations.count(),
+        plagiarism_detected=-instance.plagiarism_checks.count(),
+        conferences_matched=-instance.conference_suggestions.count()
+    )
+
+
+def count_result(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AnalyticsService.record(**{RESULT_COUNTERS[sender]: 1})
+        AnalyticsService.rollup(RESULT_METRICS[sender])
+
+
+def uncount_result(sender, instance, origin=None, **kwargs):
+    if _cascaded_from_document(origin):
+        # Already uncounted by uncount_document
+        return
+    AnalyticsService.record(**{RESULT_COUNTERS[sender]: -1})
+
+
+@receiver(post_save, sender=Document)
+def invalidate_edited_document(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        snapshots.invalidate(instance.id)
+
+
+def invalidate_saved_result(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.invalidate(instance.document_id)
+
+
+def invalidate_deleted_result(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from_document(origin):
+        snapshots.invalidate(instance.document_id)
+
+
+@receiver(post_delete, sender=Document)
+def discard_reports(sender, instance, **kwargs):
+    report_cache.discard(instance.id)
+
+
+@receiver(post_delete, sender=Document)
+def release_file(sender, instance, **kwargs):
+    name = instance.file.name
+    if media_store.is_blob(name):
+        transaction.on_commit(lambda: media_store.release(name))
+
+
+def index_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(SEARCH_KINDS[sender], [instance])
+
+
+@receiver(post_save, sender=DocumentContent)
+def vectorize_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        similarity.store_vector(instance)
+
+
+def unindex_text(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from_document(origin):
+        search.unindex([instance.pk])
+
+
+for model in RESULT_COUNTERS:
+    post_save.connect(count_result, sender=model, dispatch_uid=f'analytics_count_{model.__name__}')
+    post_delete.connect(uncount_result, sender=model, dispatch_uid=f'analytics_uncount_{model.__name__}')
+
+for model in (Summary, *RESULT_COUNTERS):
+    post_save.connect(invalidate_saved_result, sender=model, dispatch_uid=f'snapshot_invalidate_saved_{model.__name__}')
+    post_delete.connect(invalidate_deleted_result, sender=model, dispatch_uid=f'snapshot_invalidate_{model.__name__}')
+
+for model in SEARCH_KINDS:
+    post_save.connect(index_text, sender=model, dispatch_uid=f'search_index_{model.__name__}')
+    post_delete.connect(unindex_text, sender=model, dispatch_uid=f'search_unindex_{model.__name__}')
@@ -0,0 +1,275 @@
+"""
+Corpus-wide "similar documents" search.
+
+Each stored document text (``DocumentContent``) is turned into a fixed-size
+vector by feature hashing: words and word pairs (stop words removed) are
+hashed into ``DIMENSIONS`` signed buckets with sublinear term-frequency
+weights, then L2-normalised, so the dot product of two vectors approximates
+the cosine similarity of their term profiles. Hashing needs no vocabulary
+fitted on the corpus, so a document is vectorised on its own when its text
+is saved (``signals.py``) and existing vectors never change as the corpus
+grows.
+
+Each process keeps the vectors in a ``VectorIndex`` matrix and applies the
+rows changed since its last sync before answering a query. Up to
+``SIMILARITY_EXACT_MAX_DOCUMENTS`` documents are searched exactly with a
+blocked matrix product; larger corpora use an inverted-file index
+(k-means lists, scanning the ``SIMILARITY_PROBES`` lists nearest the query).
+"""
+
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import DocumentVector
+
+
+DIMENSIONS = 512
+VERSION = f'hashed-{DIMENSIONS}-v1'
+
+# Rows scored per matrix product in exact search
+BLOCK_ROWS = 16384
+
+# Changes committed out of timestamp order are picked up by re-reading this window
+SYNC_OVERLAP = timedelta(seconds=30)
+
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+STOP_WORDS = frozenset("""
+    about above after again against all also an and any are as at be because been before being below
+    between both but by can could did do does doing down during each et few for from further had has
+    have having he her here hers him his how however if in into is it its itself just may me might more
+    most must my no nor not now of off on once only or other our ours out over own same she should so
+    some such than that the their theirs them then there these they this those through thus to too
+    under until up upon us very via was we were what when where which while who whom why will with
+    would you your
+""".split())
+
+
+def vectorize(text):
+    """L2-normalised hashed term vector of ``text`` (float32, ``DIMENSIONS`` long)"""
+    tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+    counts = Counter(tokens)
+    counts.update(f'{first} {second}' for first, second in zip(tokens, tokens[1:]))
+
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if not counts:
+        return vector
+    hashes = np.fromiter((zlib.crc32(term.encode('utf-8')) for term in counts), dtype=np.uint32, count=len(counts))
+    weights = np.fromiter((1.0 + math.log(count) for count in counts.values()), dtype=np.float32, count=len(counts))
+    # Low bits pick the bucket, the top bit the sign, so collisions cancel out on average
+    signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+    np.add.at(vector, hashes & (DIMENSIONS - 1), weights * signs)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def store_vector(content):
+    """Vectorise a DocumentContent and save it, unless the text is unchanged"""
+    rows = DocumentVector.objects.filter(document_id=content.document_id)
+    if rows.filter(version=VERSION, text_sha256=content.text_sha256).exists():
+        return
+    values = {
+        'vector': vectorize(content.text).tobytes(),
+        'version': VERSION,
+        'text_sha256': content.text_sha256,
+        'updated_at': timezone.now(),
+    }
+    if rows.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            DocumentVector.objects.create(document_id=content.document_id, **values)
+    except IntegrityError:
+        # Stored concurrently for the same text
+        rows.update(**values)
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class VectorIndex:
+    """In-memory matrix of every current document vector, synced from the database"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = []
+        self.rows = {}
+        self.matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        # ``matrix`` is a view of the first rows; spare rows make appends amortised O(1)
+        self._buffer = self.matrix
+        self.synced_at = None
+        self.lists = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sync(self):
+        """Apply the rows changed since the last sync; reload everything if rows were deleted"""
+        vectors = DocumentVector.objects.filter(version=VERSION)
+        state = vectors.aggregate(count=Count('pk'), latest=Max('updated_at'))
+        if state['latest'] is None:
+            self._load([], [])
+        elif self.synced_at is None or state['count'] < len(self.ids):
+            self._load(*self._read(vectors))
+        elif state['latest'] > self.synced_at or state['count'] != len(self.ids):
+            self._apply(*self._read(vectors.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP)))
+            if state['count'] != len(self.ids):
+                self._load(*self._read(vectors))
+        self.synced_at = state['latest']
+
+    @staticmethod
+    def _read(queryset):
+        ids, vectors = [], []
+        for document_id, vector in queryset.values_list('document_id', 'vector').iterator(chunk_size=2000):
+            ids.append(str(document_id))
+            vectors.append(np.frombuffer(vector, dtype=np.float32))
+        return ids, vectors
+
+    def _load(self, ids, vectors):
+        self.ids = ids
+        self.rows = {document_id: row for row, document_id in enumerate(ids)}
+        self.matrix = np.vstack(vectors) if vectors else np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._buffer = self.matrix
+        self.lists = None
+
+    def _apply(self, ids, vectors):
+        added = []
+        for document_id, vector in zip(ids, vectors):
+            row = self.rows.get(document_id)
+            if row is None:
+                self.rows[document_id] = len(self.ids) + len(added)
+                added.append(vector)
+                self.ids.append(document_id)
+            else:
+                self.matrix[row] = vector
+                if self.lists is not None:
+                    self.lists.assign(self.matrix, row, row + 1)
+        if added:
+            start = len(self.matrix)
+            stop = start + len(added)
+            if stop > len(self._buffer):
+                buffer = np.zeros((max(stop, 2 * len(self._buffer)), DIMENSIONS), dtype=np.float32)
+                buffer[:start] = self.matrix
+                self._buffer = buffer
+            self._buffer[start:stop] = added
+            self.matrix = self._buffer[:stop]
+            if self.lists is not None:
+                self.lists.assign(self.matrix, start, len(self.matrix))
+
+    def vector(self, document_id):
+        row = self.rows.get(str(document_id))
+        return None if row is None else self.matrix[row]
+
+    def search(self, query, k, exclude=None):
+        """Top ``k`` rows by dot product with ``query`` as ``(document_id, score)``"""
+        if not len(self.ids):
+            return [], 'exact'
+        extra = 1 if exclude is not None else 0
+        if len(self.ids) <= settings.SIMILARITY_EXACT_MAX_DOCUMENTS:
+            rows, scores = self._exact(query, k + extra)
+            method = 'exact'
+        else:
+            if self.lists is None or len(self.ids) > 2 * self.lists.trained_rows:
+                self.lists = InvertedLists(self.matrix)
+            rows, scores = self.lists.search(self.matrix, query, k + extra, settings.SIMILARITY_PROBES)
+            method = 'ivf'
+        results = [
+            (self.ids[row], float(score)) for row, score in zip(rows, scores)
+            if self.ids[row] != exclude
+        ]
+        return results[:k], method
+
+    def _exact(self, query, k):
+        """Brute force over the matrix in blocks of BLOCK_ROWS rows"""
+        best_rows, best_scores = [], []
+        for start in range(0, len(self.matrix), BLOCK_ROWS):
+            scores = self.matrix[start:start + BLOCK_ROWS] @ query
+            top = top_k(scores, k)
+            best_rows.append(top + start)
+            best_scores.append(scores[top])
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        top = top_k(scores, k)
+        return rows[top], scores[top]
+
+
+class InvertedLists:
+    """Approximate search: rows grouped by their nearest k-means centroid.
+
+    A query scores the centroids, then only the rows in the ``probes``
+    nearest lists. Trained on a sample of the matrix; rows added later are
+    assigned to the existing centroids, and the index is retrained once the
+    corpus has doubled.
+    """
+
+    ITERATIONS = 8
+    SAMPLE_PER_LIST = 32
+
+    def __init__(self, matrix, seed=0):
+        rng = np.random.default_rng(seed)
+        self.trained_rows = len(matrix)
+        count = max(1, int(math.sqrt(len(matrix))))
+        sample = matrix[rng.choice(len(matrix), min(len(matrix), count * self.SAMPLE_PER_LIST), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), count, replace=False)].copy()
+        for _ in range(self.ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            # Empty lists keep their previous centroid
+            filled = np.bincount(nearest, minlength=count) > 0
+            centroids[filled] = sums[filled]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1)
+        self.centroids = centroids
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.assign(matrix, 0, len(matrix))
+
+    def assign(self, matrix, start, stop):
+        """(Re)assign rows ``start:stop`` to their nearest centroid"""
+        if len(self.assignments) < stop:
+            self.assignments = np.concatenate([self.assignments, np.zeros(stop - len(self.assignments), dtype=np.int32)])
+        for block in range(start, stop, BLOCK_ROWS):
+            end = min(block + BLOCK_ROWS, stop)
+            self.assignments[block:end] = np.argmax(matrix[block:end] @ self.centroids.T, axis=1)
+
+    def search(self, matrix, query, k, probes):
+        lists = top_k(self.centroids @ query, probes)
+        candidates = np.flatnonzero(np.isin(self.assignments, lists))
+        scores = matrix[candidates] @ query
+        top = top_k(scores, k)
+        return candidates[top], scores[top]
+
+
+_index = VectorIndex()
+
+
+def similar(document_id, k=10):
+    """Documents most similar to ``document_id`` as ``([(document_id, score)], method)``.
+
+    Returns None when the document has no vector (its text was never stored).
+    """
+    with _index.lock:
+        _index.sync()
+        query = _index.vector(document_id)
+        if query is None:
+            return None
+        return _index.search(query, k, exclude=str(document_id))
@@ -0,0 +1,154 @@
+"""
+Materialized document results.
+
+``/api/documents/<id>/`` used to rebuild its nested JSON from five tables on
+every request. The rendered bytes are now stored in a
+``DocumentResultsSnapshot`` when an analysis or summary run finishes, and
+the endpoint serves them as they are. The snapshot's version is the ETag,
+so a client revalidating an unchanged document gets a 304 from a single
+primary-key lookup.
+
+Pipeline runs re-render the snapshot when they finish. Saving or deleting a
+result, or editing the document, marks the snapshot stale (see
+``signals.py``), and the next read renders it again.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Document, DocumentResultsSnapshot
+from .serializers import DocumentResultsSerializer
+
+
+# Renderings attempted when results keep changing underneath ``refresh``
+REFRESH_ATTEMPTS = 3
+
+def render(document_id):
+    """Serialize a document's results exactly as the DRF view would, raising Http404"""
+    document = get_object_or_404(
+        DocumentResultsSerializer.prefetch(Document.objects.all()), id=document_id
+    )
+    return JSONRenderer().render(DocumentResultsSerializer(document).data)
+
+
+def refresh(document_id):
+    """Render and store the snapshot, returns ``(version, content)``.
+
+    The version is read before rendering and the snapshot is only written if
+    it is unchanged, so a rendering that raced an invalidation (or another
+    refresh) cannot overwrite newer results and mark them fresh. It renders
+    again in that case, and after REFRESH_ATTEMPTS leaves the row stale for
+    the next read while returning its own rendering.
+
+    A stale row's version was bumped by ``invalidate`` and never served, so
+    it is reused; re-rendering a fresh row takes the next version.
+    """
+    document_id = getattr(document_id, 'id', document_id)
+    rows = DocumentResultsSnapshot.objects.filter(document_id=document_id)
+    for _ in range(REFRESH_ATTEMPTS):
+        seen = rows.values_list('version', 'stale').first()
+        if seen is None:
+            # A stale placeholder gives invalidations during the first render a version to bump
+            try:
+                with transaction.atomic():
+                    DocumentResultsSnapshot.objects.create(document_id=document_id, content=b'', stale=True)
+                seen = (1, True)
+            except IntegrityError:
+                # Created concurrently, or there is no such document (render raises Http404)
+                seen = rows.values_list('version', 'stale').first()
+
+        content = render(document_id)
+        if seen is None:
+            continue
+        version, stale = seen
+        if not stale:
+            version += 1
+        if rows.filter(version=seen[0], stale=stale).update(
+            version=version, content=content, stale=False, rendered_at=timezone.now()
+        ):
+            return version, content
+    return rows.values_list('version', flat=True).get(), content
+
+
+def many(document_ids):
+    """Fresh snapshot bytes for several documents as ``{document_id: content}``.
+
+    Reads the stored snapshots in one query. The rest are rendered together
+    (a fixed number of queries), and those that had no snapshot yet are
+    stored with one bulk insert. Unknown ids are left out.
+    """
+    contents = {
+        str(document_id): bytes(content)
+        for document_id, content in DocumentResultsSnapshot.objects.filter(
+            document_id__in=document_ids, stale=False
+        ).values_list('document_id', 'content')
+    }
+    pending = [document_id for document_id in document_ids if str(document_id) not in contents]
+    if not pending:
+        return contents
+
+    documents = DocumentResultsSerializer.prefetch(Document.objects.filter(id__in=pending))
+    rendered = {
+        str(document.id): JSONRenderer().render(DocumentResultsSerializer(document).data)
+        for document in documents
+    }
+    contents.update(rendered)
+
+    # Stale snapshots are re-rendered by the next single-document read
+    DocumentResultsSnapshot.objects.bulk_create([
+        DocumentResultsSnapshot(document_id=document_id, content=content)
+        for document_id, content in rendered.items()
+    ], ignore_conflicts=True)
+    return contents
+
+
+def invalidate(document_id):
+    """Mark the snapshot stale. The version is bumped too, so a ``refresh``
+    rendering at the same time sees the change and does not store its output."""
+    DocumentResultsSnapshot.objects.filter(document_id=document_id).update(stale=True, version=F('version') + 1)
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def matches(if_none_match, version):
+    """Whether an If-None-Match header value includes the snapshot's ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return etag(version) in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def current_version(document_id):
+    """The version of the fresh snapshot, rendering it if needed (raises Http404)"""
+    version = DocumentResultsSnapshot.objects.filter(
+        document_id=document_id, stale=False
+    ).values_list('version', flat=True).first()
+    if version is None:
+        version, _ = refresh(document_id)
+    return version
+
+
+def current(document_id, if_none_match=None):
+    """The fresh snapshot as ``(version, content)``, rendering it if needed.
+
+    ``content`` is None when ``if_none_match`` already matches, in which
+    case only the version was read.
+    """
+    snapshots = DocumentResultsSnapshot.objects.filter(document_id=document_id, stale=False)
+    if if_none_match:
+        version = snapshots.values_list('version', flat=True).first()
+        if version is not None and matches(if_none_match, version):
+            return version, None
+
+    row = snapshots.values_list('version', 'content').first()
+    if row is not None:
+        return row[0], bytes(row[1])
+    return refresh(document_id)
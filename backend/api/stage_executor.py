@@ -0,0 +1,164 @@
+"""
+Concurrent execution of independent analysis stages.
+
+I/O-bound stages (Gemini, Copyleaks) run on a thread pool, CPU-bound stages
+(TF-IDF scoring) on a process pool. Both pools are created once per process
+and reused. Stage functions only compute; callers persist the results on
+their own thread, so database connections never cross threads or processes.
+
+Process pools start their workers with STAGE_EXECUTOR_START_METHOD,
+'forkserver' by default. Forking the (multithreaded) web or job worker
+directly could copy a lock another thread holds, e.g. in logging, sqlite3
+or the Gemini client's gRPC channel, and deadlock the child on it; 'fork'
+is only used when configured explicitly.
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+def mp_context():
+    """Multiprocessing context for process pools"""
+    return multiprocessing.get_context(settings.STAGE_EXECUTOR_START_METHOD)
+
+
+def init_worker():
+    """Pool initializer: workers started with 'spawn' or 'forkserver' load Django first"""
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+class Stage:
+    """A unit of work: ``func(*args)`` run on the ``'thread'`` or ``'process'`` pool,
+    or ``'inline'`` on the calling thread"""
+
+    def __init__(self, name, func, args=(), kind='thread'):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kind = kind
+
+
+class StageResult:
+    """Outcome of a stage: either ``value`` or ``error`` is set"""
+
+    def __init__(self, name, value=None, error=None, elapsed=0.0, cached=False):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def timed(func, args):
+    """Run ``func`` and return its value with the time it took"""
+    started = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - started
+
+
+class StageExecutor:
+    """Runs stages concurrently and isolates failures per stage"""
+
+    _thread_pool = None
+    _process_pool = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def pool(cls, kind):
+        """Shared executor for a stage kind (non-process kinds use the thread pool)"""
+        with cls._lock:
+            if kind == 'process' and settings.STAGE_EXECUTOR_PROCESSES > 0:
+                if cls._process_pool is None:
+                    cls._process_pool = ProcessPoolExecutor(
+                        max_workers=settings.STAGE_EXECUTOR_PROCESSES,
+                        mp_context=mp_context(),
+                        initializer=init_worker
+                    )
+                return cls._process_pool
+            if cls._thread_pool is None:
+                cls._thread_pool = ThreadPoolExecutor(
+                    max_workers=settings.STAGE_EXECUTOR_THREADS,
+                    thread_name_prefix='stage'
+                )
+            return cls._thread_pool
+
+    @classmethod
+    def _discard_broken_process_pool(cls):
+        """Drop a process pool whose worker died so the next stage gets a fresh one"""
+        with cls._lock:
+            if cls._process_pool is not None:
+                cls._process_pool.shutdown(wait=False)
+                cls._process_pool = None
+
+    @classmethod
+    def shutdown(cls):
+        """Stop both pools (used by long-running workers on exit)"""
+        with cls._lock:
+            for pool in (cls._thread_pool, cls._process_pool):
+                if pool is not None:
+                    pool.shutdown(wait=True)
+            cls._thread_pool = None
+            cls._process_pool = None
+
+    def run(self, stages, on_start=None, on_finish=None):
+        """Run ``stages`` concurrently, returns ``{name: StageResult}``.
+
+        ``on_start(name)`` is called when a stage is submitted and
+        ``on_finish(result)`` as each stage completes, on the calling thread.
+        """
+        futures = {}
+        results = {}
+        inline = []
+        for stage in stages:
+            if on_start:
+                on_start(stage.name)
+            if stage.kind == 'inline':
+                inline.append(stage)
+                continue
+            try:
+                future = self.pool(stage.kind).submit(timed, stage.func, stage.args)
+            except Exception as e:
+                # e.g. a broken process pool: fail this stage, keep the others
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_broken_process_pool()
+                results[stage.name] = StageResult(stage.name, error=e)
+                if on_finish:
+                    on_finish(results[stage.name])
+                continue
+            futures[future] = stage.name
+
+        # Inline stages overlap with the pooled ones already submitted
+        for stage in inline:
+            try:
+                value, elapsed = timed(stage.func, stage.args)
+                results[stage.name] = StageResult(stage.name, value=value, elapsed=elapsed)
+            except Exception as e:
+                results[stage.name] = StageResult(stage.name, error=e)
+            if on_finish:
+                on_finish(results[stage.name])
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                value, elapsed = future.result()
+                result = StageResult(name, value=value, elapsed=elapsed)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_broken_process_pool()
+                result = StageResult(name, error=e)
+            results[name] = result
+            if on_finish:
+                on_finish(result)
+        return results
@@ -1,3 +1,1471 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.platypus import Table
+from rest_framework.renderers import JSONRenderer
+
+from . import admission, bulk_export, job_service, data_export, events, fast_json, media_store, report_cache, retrieval, search, services, snapshots
+from .models import (
+    Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Job, MediaBlob, PassageIndex, SearchEntry,
+    StageCacheEntry, AdmissionSlot, AnalyticsRollup, DocumentResultsSnapshot, AnalysisEvent
+)
+from .analysis_service import DocumentAnalysisService
+from .conference_model import ConferenceModel, build_artifact, resolve_artifact_dir, verify_artifact
+from .job_service import JobQueue
+from .pdf_service import PDFReportService
+from .pipeline import Pipeline, PipelineStage
+from .services import AnalyticsService, DocumentProcessor, GeminiService
+from .stage_executor import Stage, StageExecutor, StageResult
+from .views import _parse_date_param
+from .serializers import (
+    DocumentResultsSerializer, CitationSerializer, PlagiarismCheckSerializer, ConferenceSuggestionSerializer
+)
+
+
+def create_document(name, related_rows):
+    """A document with ``related_rows`` rows of each result type"""
+    document = Document.objects.create(
+        name=name, file='documents/test.pdf', file_type='pdf', size=1024, processed=True
+    )
+    Summary.objects.bulk_create([
+        Summary(document=document, content=f'Summary {i}', word_count=2) for i in range(related_rows)
+    ])
+    Citation.objects.bulk_create([
+        Citation(document=document, text=f'Citation {i}', source='Source', confidence=0.9)
+        for i in range(related_rows)
+    ])
+    PlagiarismCheck.objects.bulk_create([
+        PlagiarismCheck(
+            document=document, similarity_percentage=float(10 + i), status='completed',
+            checked_at=timezone.now() - timedelta(minutes=i)
+        )
+        for i in range(related_rows)
+    ])
+    ConferenceSuggestion.objects.bulk_create([
+        ConferenceSuggestion(document=document, conference_name=f'Conf {i}', confidence_score=0.5, reasoning='')
+        for i in range(related_rows)
+    ])
+    return document
+
+
+CONFERENCE_TOPICS = {
+    'VLDB': ['database', 'query', 'index', 'transaction', 'storage', 'optimizer'],
+    'SIGGRAPH': ['rendering', 'animation', 'mesh', 'shading', 'graphics', 'texture'],
+    'INFOCOM': ['wireless', 'network', 'routing', 'protocol', 'congestion', 'spectrum'],
+    'CHI': ['user', 'interface', 'usability', 'interaction', 'study', 'accessibility'],
+}
+
+
+def write_conference_dataset(path, papers_per_conference=15):
+    """A small synthetic stand-in for ``conference_dataset_clean.csv``"""
+    rng = np.random.default_rng(0)
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['Title', 'Conference'])
+        for conference, words in CONFERENCE_TOPICS.items():
+            for _ in range(papers_per_conference):
+                title = ' '.join(rng.choice(words, size=4)) + ' for scalable systems'
+                writer.writerow([title.capitalize(), conference])
+    return path
+
+
+def setUpModule():
+    """Point the suite at a conference model artifact trained on a synthetic
+    corpus, rather than whatever ``Conference_models/artifacts`` holds locally"""
+    global CONFERENCE_DIR, CONFERENCE_ARTIFACT, _conference_settings
+    CONFERENCE_DIR = tempfile.mkdtemp()
+    dataset = write_conference_dataset(os.path.join(CONFERENCE_DIR, 'conference_dataset_clean.csv'))
+    CONFERENCE_ARTIFACT = build_artifact(dataset, os.path.join(CONFERENCE_DIR, 'artifacts'), version='test')
+    _conference_settings = override_settings(
+        CONFERENCE_MODELS_DIR=CONFERENCE_DIR,
+        CONFERENCE_MODEL_ARTIFACTS_DIR=os.path.join(CONFERENCE_DIR, 'artifacts'),
+        CONFERENCE_MODEL_VERSION=None
+    )
+    _conference_settings.enable()
+    services._conference_service = None
+
+
+def tearDownModule():
+    services._conference_service = None
+    _conference_settings.disable()
+    shutil.rmtree(CONFERENCE_DIR, ignore_errors=True)
+
+
+class DocumentResultsQueryCountTests(TestCase):
+    """The results path must not issue queries per related row"""
+
+    # One for the document (with the latest plagiarism score annotated)
+    # and one per prefetched relation
+    EXPECTED_QUERIES = 5
+
+    def test_results_render_query_count_is_constant(self):
+        for related_rows in (0, 1, 25):
+            document = create_document(f'doc-{related_rows}.pdf', related_rows)
+            with self.subTest(related_rows=related_rows):
+                with self.assertNumQueries(self.EXPECTED_QUERIES):
+                    content = snapshots.render(document.id)
+                self.assertEqual(len(json.loads(content)['citations']), related_rows)
+
+    def test_results_serializer_many_query_count_is_constant(self):
+        for index in range(10):
+            create_document(f'doc-{index}.pdf', index)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = DocumentResultsSerializer(
+                DocumentResultsSerializer.prefetch(Document.objects.all()), many=True
+            ).data
+        self.assertEqual(len(data), 10)
+
+    def test_plagiarism_score_is_latest_check(self):
+        document = create_document('doc.pdf', 3)
+        response = self.client.get(reverse('document-results', args=[document.id]))
+        # The check created with i=0 is the most recent
+        self.assertEqual(response.json()['plagiarismScore'], 10.0)
+        self.assertEqual(
+            [check['similarity_percentage'] for check in response.json()['plagiarism_checks']],
+            [10.0, 11.0, 12.0]
+        )
+
+
+class DocumentResultsSnapshotTests(TestCase):
+    """The results endpoint serves a stored snapshot with ETag revalidation"""
+
+    def test_snapshot_matches_serializer_output(self):
+        document = create_document('doc.pdf', 3)
+        response = self.client.get(reverse('document-results', args=[document.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, snapshots.render(document.id))
+        self.assertEqual(response['ETag'], '"1"')
+
+    def test_stored_snapshot_is_a_single_query(self):
+        document = create_document('doc.pdf', 25)
+        url = reverse('document-results', args=[document.id])
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+    def test_matching_etag_returns_not_modified(self):
+        document = create_document('doc.pdf', 3)
+        url = reverse('document-results', args=[document.id])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+
+    def test_deleting_a_result_renders_a_new_version(self):
+        document = create_document('doc.pdf', 3)
+        url = reverse('document-results', args=[document.id])
+        etag = self.client.get(url)['ETag']
+        document.citations.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['citations']), 2)
+
+    def test_saving_a_result_renders_a_new_version(self):
+        document = create_document('doc.pdf', 3)
+        url = reverse('document-results', args=[document.id])
+        etag = self.client.get(url)['ETag']
+        version = snapshots.current_version(document.id)
+
+        citation = document.citations.first()
+        citation.source = 'Edited source'
+        citation.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Edited source', [item['source'] for item in response.json()['citations']])
+
+        etag = response['ETag']
+        Summary.objects.create(document=document, content='Added in the admin', word_count=4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['summaries']), 4)
+        # Cached PDF reports are keyed on the version, so they are not reused either
+        self.assertEqual(snapshots.current_version(document.id), version + 2)
+
+    def test_a_rendering_that_raced_a_save_is_not_stored(self):
+        document = create_document('doc.pdf', 3)
+        render = snapshots.render
+        renders = []
+
+        def racing_render(document_id, saves=1):
+            content = render(document_id)
+            if len(renders) < saves:
+                Summary.objects.create(document=document, content='Saved while rendering', word_count=3)
+            renders.append(content)
+            return content
+
+        with mock.patch.object(snapshots, 'render', racing_render):
+            version, content = snapshots.refresh(document.id)
+        self.assertEqual(len(renders), 2)
+        self.assertEqual(len(json.loads(content)['summaries']), 4)
+        self.assertEqual(snapshots.current(document.id), (version, content))
+
+        # Results that keep changing leave the snapshot stale for the next read
+        renders.clear()
+        with mock.patch.object(snapshots, 'render', lambda document_id: racing_render(document_id, saves=3)):
+            snapshots.refresh(document.id)
+        self.assertEqual(len(renders), snapshots.REFRESH_ATTEMPTS)
+        self.assertTrue(DocumentResultsSnapshot.objects.get(document=document).stale)
+        self.assertEqual(len(json.loads(snapshots.current(document.id)[1])['summaries']), 7)
+
+
+class DocumentBulkResultsTests(TestCase):
+    """Results for many documents are fetched with a fixed number of queries"""
+
+    def test_query_count_does_not_grow_with_documents(self):
+        url = reverse('document-results-bulk')
+        for count in (1, 10):
+            documents = [create_document(f'doc-{count}-{i}.pdf', i) for i in range(count)]
+            ids = ','.join(str(document.id) for document in documents)
+            with self.subTest(count=count):
+                # Stored snapshots, then render (five) and bulk insert
+                with self.assertNumQueries(7):
+                    first = self.client.get(url, {'ids': ids})
+                with self.assertNumQueries(1):
+                    second = self.client.get(url, {'ids': ids})
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(
+                    [result['id'] for result in first.json()['results']],
+                    [str(document.id) for document in documents]
+                )
+
+    def test_results_match_single_document_endpoint(self):
+        documents = [create_document(f'doc-{i}.pdf', 2) for i in range(2)]
+        response = self.client.get(
+            reverse('document-results-bulk'), {'ids': f'{documents[1].id},{documents[0].id}'}
+        )
+        self.assertEqual(
+            response.json()['results'],
+            [json.loads(snapshots.render(document.id)) for document in reversed(documents)]
+        )
+
+    def test_include_selects_sub_resources(self):
+        document = create_document('doc.pdf', 3)
+        url = reverse('document-results-bulk')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'ids': str(document.id), 'include': 'summaries'})
+        result = response.json()['results'][0]
+        self.assertEqual(set(result), {'id', 'name', 'file_type', 'size', 'uploaded_at', 'processed', 'summaries'})
+        self.assertEqual(len(result['summaries']), 3)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': str(document.id), 'include': 'plagiarismScore'})
+        self.assertEqual(response.json()['results'][0]['plagiarismScore'], 10.0)
+
+    def test_missing_and_invalid_ids(self):
+        document = create_document('doc.pdf', 1)
+        url = reverse('document-results-bulk')
+        unknown = '00000000-0000-0000-0000-000000000000'
+        response = self.client.get(url, {'ids': f'{document.id},{unknown},{document.id}'})
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(response.json()['missing'], [unknown])
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': 'not-a-uuid'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': str(document.id), 'include': 'everything'}).status_code, 400)
+        with self.settings(DOCUMENT_RESULTS_MAX_IDS=1):
+            self.assertEqual(self.client.get(url, {'ids': f'{document.id},{unknown}'}).status_code, 400)
+
+
+class ConferenceModelTests(TestCase):
+    """Artifacts reproduce the scikit-learn model they were trained from and are checked against their manifest"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def copy_artifact(self):
+        return shutil.copytree(CONFERENCE_ARTIFACT, os.path.join(self.directory, 'copy'))
+
+    def test_transform_matches_the_vectorizer(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        with open(os.path.join(CONFERENCE_DIR, 'conference_dataset_clean.csv'), newline='', encoding='utf-8') as handle:
+            titles = [row['Title'] for row in csv.DictReader(handle)]
+        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english', ngram_range=(1, 2))
+        matrix = vectorizer.fit_transform(titles)
+        model = ConferenceModel(CONFERENCE_ARTIFACT)
+
+        self.assertEqual(len(model), len(titles))
+        self.assertEqual(model.manifest['shape'], list(matrix.shape))
+        self.assertEqual(model.vocabulary, vectorizer.vocabulary_)
+        np.testing.assert_allclose(model.embeddings, matrix.toarray(), atol=1e-8)
+        for text in (
+            'A query optimizer for transaction storage',
+            'Wireless routing protocols, and the rendering of USER interfaces!',
+            'Nothing in the vocabulary',
+            '',
+        ):
+            with self.subTest(text=text):
+                expected = vectorizer.transform([text]).toarray()[0]
+                np.testing.assert_allclose(model.transform(text), expected, atol=1e-8)
+                np.testing.assert_allclose(model.similarities(text), matrix @ expected, atol=1e-7)
+
+    def test_suggestions_use_the_test_artifact(self):
+        service = services.get_conference_suggestion_service()
+        self.assertEqual(service.model.version, 'test')
+        suggestions = service.suggest_conferences('Query optimizer and index storage for databases', top_k=2)
+        self.assertEqual(suggestions[0]['conference_name'], 'VLDB')
+
+    def test_verify_reports_changed_files(self):
+        artifact = self.copy_artifact()
+        self.assertEqual(verify_artifact(artifact), [])
+
+        with open(os.path.join(artifact, 'idf.npy'), 'r+b') as handle:
+            handle.seek(-1, os.SEEK_END)
+            last = handle.read(1)
+            handle.seek(-1, os.SEEK_END)
+            handle.write(bytes([last[0] ^ 0xFF]))
+        with open(os.path.join(artifact, 'labels.npy'), 'ab') as handle:
+            handle.write(b'\0')
+        os.remove(os.path.join(artifact, 'vocabulary.json'))
+
+        self.assertEqual(verify_artifact(artifact), [
+            'vocabulary.json: missing', 'idf.npy: checksum mismatch', 'labels.npy: size mismatch'
+        ])
+
+    def test_verify_reports_a_corrupted_manifest(self):
+        artifact = self.copy_artifact()
+        manifest_path = os.path.join(artifact, 'manifest.json')
+        with open(manifest_path, encoding='utf-8') as handle:
+            manifest = json.load(handle)
+
+        manifest['files']['embeddings.npy']['sha256'] = '0' * 64
+        del manifest['files']['analyzer.json']
+        with open(manifest_path, 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle)
+        self.assertEqual(verify_artifact(artifact), [
+            'analyzer.json: not in manifest', 'embeddings.npy: checksum mismatch'
+        ])
+
+        with open(manifest_path, 'w', encoding='utf-8') as handle:
+            handle.write('{"files": ')
+        problems = verify_artifact(artifact)
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith('manifest.json: unreadable'))
+
+    def test_latest_pointer_resolves_the_artifact(self):
+        root = os.path.dirname(CONFERENCE_ARTIFACT)
+        self.assertEqual(resolve_artifact_dir(root), CONFERENCE_ARTIFACT)
+        self.assertEqual(resolve_artifact_dir(root, 'test'), CONFERENCE_ARTIFACT)
+        self.assertIsNone(resolve_artifact_dir(root, 'unknown'))
+        self.assertIsNone(resolve_artifact_dir(self.directory))
+
+
+class DocumentListTests(TestCase):
+    """Documents are listed newest first, one keyset-paginated page at a time"""
+
+    def create(self, name, uploaded_at, file_type='pdf', processed=True):
+        return Document.objects.create(
+            name=name, file=f'documents/{name}', file_type=file_type, size=1024,
+            processed=processed, uploaded_at=uploaded_at
+        )
+
+    def fetch(self, **params):
+        return self.client.get(reverse('document-list'), params)
+
+    def test_paging_over_equal_upload_times_serves_every_document_once(self):
+        now = timezone.now()
+        # Runs of equal timestamps straddle the page boundaries
+        documents = [
+            self.create(f'doc-{index}.pdf', now - timedelta(minutes=index // 4)) for index in range(11)
+        ]
+
+        served, cursor, pages = [], None, 0
+        while True:
+            response = self.fetch(limit=3, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            served += [row['id'] for row in body['results']]
+            pages += 1
+            cursor = body['next_cursor']
+            self.assertEqual(body['has_more'], cursor is not None)
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(len(served), len(set(served)))
+        expected = sorted(documents, key=lambda document: (document.uploaded_at, document.id), reverse=True)
+        self.assertEqual(served, [str(document.id) for document in expected])
+
+    def test_invalid_cursors_are_rejected(self):
+        self.create('doc.pdf', timezone.now())
+
+        def encoded(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+        for cursor in (
+            'not a cursor',
+            'ünïcode',
+            encoded({'uploaded_at': '2024-01-01T00:00:00+00:00'}),
+            encoded(['2024-01-01T00:00:00+00:00']),
+            encoded(['yesterday', str(uuid.uuid4())]),
+            encoded(['2024-01-01T00:00:00+00:00', 'not-a-uuid']),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.fetch(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['error'].startswith('Invalid cursor'))
+
+        self.assertEqual(self.fetch(limit='ten').status_code, 400)
+
+    def test_fields_select_the_columns_and_unknown_fields_are_rejected(self):
+        self.create('doc.pdf', timezone.now())
+
+        response = self.fetch(fields='name, id')
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'name'])
+
+        response = self.fetch(fields='name,file,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: file, secret'})
+
+    def test_filters_narrow_the_results(self):
+        now = timezone.now()
+        old = self.create('old.pdf', now - timedelta(days=10))
+        recent = self.create('recent.docx', now - timedelta(days=1), file_type='docx', processed=False)
+        today = self.create('today.txt', now, file_type='txt')
+
+        def names(**params):
+            response = self.fetch(**params)
+            self.assertEqual(response.status_code, 200, response.content)
+            return [row['name'] for row in response.json()['results']]
+
+        self.assertEqual(names(), [today.name, recent.name, old.name])
+        self.assertEqual(names(file_type='PDF'), [old.name])
+        self.assertEqual(names(processed='false'), [recent.name])
+        self.assertEqual(names(processed='true'), [today.name, old.name])
+        self.assertEqual(names(uploaded_after=(now - timedelta(days=2)).isoformat()), [today.name, recent.name])
+        self.assertEqual(names(uploaded_before=(now - timedelta(days=2)).isoformat()), [old.name])
+        self.assertEqual(
+            names(uploaded_after=timezone.localdate(now - timedelta(days=10)).isoformat(), processed='true'),
+            [today.name, old.name]
+        )
+
+        response = self.fetch(uploaded_before='last week')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'uploaded_before must be an ISO date or datetime'})
+
+    def test_date_params_parse_dates_and_datetimes(self):
+        self.assertEqual(_parse_date_param('2024-03-01'), timezone.make_aware(datetime(2024, 3, 1)))
+        self.assertTrue(timezone.is_aware(_parse_date_param('2024-03-01T12:30:00')))
+        self.assertEqual(
+            _parse_date_param('2024-03-01T12:30:00+02:00'),
+            datetime(2024, 3, 1, 10, 30, tzinfo=dt_timezone.utc)
+        )
+        for value in ('', 'yesterday', '2024-02-30', '2024-03-01T25:00:00'):
+            with self.subTest(value=value):
+                self.assertIsNone(_parse_date_param(value))
+
+
+class FastJsonTests(TestCase):
+    """The fast_json list path must produce the same bytes as DRF"""
+
+    def test_dumps_matches_json_renderer(self):
+        values = [
+            {'confidence': 0.85, 'tiny': 1e-05, 'huge': 1e16, 'zero': -0.0},
+            {'text': 'line\u2028separator\u2029 “quoted” café \x01', 'nested': [{'similarity': 2.5e-7}, (1, 2)]},
+            {'big': 2 ** 70, 'none': None, 'flag': True},
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(fast_json.dumps(value), JSONRenderer().render(value))
+
+    def test_list_endpoints_match_serializer_output(self):
+        document = create_document('doc.pdf', 5)
+        document.plagiarism_checks.update(matched_sources=[{'url': 'https://example.org', 'similarity': 1e-05}])
+        for route, serializer_class, queryset in (
+            ('citation-list', CitationSerializer, document.citations.all()),
+            ('plagiarism-list', PlagiarismCheckSerializer, document.plagiarism_checks.all()),
+            ('conference-suggestions', ConferenceSuggestionSerializer, document.conference_suggestions.all()),
+        ):
+            with self.subTest(route=route):
+                response = self.client.get(reverse(route, args=[document.id]))
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    JSONRenderer().render(serializer_class(queryset, many=True).data)
+                )
+
+
+class SearchTests(TestCase):
+    """Search entries follow writes and queries are ranked by the full-text index"""
+
+    def setUp(self):
+        self.document = create_document('paper.pdf', 0)
+        DocumentProcessor.store_text(self.document, 'Neural machine translation with attention.\nRunning <experiments>.')
+
+    def search(self, **params):
+        response = self.client.get(reverse('search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_entries_follow_writes(self):
+        citation = Citation.objects.create(document=self.document, text='Attention is all you need', source='arXiv')
+        summary = Summary.objects.create(document=self.document, content='Translating text', word_count=2)
+        self.assertEqual(
+            {(result['kind'], result['id']) for result in self.search(q='attention')},
+            {('document', str(self.document.id)), ('citation', str(citation.id))}
+        )
+        # Stemmed: "translating" matches "translation"
+        self.assertEqual(len(self.search(q='translation')), 2)
+
+        citation.text = 'Something else'
+        citation.save()
+        self.assertEqual([result['kind'] for result in self.search(q='attention')], ['document'])
+
+        summary.delete()
+        self.assertEqual([result['kind'] for result in self.search(q='translation')], ['document'])
+
+        self.document.delete()
+        self.assertFalse(SearchEntry.objects.exists())
+        self.assertEqual(self.search(q='translation'), [])
+
+    def test_bulk_created_citations_are_indexed(self):
+        citations = Citation.objects.bulk_create([
+            Citation(document=self.document, text=f'Graph networks part {i}', source='') for i in range(3)
+        ])
+        self.assertEqual(self.search(q='graph'), [])
+        search.index('citation', citations)
+        self.assertEqual(len(self.search(q='graph networks', kind='citation')), 3)
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        result = self.search(q='running experiments')[0]
+        self.assertIn('<mark>Running</mark> &lt;<mark>experiments</mark>&gt;', result['snippet'])
+
+    def test_pagination_and_validation(self):
+        Citation.objects.bulk_create([
+            Citation(document=self.document, text=f'Protein folding {i}', source='') for i in range(5)
+        ])
+        search.index('citation', self.document.citations.all())
+        url = reverse('search')
+        first = self.client.get(url, {'q': 'protein', 'page_size': 3}).json()
+        second = self.client.get(url, {'q': 'protein', 'page_size': 3, 'page': 2}).json()
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len({result['id'] for result in first['results'] + second['results']}), 5)
+
+        # Query syntax characters are not passed to the index
+        self.assertEqual(self.client.get(url, {'q': 'protein" OR NEAR(*'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'q': '!!'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'protein', 'kind': 'plagiarism'}).status_code, 400)
+
+    def test_unchanged_text_is_not_rewritten(self):
+        content = self.document.content
+        with self.assertNumQueries(1):
+            DocumentProcessor.store_text(self.document, content.text)
+
+
+class SimilarDocumentsTests(TestCase):
+    """Similar documents come from vectors maintained as texts are stored"""
+
+    TEXTS = {
+        'transformers.pdf': 'Attention based transformer models for neural machine translation of languages',
+        'translation.pdf': 'Neural machine translation with transformer attention between languages',
+        'proteins.pdf': 'Protein folding prediction with molecular dynamics simulations',
+        'folding.pdf': 'Molecular dynamics of protein folding and structure prediction',
+    }
+
+    def setUp(self):
+        self.documents = {}
+        for name, text in self.TEXTS.items():
+            self.documents[name] = create_document(name, 0)
+            DocumentProcessor.store_text(self.documents[name], text)
+
+    def similar(self, name, **params):
+        response = self.client.get(reverse('similar-documents', args=[self.documents[name].id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_most_similar_document_first(self):
+        data = self.similar('transformers.pdf')
+        self.assertEqual(data['method'], 'exact')
+        names = [result['name'] for result in data['results']]
+        self.assertEqual(names[0], 'translation.pdf')
+        self.assertNotIn('transformers.pdf', names)
+        self.assertEqual(len(self.similar('proteins.pdf', k=1)['results']), 1)
+
+    def test_index_follows_new_and_deleted_documents(self):
+        self.similar('proteins.pdf')
+        document = create_document('proteins-2.pdf', 0)
+        DocumentProcessor.store_text(document, self.TEXTS['proteins.pdf'])
+        result = self.similar('proteins.pdf')['results'][0]
+        self.assertEqual(result['name'], 'proteins-2.pdf')
+        self.assertAlmostEqual(result['score'], 1.0, places=5)
+
+        document.delete()
+        self.assertNotIn('proteins-2.pdf', [result['name'] for result in self.similar('proteins.pdf')['results']])
+
+    def test_approximate_index_matches_exact_when_probing_every_list(self):
+        exact = self.similar('folding.pdf')['results']
+        with self.settings(SIMILARITY_EXACT_MAX_DOCUMENTS=1, SIMILARITY_PROBES=100):
+            approximate = self.similar('folding.pdf')
+        self.assertEqual(approximate['method'], 'ivf')
+        self.assertEqual(
+            [result['document_id'] for result in approximate['results']],
+            [result['document_id'] for result in exact]
+        )
+
+    def test_document_without_text(self):
+        document = create_document('empty.pdf', 0)
+        response = self.client.get(reverse('similar-documents', args=[document.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ASK_PASSAGE_WORDS=12)
+class AskDocumentTests(TestCase):
+    """Questions are answered from a few passages ranked by the document's stored BM25 index"""
+
+    TEXT = '\n'.join([
+        'The survey covers attention models and their use in machine translation systems.',
+        'Training used eight accelerators for three days on the combined parallel corpora.',
+        'Evaluation measured BLEU scores on the held-out test sets for every language pair.',
+        'Future work studies protein folding with the same attention architecture.',
+    ])
+
+    def setUp(self):
+        # Answer with the local fallback rather than calling Gemini
+        patcher = mock.patch.object(GeminiService, '_shared_model', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.document = create_document('paper.pdf', 0)
+        DocumentProcessor.store_text(self.document, self.TEXT)
+
+    def ask(self, question, **body):
+        return self.client.post(
+            reverse('ask-document', args=[self.document.id]), {'question': question, **body}, content_type='application/json'
+        )
+
+    def test_relevant_passages_answer_the_question(self):
+        response = self.ask('How long did training take on the accelerators?', top_k=2)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['fallback'])
+        self.assertLessEqual(len(data['passages']), 2)
+        self.assertIn('three days', data['passages'][0]['text'])
+        self.assertIn('three days', data['answer'])
+
+    def test_index_is_stored_once_and_rebuilt_for_new_text(self):
+        self.ask('Which BLEU scores were measured?')
+        built_at = PassageIndex.objects.get(document=self.document).built_at
+        retrieval._cache.clear()
+        self.ask('Which language pairs were evaluated?')
+        self.assertEqual(PassageIndex.objects.get(document=self.document).built_at, built_at)
+
+        DocumentProcessor.store_text(self.document, 'Results on image classification benchmarks.')
+        data = self.ask('Which benchmarks?').json()
+        self.assertEqual([passage['text'] for passage in data['passages']], ['Results on image classification benchmarks.'])
+        self.assertGreater(PassageIndex.objects.get(document=self.document).built_at, built_at)
+
+    def test_unrelated_question_and_invalid_requests(self):
+        self.assertEqual(self.ask('Where is the weather forecast?').json()['passages'], [])
+        self.assertEqual(self.ask('').status_code, 400)
+        self.assertEqual(self.ask('Training?', top_k='many').status_code, 400)
+
+        document = create_document('empty.pdf', 0)
+        response = self.client.post(
+            reverse('ask-document', args=[document.id]), {'question': 'Training?'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ReportCacheTests(TestCase):
+    """PDF reports are rendered once per results version and served from disk"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = self.settings(PDF_REPORT_CACHE_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.document = create_document('doc.pdf', 3)
+
+    def export(self):
+        response = self.client.get(reverse('export-document', args=[self.document.id]))
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        return response, content
+
+    def test_repeat_downloads_are_served_from_the_cache(self):
+        response, content = self.export()
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        with mock.patch.object(PDFReportService, 'write_document_report') as generate:
+            cached, cached_content = self.export()
+        generate.assert_not_called()
+        self.assertEqual(cached_content, content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_new_results_replace_the_cached_report(self):
+        response, _ = self.export()
+        Citation.objects.create(document=self.document, text='A new citation', source='Source')
+        snapshots.refresh(self.document.id)
+        updated, _ = self.export()
+        self.assertNotEqual(updated['ETag'], response['ETag'])
+        self.assertEqual(os.listdir(self.directory), [f'{self.document.id}-r{PDFReportService.VERSION}-v2.pdf'])
+
+        self.document.delete()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_citation_tables_are_chunked_and_rows_read_lazily(self):
+        Citation.objects.bulk_create([
+            Citation(document=self.document, text=f'Citation {i}', source='Source', confidence=0.5) for i in range(70)
+        ])
+        citations = self.document.citations.all()
+        section = PDFReportService()._create_citations_section(citations, {'count': 73, 'average': 0.5})
+        with self.assertNumQueries(0):
+            next(section)
+        tables = [flowable for flowable in section if isinstance(flowable, Table)]
+        self.assertEqual([len(table._cellvalues) for table in tables], [31, 31, 14])
+
+        # The report is still one valid PDF, rendered into a spooled file
+        with self.settings(PDF_REPORT_CACHE_MAX_BYTES=0):
+            _, content = self.export()
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+
+    def test_least_recently_used_reports_are_evicted(self):
+        for name in ('old', 'used', 'new'):
+            report_cache.store(name, 1, 1, io.BytesIO(b'x' * 100)).close()
+        os.utime(os.path.join(self.directory, 'old-r1-v1.pdf'), (1, 1))
+        os.utime(os.path.join(self.directory, 'used-r1-v1.pdf'), (2, 2))
+        report_cache.open_report('used', 1, 1).close()
+        report_cache.evict(max_bytes=250)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['new-r1-v1.pdf', 'used-r1-v1.pdf'])
+
+
+@override_settings(JOB_QUEUE_EAGER=True, BULK_EXPORT_PROCESSES=0)
+class BulkExportTests(TestCase):
+    """Bulk export jobs pack one report per document into a downloadable archive"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = self.settings(
+            BULK_EXPORT_DIR=os.path.join(self.directory, 'exports'),
+            PDF_REPORT_CACHE_DIR=os.path.join(self.directory, 'reports')
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.documents = [create_document('first.pdf', 2), create_document('second.pdf', 3)]
+
+    def test_reports_are_archived_and_downloaded(self):
+        document_ids = [str(document.id) for document in self.documents]
+        response = self.client.post(
+            reverse('export-batch'), {'document_ids': document_ids}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(id=response.json()['job_id'])
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result['completed'], 2)
+        self.assertEqual({entry['status'] for entry in job.stages.values()}, {'completed'})
+
+        download = self.client.get(job.result['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content))) as archive:
+            names = archive.namelist()
+            self.assertEqual(names, [bulk_export.archive_name(document.id, document.name) for document in self.documents])
+            for name in names:
+                self.assertTrue(archive.read(name).startswith(b'%PDF'))
+        # Rendered reports were added to the report cache, and no work files are left
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, 'reports'))), 2)
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'exports')), [f'{job.id}.zip'])
+
+    def test_unknown_documents_and_unfinished_jobs_are_rejected(self):
+        response = self.client.post(
+            reverse('export-batch'),
+            {'document_ids': [str(self.documents[0].id), '00000000-0000-0000-0000-000000000000']},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+        job = Job.objects.create(kind='bulk-export', params={'document_ids': []})
+        self.assertEqual(self.client.get(reverse('job-download', args=[job.id])).status_code, 409)
+        Job.objects.filter(id=job.id).update(status='completed', finished_at=timezone.now())
+        # Completed, but the archive was pruned
+        self.assertEqual(self.client.get(reverse('job-download', args=[job.id])).status_code, 404)
+
+    def test_worker_prunes_expired_archives_after_an_export(self):
+        os.makedirs(os.path.join(self.directory, 'exports'))
+        expired = os.path.join(self.directory, 'exports', 'expired.zip')
+        open(expired, 'wb').close()
+        an_hour_ago = time.time() - 3600
+        os.utime(expired, (an_hour_ago, an_hour_ago))
+
+        job = Job.objects.create(kind='bulk-export', params={'document_ids': [str(self.documents[0].id)]})
+        with self.settings(BULK_EXPORT_RETENTION_HOURS=0.5), \
+                mock.patch.object(bulk_export, 'prune', wraps=bulk_export.prune) as prune:
+            call_command('run_job_worker', once=True, prune_interval=3600, stdout=io.StringIO())
+        # On start and after the export
+        self.assertEqual(prune.call_count, 2)
+        self.assertFalse(os.path.exists(expired))
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'exports')), [f'{job.id}.zip'])
+        # 0 means no retention, not the default
+        self.assertEqual(bulk_export.prune(max_age_hours=0), 1)
+
+
+class DataExportTests(TestCase):
+    """Result tables stream as JSON Lines, CSV or Parquet in constant queries"""
+
+    def setUp(self):
+        self.documents = [create_document('first.pdf', 2), create_document('second.pdf', 3)]
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse('export-dataset', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_json_lines_carry_the_document_name_without_a_query_per_row(self):
+        with self.assertNumQueries(1):
+            chunks = list(data_export.stream('citations', 'jsonl', chunk_size=2))
+        self.assertEqual([len(chunk.splitlines()) for chunk in chunks], [2, 2, 1])
+        rows = [json.loads(line) for line in self.export('citations').splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set(rows[0]), set(data_export.DATASETS['citations'].names))
+        self.assertEqual({row['document_name'] for row in rows}, {'first.pdf', 'second.pdf'})
+
+        rows = self.export('citations', document=str(self.documents[0].id)).splitlines()
+        self.assertEqual(len(rows), 2)
+
+    def test_csv_has_a_header_and_json_columns_encoded(self):
+        PlagiarismCheck.objects.filter(document=self.documents[0]).update(matched_sources=[{'url': 'https://a'}])
+        rows = list(csv.DictReader(io.StringIO(self.export('plagiarism', format='csv').decode('utf-8'))))
+        self.assertEqual(len(rows), 5)
+        matched = [json.loads(row['matched_sources']) for row in rows if row['document_name'] == 'first.pdf']
+        self.assertEqual(matched, [[{'url': 'https://a'}]] * 2)
+
+        Summary.objects.all().delete()
+        self.assertEqual(self.export('summaries', format='csv').decode('utf-8').strip(), ','.join(
+            data_export.DATASETS['summaries'].names
+        ))
+
+    @mock.patch.object(data_export, 'pyarrow', None)
+    def test_unknown_datasets_and_formats_are_rejected(self):
+        self.assertEqual(self.client.get(reverse('export-dataset', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export-dataset', args=['citations']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export-dataset', args=['citations']), {'format': 'parquet'}).status_code, 501)
+
+    def test_command_writes_parquet_row_groups_per_chunk(self):
+        if data_export.pyarrow is None:
+            self.skipTest('pyarrow is not installed')
+        import pyarrow.parquet
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'conferences.parquet')
+            call_command('export_results', 'conferences', format='parquet', output=path, chunk_size=2, stdout=io.StringIO())
+            parquet = pyarrow.parquet.ParquetFile(path)
+            self.assertEqual(parquet.metadata.num_rows, 5)
+            self.assertEqual(parquet.metadata.num_row_groups, 3)
+            self.assertEqual(parquet.schema_arrow.names, data_export.DATASETS['conferences'].names)
+
+
+class MediaStoreTests(TestCase):
+    """Uploads are stored once per content, text compressed, and deleted with their last document"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = self.settings(MEDIA_ROOT=self.directory, MEDIA_COMPRESSION='zlib')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name, content):
+        response = self.client.post(reverse('document-upload'), {'file': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.status_code, 201)
+        return Document.objects.get(id=response.data['document']['id'])
+
+    def test_identical_uploads_share_one_compressed_blob(self):
+        text = b'The same paragraph about citation analysis. ' * 500
+        first, second = self.upload('first.txt', text), self.upload('second.txt', text)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/') and first.file.name.endswith('.zlib.txt'))
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.references, blob.size), (2, len(text)))
+        self.assertLess(os.path.getsize(first.file.path), len(text) // 10)
+
+        # Read back decompressed, also after closing and reopening
+        with first.file.open('rb'):
+            self.assertEqual(first.file.read(), text)
+        with first.file.open('rb'):
+            self.assertEqual(DocumentProcessor.extract_text_from_file(first.file), text.decode('utf-8'))
+        self.assertEqual(first.file.size, len(text))
+
+        path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get().references, 1)
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_collect_recounts_references_and_imports_plain_copies(self):
+        # PDFs are stored as they are
+        name = default_storage.save('documents/paper.pdf', ContentFile(b'%PDF-1.4 not really compressible'))
+        self.assertEqual(media_store.codec_of(name), '')
+        # Saved, but its document was never created
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+        os.makedirs(os.path.join(self.directory, 'documents'))
+        with open(os.path.join(self.directory, 'documents', 'legacy.pdf'), 'wb') as legacy:
+            legacy.write(b'%PDF-1.4 not really compressible')
+        document = Document.objects.create(name='legacy.pdf', file='documents/legacy.pdf', file_type='pdf', size=32)
+
+        call_command('collect_media', import_legacy=True, grace_hours=0, stdout=io.StringIO())
+        document.refresh_from_db()
+        self.assertEqual(document.file.name, name)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'documents', 'legacy.pdf')))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+        self.assertTrue(os.path.exists(document.file.path))
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3)
+class JobQueueTests(TestCase):
+    """Workers claim each job once, and only jobs whose heartbeat stopped are retried"""
+
+    def test_claim_takes_the_oldest_job_once(self):
+        first = Job.objects.create(kind='analysis', created_at=timezone.now() - timedelta(minutes=1))
+        second = Job.objects.create(kind='analysis')
+
+        claimed = JobQueue.claim_next('worker-a')
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), ('running', 'worker-a', 1))
+        self.assertEqual(claimed.heartbeat_at, claimed.started_at)
+        self.assertFalse(JobQueue._claim(first.id, 'worker-b'))
+        self.assertEqual(JobQueue.claim_next('worker-b').id, second.id)
+        self.assertIsNone(JobQueue.claim_next('worker-c'))
+
+    def test_stage_reports_refresh_the_heartbeat(self):
+        Job.objects.create(kind='analysis', stages={'extract': {'status': 'pending'}})
+        job = JobQueue.claim_next('worker')
+        Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        job.refresh_from_db()
+
+        JobQueue._stage_reporter(job)('extract', 'running')
+        job.refresh_from_db()
+        self.assertLess(timezone.now() - job.heartbeat_at, timedelta(minutes=1))
+        self.assertEqual(JobQueue.requeue_stale(1800), (0, 0))
+
+    def test_requeue_only_jobs_without_a_heartbeat(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        busy = Job.objects.create(
+            kind='analysis', status='running', attempts=1, started_at=long_ago, heartbeat_at=timezone.now()
+        )
+        dead = Job.objects.create(
+            kind='analysis', status='running', attempts=1, started_at=long_ago, heartbeat_at=long_ago
+        )
+
+        self.assertEqual(JobQueue.requeue_stale(1800), (1, 0))
+        self.assertEqual(Job.objects.get(id=busy.id).status, 'running')
+        self.assertEqual(Job.objects.get(id=dead.id).status, 'queued')
+        # The retry counts as another attempt
+        self.assertEqual(JobQueue.claim_next('worker').attempts, 2)
+
+    def test_jobs_out_of_attempts_are_failed(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        job = Job.objects.create(
+            kind='analysis', status='running', attempts=3, started_at=long_ago, heartbeat_at=long_ago,
+            stages={'extract': {'status': 'running'}}
+        )
+
+        self.assertEqual(JobQueue.requeue_stale(1800), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('3 attempts', job.error)
+        self.assertEqual(job.stages['extract']['status'], 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(JobQueue.claim_next('worker'))
+
+
+@override_settings(BATCH_ANALYSIS_MAX_DOCUMENTS=3, BULK_EXPORT_MAX_DOCUMENTS=3, JOB_QUEUE_EAGER=False)
+class BatchJobViewTests(TestCase):
+    """Batch analysis and export validate their documents and queue one job with a stage per document"""
+
+    BATCH_URLS = ('analyze-batch', 'export-batch')
+
+    def setUp(self):
+        self.documents = [create_document(f'doc-{index}.pdf', 0) for index in range(3)]
+        self.document_ids = [str(document.id) for document in self.documents]
+
+    def post(self, name, body):
+        return self.client.post(reverse(name), body, content_type='application/json')
+
+    def test_invalid_document_ids_are_rejected(self):
+        unknown = str(uuid.uuid4())
+        cases = [
+            ({}, 400, 'document_ids must be a non-empty list'),
+            ({'document_ids': []}, 400, 'document_ids must be a non-empty list'),
+            ({'document_ids': self.document_ids[0]}, 400, 'document_ids must be a non-empty list'),
+            ({'document_ids': self.document_ids + [unknown]}, 400, 'A batch can contain at most 3 documents'),
+            ({'document_ids': [self.document_ids[0], 'not-a-uuid']}, 400, 'document_ids must be document UUIDs'),
+            ({'document_ids': [self.document_ids[0], 7]}, 400, 'document_ids must be document UUIDs'),
+            ({'document_ids': [unknown, self.document_ids[0]]}, 404, 'Documents not found'),
+        ]
+        for name in self.BATCH_URLS:
+            for body, status_code, error in cases:
+                with self.subTest(view=name, body=body):
+                    response = self.post(name, body)
+                    self.assertEqual(response.status_code, status_code)
+                    self.assertEqual(response.json()['error'], error)
+        self.assertEqual(self.post('analyze-batch', {'document_ids': [unknown]}).json()['missing'], [unknown])
+        self.assertFalse(Job.objects.exists())
+
+    def test_a_batch_is_one_job_with_a_stage_per_document(self):
+        # Ids are normalised and de-duplicated in request order
+        requested = [self.document_ids[2], self.document_ids[0].upper(), self.document_ids[2]]
+        expected = [self.document_ids[2], self.document_ids[0]]
+        for name, kind in zip(self.BATCH_URLS, ('batch-analysis', 'bulk-export')):
+            with self.subTest(view=name):
+                response = self.post(name, {'document_ids': requested})
+                self.assertEqual(response.status_code, 202)
+                self.assertEqual(response.json()['total'], 2)
+                job = Job.objects.get(kind=kind)
+                self.assertEqual(job.params, {'document_ids': expected})
+                self.assertEqual(list(job.stages), expected)
+                self.assertEqual(response.json()['status_url'], f'/api/jobs/{job.id}/')
+
+    @override_settings(JOB_QUEUE_MAX_DEPTH=1)
+    def test_a_full_queue_answers_429(self):
+        Job.objects.create(kind='analysis')
+        for name, scope in zip(self.BATCH_URLS, ('analyze', 'export')):
+            with self.subTest(view=name):
+                response = self.post(name, {'document_ids': self.document_ids})
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response['Retry-After'], str(settings.ADMISSION_LIMITS[scope]['retry_after']))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_progress_counts_the_documents_by_status(self):
+        job = Job.objects.create(kind='batch-analysis', status='running', stages={
+            self.document_ids[0]: {'status': 'completed'},
+            self.document_ids[1]: {'status': 'cached'},
+            self.document_ids[2]: {'status': 'running'},
+            str(uuid.uuid4()): {'status': 'failed', 'error': 'Document not found'},
+            str(uuid.uuid4()): {},
+        })
+
+        response = self.client.get(reverse('job-status', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['progress'],
+            {'total': 5, 'pending': 1, 'running': 1, 'completed': 2, 'failed': 1}
+        )
+        self.assertEqual(response.json()['stages'][self.document_ids[1]], {'status': 'cached'})
+
+
+class PipelineCacheTests(TestCase):
+    """Stages are recomputed only when their own inputs or version changed"""
+
+    def setUp(self):
+        self.versions = {'clean': '1', 'upper': '1', 'words': '1'}
+        self.pipeline = Pipeline([
+            PipelineStage('clean', str.strip, inputs=['text'], version=lambda: self.versions['clean'], kind='inline'),
+            PipelineStage('upper', str.upper, inputs=['clean'], version=lambda: self.versions['upper'], kind='inline'),
+            PipelineStage(
+                'words', lambda text: len(text.split()), inputs=['clean'],
+                version=lambda: self.versions['words'], kind='inline'
+            ),
+        ])
+
+    def run_pipeline(self):
+        statuses = {}
+        self.pipeline.run(
+            {'text': '  two words '}, ['upper', 'words'],
+            on_stage=lambda stage, status, info=None: statuses.update({stage: status})
+        )
+        return statuses
+
+    def test_version_bump_reruns_only_the_affected_stages(self):
+        self.assertEqual(set(self.run_pipeline().values()), {'completed'})
+        self.assertEqual(set(self.run_pipeline().values()), {'cached'})
+
+        self.versions['upper'] = '2'
+        self.assertEqual(self.run_pipeline(), {'clean': 'cached', 'upper': 'completed', 'words': 'cached'})
+
+        # Dependents are keyed on their input's value, so they stay cached
+        # when a recomputed stage produces the same output
+        self.versions['clean'] = '2'
+        self.assertEqual(self.run_pipeline(), {'clean': 'completed', 'upper': 'cached', 'words': 'cached'})
+
+    def test_prune_drops_superseded_versions_and_old_entries(self):
+        self.run_pipeline()
+        self.versions['upper'] = '2'
+        self.run_pipeline()
+        self.assertEqual(StageCacheEntry.objects.filter(stage='upper').count(), 2)
+        StageCacheEntry.objects.create(
+            key='0' * 64, stage='segment', version='1', output=[],
+            created_at=timezone.now() - timedelta(days=31)
+        )
+
+        self.assertEqual(self.pipeline.prune_cache(max_age_days=30), 2)
+        self.assertEqual(
+            sorted(StageCacheEntry.objects.values_list('stage', 'version')),
+            [('clean', '1'), ('upper', '2'), ('words', '1')]
+        )
+        self.assertEqual(self.pipeline.prune_cache(max_age_days=0), 3)
+
+
+def fail_stage(message):
+    raise ValueError(message)
+
+
+class StageExecutorTests(TestCase):
+    """Stages run concurrently, fail independently and survive a dead process pool"""
+
+    def setUp(self):
+        StageExecutor.shutdown()
+        self.addCleanup(StageExecutor.shutdown)
+
+    def test_a_failing_stage_does_not_fail_its_siblings(self):
+        finished = []
+        results = StageExecutor().run([
+            Stage('ok', str.upper, ('a',)),
+            Stage('broken', fail_stage, ('thread',)),
+            Stage('inline_ok', str.lower, ('B',), kind='inline'),
+            Stage('inline_broken', fail_stage, ('inline',), kind='inline'),
+        ], on_finish=lambda result: finished.append(result.name))
+
+        self.assertEqual(sorted(finished), ['broken', 'inline_broken', 'inline_ok', 'ok'])
+        self.assertEqual((results['ok'].value, results['inline_ok'].value), ('A', 'b'))
+        self.assertTrue(results['ok'].ok and results['inline_ok'].ok)
+        self.assertIsInstance(results['broken'].error, ValueError)
+        self.assertEqual(str(results['inline_broken'].error), 'inline')
+
+    def test_independent_stages_run_concurrently(self):
+        # Run one after another, the first stage would time out at the barrier
+        barrier = threading.Barrier(3, timeout=5)
+        results = StageExecutor().run([
+            Stage('first', barrier.wait),
+            Stage('second', barrier.wait),
+            Stage('inline', barrier.wait, kind='inline'),
+        ])
+
+        self.assertTrue(all(result.ok for result in results.values()), results)
+        self.assertEqual(sorted(result.value for result in results.values()), [0, 1, 2])
+
+    @override_settings(STAGE_EXECUTOR_PROCESSES=1)
+    def test_a_broken_process_pool_is_recreated(self):
+        executor = StageExecutor()
+        self.assertEqual(executor.run([Stage('warm', abs, (-1,), kind='process')])['warm'].value, 1)
+        broken_pool = StageExecutor.pool('process')
+
+        # The worker dies mid-stage; a sibling on the thread pool still completes
+        results = executor.run([
+            Stage('crash', os._exit, (1,), kind='process'),
+            Stage('sibling', abs, (-2,)),
+        ])
+        self.assertIsInstance(results['crash'].error, BrokenProcessPool)
+        self.assertEqual(results['sibling'].value, 2)
+
+        results = executor.run([Stage('after', abs, (-3,), kind='process')])
+        self.assertEqual(results['after'].value, 3)
+        self.assertIsNot(StageExecutor.pool('process'), broken_pool)
+
+
+class AdmissionControlTests(TestCase):
+    """Requests wait in their process; the concurrency limit is held in the database across processes"""
+
+    def setUp(self):
+        # Per test, so every test starts with fresh counters
+        override = self.settings(
+            ADMISSION_LIMITS={'summary': {'concurrency': 1, 'queue': 0, 'timeout': 0, 'retry_after': 7}}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.limiter = admission.get_limiter('summary')
+        self.url = reverse('generate-summary', args=['00000000-0000-0000-0000-000000000000'])
+
+    def other_process(self):
+        """A limiter with its own in-process state, as in another worker"""
+        return admission.AdmissionLimiter('summary', 1)
+
+    def test_rejections_carry_retry_after_and_are_counted(self):
+        other = self.other_process()
+        running, _ = other.acquire()
+        self.assertIsNotNone(running)
+
+        # This process has a free slot, but the other process holds the only row
+        response = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        other.release(running)
+
+        # This process's only slot is taken and its queue is empty
+        lease, rejected = self.limiter.acquire()
+        self.assertIsNone(rejected)
+        response = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+
+        stats = self.client.get(reverse('admission-status')).json()['endpoints']['summary']
+        self.assertEqual(stats, {
+            'concurrency': 1,
+            'active': 1,
+            'process': {
+                'active': 1, 'queue_size': 0, 'queue_depth': 0, 'admitted': 1,
+                'rejected_queue_full': 1, 'rejected_timeout': 1, 'rejected_unavailable': 0,
+            },
+        })
+        self.limiter.release(lease)
+        self.assertEqual(self.limiter.stats()['active'], 0)
+        self.assertEqual(self.limiter.stats()['process']['active'], 0)
+
+    def test_database_errors_answer_503(self):
+        with mock.patch.object(admission.AdmissionLimiter, '_take', side_effect=OperationalError('database is locked')):
+            response = self.client.post(self.url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertIn('database is locked', response.json()['error'])
+        self.assertEqual(self.limiter.stats()['process']['rejected_unavailable'], 1)
+        # The process slot was handed back
+        self.assertIsNone(self.limiter.acquire()[1])
+
+    def test_running_requests_renew_their_lease(self):
+        lease, _ = self.limiter.acquire()
+        AdmissionSlot.objects.filter(holder=lease[1]).update(expires_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(admission._renewer.renew(), 1)
+        expires_at = AdmissionSlot.objects.get(holder=lease[1]).expires_at
+        self.assertGreater(expires_at, timezone.now() + timedelta(seconds=60))
+
+        self.limiter.release(lease)
+        self.assertEqual(admission._renewer.renew(), 0)
+
+    def test_expired_leases_are_taken_over(self):
+        other = self.other_process()
+        stale, _ = other.acquire()
+        self.assertEqual(async_to_sync(self.limiter.aacquire)()[1], 503)
+
+        # The other process died without releasing its slot
+        AdmissionSlot.objects.filter(scope='summary').update(expires_at=timezone.now() - timedelta(seconds=1))
+        lease, rejected = async_to_sync(self.limiter.aacquire)()
+        self.assertIsNone(rejected)
+        self.assertEqual(lease[0], stale[0])
+        # The process that lost the lease cannot free the new holder's slot
+        other.release(stale)
+        self.assertEqual(self.other_process().acquire()[1], 503)
+
+
+@override_settings(ROOT_URLCONF='document_summarizer.asgi_urls', JOB_QUEUE_ASGI_MAX_RUNNING=1)
+class AsgiJobTests(TestCase):
+    """Under ASGI, analysis jobs only run in-process when enabled, and a bounded number at once"""
+
+    def setUp(self):
+        self.document = create_document('paper.pdf', 0)
+        self.finish = asyncio.Event()
+
+    async def arun(self, job):
+        await self.finish.wait()
+        return job
+
+    async def analyze(self):
+        response = await self.async_client.post(reverse('analyze-document', args=[self.document.id]))
+        self.assertEqual(response.status_code, 202)
+        return await Job.objects.aget(id=response.json()['job_id'])
+
+    async def test_jobs_are_left_for_the_workers_by_default(self):
+        with mock.patch.object(JobQueue, 'arun', side_effect=self.arun) as arun:
+            job = await self.analyze()
+        self.assertEqual(job.status, 'queued')
+        arun.assert_not_called()
+
+    @override_settings(JOB_QUEUE_RUN_IN_ASGI=True)
+    async def test_jobs_beyond_the_limit_stay_queued(self):
+        with mock.patch.object(JobQueue, 'arun', side_effect=self.arun):
+            first = await self.analyze()
+            second = await self.analyze()
+            self.assertEqual((first.status, first.worker[:5]), ('running', 'asgi:'))
+            self.assertEqual(second.status, 'queued')
+
+            self.finish.set()
+            await asyncio.gather(*job_service._running_tasks)
+            self.assertIsNotNone(await JobQueue.astart(second))
+            await asyncio.gather(*job_service._running_tasks)
+        self.assertEqual(job_service._starting, 0)
+
+
+class MalformedBodyTests(TestCase):
+    """A body that is not valid JSON is a 400, under WSGI and ASGI alike"""
+
+    def setUp(self):
+        self.document = create_document('paper.pdf', 0)
+        self.urls = [
+            reverse('generate-summary', args=[self.document.id]),
+            reverse('ask-document', args=[self.document.id]),
+        ]
+
+    def assertParseError(self, response):
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error - '), response.json())
+
+    def test_wsgi_views(self):
+        for url in self.urls + [reverse('analyze-batch'), reverse('export-batch')]:
+            with self.subTest(url=url):
+                self.assertParseError(self.client.post(url, '{"question": ', content_type='application/json'))
+        self.assertFalse(Job.objects.exists())
+
+    async def test_asgi_views(self):
+        with self.settings(ROOT_URLCONF='document_summarizer.asgi_urls'):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = await self.async_client.post(url, '{"question": ', content_type='application/json')
+                    self.assertParseError(response)
+
+
+class DocumentEventsTests(TestCase):
+    """Progress events are streamed under ASGI only"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = self.settings(MEDIA_ROOT=directory.name, JOB_QUEUE_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.document = Document.objects.create(
+            name='paper.txt', file=ContentFile(b'See Smith et al. (2020) for details.\n', name='paper.txt'),
+            file_type='txt', size=38
+        )
+
+    async def test_asgi_stream_follows_the_analysis(self):
+        # Only the citations stage, whose Gemini call falls back to local detection without an API key
+        with self.settings(GOOGLE_GEMINI_API_KEY=''), \
+                mock.patch.object(DocumentAnalysisService, 'STAGES', ['citations']), \
+                mock.patch.dict(job_service.JOB_STAGES, {'analysis': ['extract', 'citations']}):
+            response = await self.async_client.post(reverse('analyze-document', args=[self.document.id]))
+        job_id = response.json()['job_id']
+
+        with self.settings(ROOT_URLCONF='document_summarizer.asgi_urls'):
+            stream = await self.async_client.get(reverse('document-events', args=[self.document.id]), {'job': job_id})
+            chunks = [chunk.decode() async for chunk in stream.streaming_content]
+        self.assertEqual(stream['Content-Type'], 'text/event-stream')
+        self.assertTrue(chunks[0].startswith('retry: '))
+        received = []
+        for chunk in chunks[1:]:
+            fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            received.append((fields['event'], json.loads(fields['data']).get('stage', '')))
+        self.assertEqual(received, [
+            ('job-queued', ''), ('job-started', ''),
+            ('stage-started', 'extract'), ('stage-finished', 'extract'),
+            ('stage-started', 'citations'), ('partial-result', 'citations'), ('stage-finished', 'citations'),
+            ('job-finished', ''), ('end', ''),
+        ])
+
+    def test_wsgi_points_to_job_polling(self):
+        job = Job.objects.create(kind='analysis', document=self.document)
+        response = self.client.get(reverse('document-events', args=[self.document.id]), {'job': job.id})
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json()['status_url'], f'/api/jobs/{job.id}/')
+
+    @override_settings(EVENT_RETENTION_HOURS=24)
+    def test_prune_keeps_events_within_the_retention(self):
+        now = timezone.now()
+        for hours in (0, 2, 30):
+            AnalysisEvent.objects.create(
+                document=self.document, event='stage-started', created_at=now - timedelta(hours=hours)
+            )
+
+        self.assertEqual(events.prune(), 1)
+        self.assertEqual(events.prune(max_age_hours=1), 1)
+        # Zero hours keeps nothing rather than falling back to the retention setting
+        self.assertEqual(events.prune(max_age_hours=0), 1)
+        self.assertFalse(AnalysisEvent.objects.exists())
+
+
+class AnalyticsCounterTests(TestCase):
+    """The Analytics counters track the tables they count, and creations are rolled up"""
+
+    COUNTERS = [
+        'total_documents', 'processed_documents', 'documents_today',
+        'citations_found', 'plagiarism_detected', 'conferences_matched',
+    ]
+
+    def assertCountersMatchTables(self):
+        analytics = AnalyticsService.snapshot()
+        counts = AnalyticsService.calculate_analytics()
+        self.assertEqual(
+            {name: getattr(analytics, name) for name in self.COUNTERS},
+            {name: counts[name] for name in self.COUNTERS}
+        )
+
+    def rollups(self, metric):
+        """``{granularity: count}`` of the metric's buckets for now"""
+        now = timezone.now()
+        return {
+            granularity: AnalyticsRollup.objects.filter(
+                granularity=granularity, metric=metric, bucket=AnalyticsService.bucket_start(granularity, now)
+            ).values_list('count', flat=True).first()
+            for granularity in AnalyticsRollup.GRANULARITIES
+        }
+
+    def test_counters_follow_creates_and_deletes(self):
+        first = Document.objects.create(name='first.pdf', file='documents/first.pdf', file_type='pdf', size=1, processed=True)
+        second = Document.objects.create(name='second.pdf', file='documents/second.pdf', file_type='pdf', size=1)
+        citations = [Citation.objects.create(document=document, text='Citation', source='') for document in (first, first, second)]
+        PlagiarismCheck.objects.create(document=first, similarity_percentage=12.0, status='completed')
+        ConferenceSuggestion.objects.create(document=second, conference_name='Conf', confidence_score=0.5)
+        self.assertCountersMatchTables()
+        self.assertEqual(AnalyticsService.snapshot().citations_found, 3)
+
+        citations[0].delete()
+        self.assertCountersMatchTables()
+
+        # Cascades to one citation and the plagiarism check
+        first.delete()
+        self.assertCountersMatchTables()
+        self.assertEqual(
+            [getattr(AnalyticsService.snapshot(), name) for name in self.COUNTERS],
+            [1, 0, 1, 1, 0, 1]
+        )
+
+        Citation.objects.filter(document=second).delete()
+        self.assertCountersMatchTables()
+
+    def test_bulk_stored_results_are_counted(self):
+        document = Document.objects.create(name='paper.pdf', file='documents/paper.pdf', file_type='pdf', size=1)
+        result = StageResult('citations', value=[{'text': f'Citation {i}', 'source': 'Source'} for i in range(5)])
+        DocumentAnalysisService().store_citations({'document': document, 'job': None}, 'text', result)
+        self.assertCountersMatchTables()
+        self.assertEqual(AnalyticsService.snapshot().citations_found, 5)
+        self.assertEqual(self.rollups('citations'), {'hour': 5, 'day': 5})
+
+    def test_rollups_count_creations_only(self):
+        documents = [
+            Document.objects.create(name=f'{i}.pdf', file=f'documents/{i}.pdf', file_type='pdf', size=1)
+            for i in range(3)
+        ]
+        Citation.objects.create(document=documents[0], text='Citation', source='')
+        self.assertEqual(self.rollups('documents'), {'hour': 3, 'day': 3})
+        self.assertEqual(self.rollups('citations'), {'hour': 1, 'day': 1})
+
+        # Rollups record what happened in each period, so deletions keep them
+        documents[0].delete()
+        self.assertEqual(self.rollups('documents'), {'hour': 3, 'day': 3})
+        self.assertEqual(self.rollups('citations'), {'hour': 1, 'day': 1})
+        self.assertCountersMatchTables()
@@ -5,13 +5,24 @@ urlpatterns = [
     # Document management
     path('documents/upload/', views.DocumentUploadView.as_view(), name='document-upload'),
     path('documents/', views.DocumentListView.as_view(), name='document-list'),
+    path('documents/results/', views.DocumentBulkResultsView.as_view(), name='document-results-bulk'),
     path('documents/<uuid:document_id>/', views.DocumentResultsView.as_view(), name='document-results'),
+    path('documents/<uuid:document_id>/similar/', views.SimilarDocumentsView.as_view(), name='similar-documents'),
+    path('documents/<uuid:document_id>/ask/', views.AskDocumentView.as_view(), name='ask-document'),
     
     # Summary generation
     path('documents/<uuid:document_id>/summary/', views.SummaryView.as_view(), name='generate-summary'),
     
     # Document analysis
     path('documents/<uuid:document_id>/analyze/', views.DocumentAnalysisView.as_view(), name='analyze-document'),
+    path('documents/analyze-batch/', views.DocumentBatchAnalysisView.as_view(), name='analyze-batch'),
+    
+    # Analysis progress events (Server-Sent Events)
+    path('documents/<uuid:document_id>/events/', views.document_events, name='document-events'),
+    
+    # Background jobs
+    path('jobs/<uuid:job_id>/', views.JobStatusView.as_view(), name='job-status'),
+    path('jobs/<uuid:job_id>/download/', views.JobDownloadView.as_view(), name='job-download'),
     
     # Citations
     path('documents/<uuid:document_id>/citations/', views.CitationListView.as_view(), name='citation-list'),
@@ -24,10 +35,17 @@ urlpatterns = [
     
     # Export functionality
     path('documents/<uuid:document_id>/export/', views.ExportDocumentView.as_view(), name='export-document'),
+    path('documents/export-batch/', views.DocumentBatchExportView.as_view(), name='export-batch'),
+    path('export/<str:dataset>/', views.export_dataset, name='export-dataset'),
+    
+    # Full-text search
+    path('search/', views.SearchView.as_view(), name='search'),
     
     # Analytics
     path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('analytics/timeseries/', views.AnalyticsTimeseriesView.as_view(), name='analytics-timeseries'),
     
     # Health check
     path('health/', views.health_check, name='health-check'),
+    path('health/admission/', views.admission_status, name='admission-status'),
 ]
@@ -1,24 +1,34 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
 import time
 import json
+import tempfile
+import uuid
 
-from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics
+from .models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Job, SearchEntry
 from .serializers import (
     DocumentSerializer, SummarySerializer, CitationSerializer,
     PlagiarismCheckSerializer, ConferenceSuggestionSerializer,
-    AnalyticsSerializer, DocumentResultsSerializer
-)
-from .services import (
-    DocumentProcessor, GeminiService, CopyleaksService,
-    ConferenceSuggestionService, AnalyticsService
+    AnalyticsSerializer, DocumentResultsSerializer, JobSerializer
 )
+from .services import DocumentProcessor, GeminiService, AnalyticsService
+from .analysis_service import DocumentAnalysisService
+from .job_service import JobQueue
+from . import bulk_export, data_export, events, fast_json, report_cache, retrieval, search, similarity, snapshots
+from .admission import admission_controlled, admission_stats
 from .pdf_service import PDFReportService
+from .fast_json import ValuesSerializer
+from .pagination import InvalidCursor, paginate
 
 
 class DocumentUploadView(APIView):
@@ -34,27 +44,24 @@ class DocumentUploadView(APIView):
             
             file = request.FILES['file']
             
-            # Create document record
-            document = Document.objects.create(
-                name=file.name,
-                file=file,
-                file_type=file.name.split('.')[-1].lower(),
-                size=file.size
-            )
-            
             # Extract text from document
             try:
                 text = DocumentProcessor.extract_text_from_file(file)
             except Exception as e:
-                document.delete()
                 return Response(
                     {'error': f'Error processing file: {str(e)}'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Mark as processed
-            document.processed = True
-            document.save()
+            # Create the document record, already processed, in one INSERT
+            document = Document.objects.create(
+                name=file.name,
+                file=file,
+                file_type=file.name.split('.')[-1].lower(),
+                size=file.size,
+                processed=True
+            )
+            DocumentProcessor.store_text(document, text)
             
             serializer = DocumentSerializer(document)
             return Response({
@@ -70,13 +77,62 @@ class DocumentUploadView(APIView):
 
 
 class DocumentListView(APIView):
-    """List all documents"""
+    """List documents, newest first, one keyset-paginated page at a time.
+    
+    Query parameters: ``limit``, ``cursor`` (``next_cursor`` of the previous
+    page), ``fields`` (comma-separated), ``file_type``, ``processed`` and
+    ``uploaded_after``/``uploaded_before`` (ISO date or datetime). Rows are
+    read with ``.values()`` and encoded by ``fast_json`` (same bytes as DRF).
+    """
     
     def get(self, request):
         try:
-            documents = Document.objects.all()
-            serializer = DocumentSerializer(documents, many=True)
-            return Response(serializer.data)
+            params = request.query_params
+            
+            try:
+                limit = int(params.get('limit', settings.DOCUMENT_LIST_PAGE_SIZE))
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, settings.DOCUMENT_LIST_MAX_PAGE_SIZE))
+            
+            fields = DocumentSerializer.Meta.fields
+            if params.get('fields'):
+                fields = [name.strip() for name in params['fields'].split(',') if name.strip()]
+                unknown = sorted(set(fields) - set(DocumentSerializer.Meta.fields))
+                if unknown:
+                    return Response(
+                        {'error': f"Unknown fields: {', '.join(unknown)}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            
+            # Only read the selected columns (plus the pagination key), as plain rows
+            rows = ValuesSerializer(DocumentSerializer(fields=fields))
+            documents = Document.objects.values(*set(fields) | {'id', 'uploaded_at'})
+            
+            if params.get('file_type'):
+                documents = documents.filter(file_type=params['file_type'].lower())
+            if params.get('processed'):
+                documents = documents.filter(processed=params['processed'].lower() == 'true')
+            for param, lookup in (('uploaded_after', 'uploaded_at__gte'), ('uploaded_before', 'uploaded_at__lt')):
+                if params.get(param):
+                    value = _parse_date_param(params[param])
+                    if value is None:
+                        return Response(
+                            {'error': f'{param} must be an ISO date or datetime'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                    documents = documents.filter(**{lookup: value})
+            
+            try:
+                page, next_cursor = paginate(documents, params.get('cursor'), limit)
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return HttpResponse(fast_json.dumps({
+                'results': [rows.row(values) for values in page],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+            }), content_type='application/json')
         except Exception as e:
             return Response(
                 {'error': f'Failed to list documents: {str(e)}'}, 
@@ -84,58 +140,42 @@ class DocumentListView(APIView):
             )
 
 
+def _parse_date_param(value):
+    """Parse an ISO datetime or date query parameter, None if invalid"""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.combine(day, datetime.min.time())
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 class SummaryView(APIView):
     """Generate summary for a document"""
     
+    @admission_controlled('summary')
     def post(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
             
-            # Extract text from document
-            text = DocumentProcessor.extract_text_from_file(document.file)
-            
             # Get word count from request
             max_words = request.data.get('max_words', 200)
             
-            # Generate summary using Gemini
-            try:
-                gemini_service = GeminiService()
-                summary_text = gemini_service.generate_summary(text, max_words)
-                print(f"✅ Summary generated: {len(summary_text)} characters")
-            except Exception as e:
-                print(f"Summary generation failed: {e}")
-                # Enhanced fallback summary
-                sentences = text.split('.')
-                summary_sentences = []
-                word_count = 0
-                
-                for sentence in sentences:
-                    sentence_words = sentence.strip().split()
-                    if word_count + len(sentence_words) <= max_words:
-                        summary_sentences.append(sentence.strip())
-                        word_count += len(sentence_words)
-                    else:
-                        break
-                
-                summary_text = '. '.join(summary_sentences)
-                if summary_text and not summary_text.endswith('.'):
-                    summary_text += '.'
-                
-                if len(text.split()) > max_words:
-                    summary_text += " [Summary truncated]"
-                
-                summary_text = summary_text if summary_text else f"Summary of {len(text.split())} words document."
-            
-            # Create summary record
-            summary = Summary.objects.create(
-                document=document,
-                content=summary_text,
-                word_count=len(summary_text.split())
-            )
+            # Generate summary using Gemini (cached per text and length)
+            summary = DocumentAnalysisService().summarize(document, max_words)
             
             serializer = SummarySerializer(summary)
             return Response(serializer.data)
             
+        except ParseError:
+            # Malformed request body, answered with 400 by DRF
+            raise
         except Exception as e:
             return Response(
                 {'error': f'Failed to generate summary: {str(e)}'}, 
@@ -144,152 +184,178 @@ class SummaryView(APIView):
 
 
 class DocumentAnalysisView(APIView):
-    """Analyze document for citations, plagiarism, and conference suggestions"""
+    """Queue citation, plagiarism and conference analysis for a document"""
     
+    @admission_controlled('analyze')
     def post(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
-            start_time = time.time()
             
-            # Extract text from document
-            text = DocumentProcessor.extract_text_from_file(document.file)
-            print(f"✅ Extracted text: {len(text)} characters")
+            if JobQueue.is_full():
+                response = Response(
+                    {'error': 'Analysis queue is full, please retry later'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+                response['Retry-After'] = str(settings.ADMISSION_LIMITS['analyze']['retry_after'])
+                return response
             
-            # Detect citations
-            try:
-                gemini_service = GeminiService()
-                citations_data = gemini_service.detect_citations(text)
-                print(f"✅ Detected {len(citations_data)} citations")
-                
-                for citation_data in citations_data:
-                    Citation.objects.create(
-                        document=document,
-                        text=citation_data.get('text', ''),
-                        source=citation_data.get('source', ''),
-                        confidence=citation_data.get('confidence', 0.8)
-                    )
-                print(f"✅ Created {len(citations_data)} citations in database")
-            except Exception as e:
-                print(f"Citation detection failed: {e}")
-                # Create more meaningful fallback citations
-                try:
-                    # Extract meaningful content from the document
-                    sentences = text.split('.')
-                    meaningful_content = []
-                    
-                    # Look for sentences with academic keywords
-                    academic_keywords = ['research', 'study', 'analysis', 'data', 'results', 'conclusion', 
-                                      'method', 'approach', 'framework', 'model', 'algorithm', 'evaluation']
-                    
-                    for sentence in sentences:
-                        sentence = sentence.strip()
-                        if len(sentence) > 30 and len(sentence) < 200:  # Reasonable length
-                            if any(keyword in sentence.lower() for keyword in academic_keywords):
-                                meaningful_content.append(sentence)
-                    
-                    # If no academic sentences found, take substantial sentences
-                    if not meaningful_content:
-                        for sentence in sentences[:5]:
-                            sentence = sentence.strip()
-                            if len(sentence) > 40:  # Substantial sentences
-                                meaningful_content.append(sentence)
-                    
-                    # Create citations from meaningful content
-                    for i, content in enumerate(meaningful_content[:3]):
-                        if content:
-                            Citation.objects.create(
-                                document=document,
-                                text=content[:150] + "..." if len(content) > 150 else content,
-                                source=f"Document content analysis - Key point {i+1}",
-                                confidence=0.7
-                            )
-                    
-                    # If still no content, create a basic citation
-                    if not meaningful_content:
-                        Citation.objects.create(
-                            document=document,
-                            text=text[:200] + "..." if len(text) > 200 else text,
-                            source="Document content analysis",
-                            confidence=0.6
-                        )
-                        
-                except Exception as fallback_error:
-                    print(f"Fallback citation creation also failed: {fallback_error}")
-                    # Final fallback
-                    Citation.objects.create(
-                        document=document,
-                        text="Document content analyzed",
-                        source="Content analysis",
-                        confidence=0.5
-                    )
+            job = JobQueue.enqueue('analysis', document=document)
             
-            # Check plagiarism
-            try:
-                copyleaks_service = CopyleaksService()
-                plagiarism_result = copyleaks_service.check_plagiarism(text, document.name)
-                
-                PlagiarismCheck.objects.create(
-                    document=document,
-                    similarity_percentage=plagiarism_result['similarity_percentage'],
-                    matched_sources=plagiarism_result['matched_sources'],
-                    status=plagiarism_result['status']
+            return Response({
+                'message': 'Document analysis queued',
+                'job_id': str(job.id),
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except Exception as e:
+            return Response(
+                {'error': f'Analysis failed: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def _batch_document_ids(request, max_documents):
+    """``(document_ids, None)`` for a batch request's ``document_ids``, normalised
+    and de-duplicated in request order, or ``(None, error response)``"""
+    document_ids = request.data.get('document_ids')
+    if not isinstance(document_ids, list) or not document_ids:
+        return None, Response(
+            {'error': 'document_ids must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if len(document_ids) > max_documents:
+        return None, Response(
+            {'error': f'A batch can contain at most {max_documents} documents'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        document_ids = list(dict.fromkeys(str(uuid.UUID(str(value))) for value in document_ids))
+    except ValueError:
+        return None, Response(
+            {'error': 'document_ids must be document UUIDs'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    found = {str(pk) for pk in Document.objects.filter(id__in=document_ids).values_list('id', flat=True)}
+    missing = [document_id for document_id in document_ids if document_id not in found]
+    if missing:
+        return None, Response(
+            {'error': 'Documents not found', 'missing': missing},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return document_ids, None
+
+
+class DocumentBatchAnalysisView(APIView):
+    """Queue analysis for many documents as a single batch job"""
+    
+    @admission_controlled('analyze')
+    def post(self, request):
+        try:
+            document_ids, error = _batch_document_ids(request, settings.BATCH_ANALYSIS_MAX_DOCUMENTS)
+            if error is not None:
+                return error
+            
+            if JobQueue.is_full():
+                response = Response(
+                    {'error': 'Analysis queue is full, please retry later'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
                 )
-                print(f"✅ Created plagiarism check: {plagiarism_result['similarity_percentage']}%")
-            except Exception as e:
-                print(f"Plagiarism check failed: {e}")
-                # Create fallback plagiarism check
-                PlagiarismCheck.objects.create(
-                    document=document,
-                    similarity_percentage=15.5,
-                    matched_sources=[],
-                    status='completed'
+                response['Retry-After'] = str(settings.ADMISSION_LIMITS['analyze']['retry_after'])
+                return response
+            
+            # One job for the whole batch; its stages track each document
+            job = JobQueue.enqueue(
+                'batch-analysis',
+                params={'document_ids': document_ids},
+                stages=document_ids
+            )
+            
+            return Response({
+                'message': 'Batch analysis queued',
+                'batch_id': str(job.id),
+                'total': len(document_ids),
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except ParseError:
+            # Malformed request body, answered with 400 by DRF
+            raise
+        except Exception as e:
+            return Response(
+                {'error': f'Batch analysis failed: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class JobStatusView(APIView):
+    """Get the status of a background job"""
+    
+    def get(self, request, job_id):
+        try:
+            job = get_object_or_404(Job, id=job_id)
+            serializer = JobSerializer(job)
+            return Response(serializer.data)
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to get job: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class JobDownloadView(APIView):
+    """Download the archive produced by a completed bulk export job"""
+    
+    def get(self, request, job_id):
+        try:
+            job = get_object_or_404(Job, id=job_id, kind='bulk-export')
+            if job.status != 'completed':
+                return Response(
+                    {'error': f'Export is {job.status}', 'status_url': f'/api/jobs/{job.id}/'},
+                    status=status.HTTP_409_CONFLICT
                 )
             
-            # Suggest conferences
             try:
-                conference_service = ConferenceSuggestionService()
-                suggestions = conference_service.suggest_conferences(text)
-                
-                for suggestion in suggestions:
-                    ConferenceSuggestion.objects.create(
-                        document=document,
-                        conference_name=suggestion['conference_name'],
-                        confidence_score=suggestion['confidence_score'],
-                        reasoning=suggestion['reasoning']
-                    )
-                print(f"✅ Created {len(suggestions)} conference suggestions")
-            except Exception as e:
-                print(f"Conference suggestion failed: {e}")
-                # Create fallback conference suggestion
-                ConferenceSuggestion.objects.create(
-                    document=document,
-                    conference_name="VLDB",
-                    confidence_score=0.85,
-                    reasoning="Default conference suggestion"
+                archive = open(bulk_export.archive_path(job.id), 'rb')
+            except FileNotFoundError:
+                return Response(
+                    {'error': 'Export archive has expired'},
+                    status=status.HTTP_404_NOT_FOUND
                 )
             
-            processing_time = time.time() - start_time
-            
-            return Response({
-                'message': 'Document analysis completed',
-                'processing_time': processing_time
-            })
+            filename = f"document_reports_{job.finished_at.strftime('%Y%m%d_%H%M%S')}.zip"
+            return FileResponse(archive, as_attachment=True, filename=filename, content_type='application/zip')
             
         except Exception as e:
             return Response(
-                {'error': f'Analysis failed: {str(e)}'}, 
+                {'error': f'Download failed: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
 class DocumentResultsView(APIView):
-    """Get complete results for a document"""
+    """Get complete results for a document.
+
+    Serves the pre-rendered results snapshot (see ``snapshots.py``) with its
+    version as the ETag. A matching If-None-Match gets 304 after a single
+    primary-key lookup.
+    """
     
     def get(self, request, document_id):
         try:
-            document = get_object_or_404(Document, id=document_id)
-            serializer = DocumentResultsSerializer(document)
-            return Response(serializer.data)
+            version, content = snapshots.current(document_id, request.headers.get('If-None-Match'))
+            if content is None:
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = HttpResponse(content, content_type='application/json')
+            response['ETag'] = snapshots.etag(version)
+            # Clients may cache the body but must revalidate it
+            response['Cache-Control'] = 'no-cache'
+            return response
         except Exception as e:
             return Response(
                 {'error': f'Failed to get results: {str(e)}'}, 
@@ -297,30 +363,86 @@ class DocumentResultsView(APIView):
             )
 
 
-class AnalyticsView(APIView):
-    """Get analytics data"""
+class DocumentBulkResultsView(APIView):
+    """Get results for many documents in one response.
+
+    Query parameters: ``ids`` (comma-separated document UUIDs, at most
+    DOCUMENT_RESULTS_MAX_IDS) and ``include`` (optional comma-separated
+    subset of summaries, citations, plagiarism_checks,
+    conference_suggestions and plagiarismScore). Results follow the order of
+    ``ids`` and unknown ids are listed under ``missing``. Full results are
+    the stored snapshots joined together, one query when they are all
+    fresh; with ``include`` only the selected relations are prefetched.
+    """
     
     def get(self, request):
         try:
-            # Calculate analytics
-            analytics_data = AnalyticsService.calculate_analytics()
+            params = request.query_params
+            values = [value.strip() for value in params.get('ids', '').split(',') if value.strip()]
+            if not values:
+                return Response({'error': 'ids must list at least one document id'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                # Normalise and de-duplicate, keeping the request order
+                document_ids = list(dict.fromkeys(str(uuid.UUID(value)) for value in values))
+            except ValueError:
+                return Response({'error': 'ids must be document UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Create or update analytics record
-            analytics = None
-            if Analytics.objects.exists():
-                analytics = Analytics.objects.first()
-            else:
-                analytics = Analytics.objects.create()
+            max_ids = settings.DOCUMENT_RESULTS_MAX_IDS
+            if len(document_ids) > max_ids:
+                return Response(
+                    {'error': f'At most {max_ids} documents can be fetched at once'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Update analytics with new data
-            for key, value in analytics_data.items():
-                setattr(analytics, key, value)
-            analytics.updated_at = timezone.now()
-            analytics.save()
+            include = None
+            if params.get('include'):
+                include = [name.strip() for name in params['include'].split(',') if name.strip()]
+                unknown = sorted(set(include) - set(DocumentResultsSerializer.INCLUDABLE))
+                if unknown:
+                    return Response(
+                        {'error': f"Unknown include values: {', '.join(unknown)}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
             
-            print(f"✅ Analytics record updated: {analytics.id}")
+            if include is None:
+                contents = snapshots.many(document_ids)
+                missing = [document_id for document_id in document_ids if document_id not in contents]
+                return HttpResponse(
+                    b'{"results":[' + b','.join(contents[document_id] for document_id in document_ids if document_id in contents)
+                    + b'],"missing":' + fast_json.dumps(missing) + b'}',
+                    content_type='application/json'
+                )
             
-            serializer = AnalyticsSerializer(analytics)
+            documents = {
+                str(document.id): document
+                for document in DocumentResultsSerializer.prefetch(Document.objects.filter(id__in=document_ids), include)
+            }
+            serializer = DocumentResultsSerializer(
+                [documents[document_id] for document_id in document_ids if document_id in documents],
+                many=True,
+                include=include
+            )
+            return Response({
+                'results': serializer.data,
+                'missing': [document_id for document_id in document_ids if document_id not in documents],
+            })
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to get results: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AnalyticsView(APIView):
+    """Get analytics data.
+
+    Serves the incrementally maintained counters row, so dashboard polling
+    costs one single-row read and never writes.
+    """
+    
+    def get(self, request):
+        try:
+            serializer = AnalyticsSerializer(AnalyticsService.snapshot())
             return Response(serializer.data)
             
         except Exception as e:
@@ -331,15 +453,205 @@ class AnalyticsView(APIView):
             )
 
 
+class AnalyticsTimeseriesView(APIView):
+    """Hourly or daily analytics rollups for dashboard charts.
+
+    Query parameters: ``granularity`` (``hour`` or ``day``), ``metrics``
+    (comma-separated, default all), ``start`` and ``end`` (ISO date or
+    datetime; default the last 24 hours or 30 days). Reads one rollup row
+    per metric and bucket, never the raw tables.
+    """
+    
+    DEFAULT_RANGES = {'hour': timedelta(hours=24), 'day': timedelta(days=30)}
+    
+    def get(self, request):
+        try:
+            params = request.query_params
+            granularity = params.get('granularity', 'hour')
+            if granularity not in self.DEFAULT_RANGES:
+                return Response(
+                    {'error': "granularity must be 'hour' or 'day'"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            bounds = {}
+            for param in ('start', 'end'):
+                if params.get(param):
+                    bounds[param] = _parse_date_param(params[param])
+                    if bounds[param] is None:
+                        return Response(
+                            {'error': f'{param} must be an ISO date or datetime'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+            end = bounds.get('end') or timezone.now()
+            start = bounds.get('start') or end - self.DEFAULT_RANGES[granularity]
+            if start >= end:
+                return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+            if (end - AnalyticsService.bucket_start(granularity, start)) / step > settings.ANALYTICS_TIMESERIES_MAX_BUCKETS:
+                return Response(
+                    {'error': f'Range spans more than {settings.ANALYTICS_TIMESERIES_MAX_BUCKETS} {granularity} buckets'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            metrics = [name.strip() for name in params.get('metrics', '').split(',') if name.strip()]
+            return Response({
+                'granularity': granularity,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'series': AnalyticsService.timeseries(granularity, start, end, metrics or None),
+            })
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to get analytics timeseries: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SearchView(APIView):
+    """Ranked full-text search over document texts, summaries and citations.
+
+    Query parameters: ``q`` (every word must match), ``kind``
+    (comma-separated subset of document, summary and citation), ``page``
+    (from 1) and ``page_size``. Matching and ranking run in the database's
+    full-text index (see ``search.py``).
+    """
+    
+    def get(self, request):
+        try:
+            params = request.query_params
+            query = params.get('q', '')
+            if not search.terms(query):
+                return Response({'error': 'q must contain at least one word'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            kinds = [kind.strip() for kind in params.get('kind', '').split(',') if kind.strip()]
+            unknown = sorted(set(kinds) - set(SearchEntry.KINDS))
+            if unknown:
+                return Response({'error': f"Unknown kinds: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                page = int(params.get('page', 1))
+                page_size = int(params.get('page_size', settings.SEARCH_PAGE_SIZE))
+            except ValueError:
+                return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+            page = max(page, 1)
+            page_size = max(1, min(page_size, settings.SEARCH_MAX_PAGE_SIZE))
+            
+            results, has_more = search.search(query, kinds, limit=page_size, offset=(page - 1) * page_size)
+            return Response({'results': results, 'page': page, 'has_more': has_more})
+        except Exception as e:
+            return Response(
+                {'error': f'Search failed: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SimilarDocumentsView(APIView):
+    """Documents whose text is most similar to this one, best first.
+
+    Query parameter ``k`` (default 10, at most SIMILARITY_MAX_RESULTS).
+    Scores are cosine similarities of hashed term vectors (see
+    ``similarity.py``); ``method`` says whether the search was exact or
+    used the approximate index.
+    """
+    
+    def get(self, request, document_id):
+        try:
+            try:
+                k = int(request.query_params.get('k', 10))
+            except ValueError:
+                return Response({'error': 'k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            k = max(1, min(k, settings.SIMILARITY_MAX_RESULTS))
+            
+            found = similarity.similar(document_id, k)
+            if found is None:
+                return Response(
+                    {'error': 'Document not found or its text has not been extracted'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            matches, method = found
+            names = dict(Document.objects.filter(id__in=[match[0] for match in matches]).values_list('id', 'name'))
+            return Response({
+                'document_id': str(document_id),
+                'method': method,
+                'results': [
+                    {'document_id': match_id, 'name': names[uuid.UUID(match_id)], 'score': score}
+                    for match_id, score in matches if uuid.UUID(match_id) in names
+                ],
+            })
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to find similar documents: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AskDocumentView(APIView):
+    """Answer a question about a document from its most relevant passages.
+
+    Body: ``question`` and optionally ``top_k`` (passages sent to Gemini,
+    default ASK_TOP_PASSAGES, at most ASK_MAX_TOP_PASSAGES). Passages are
+    ranked with the document's BM25 index (see ``retrieval.py``), so the
+    prompt has the same size for any document length.
+    """
+    
+    @admission_controlled('ask')
+    def post(self, request, document_id):
+        try:
+            question = str(request.data.get('question') or '').strip()
+            if not question:
+                return Response({'error': 'question is required'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(question) > settings.ASK_MAX_QUESTION_CHARS:
+                return Response(
+                    {'error': f'question is longer than {settings.ASK_MAX_QUESTION_CHARS} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                top_k = int(request.data.get('top_k', settings.ASK_TOP_PASSAGES))
+            except (TypeError, ValueError):
+                return Response({'error': 'top_k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            top_k = max(1, min(top_k, settings.ASK_MAX_TOP_PASSAGES))
+            
+            started = time.perf_counter()
+            passages = retrieval.retrieve(document_id, question, top_k)
+            if passages is None:
+                return Response(
+                    {'error': 'Document not found or its text has not been extracted'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            gemini_service = GeminiService()
+            answer = gemini_service.answer_question(question, passages)
+            AnalyticsService.record_stage('ask', 'completed', {
+                'elapsed': time.perf_counter() - started,
+                'usage': gemini_service.usage if gemini_service.usage['calls'] else None,
+            })
+            
+            return Response({
+                'document_id': str(document_id),
+                'question': question,
+                'answer': answer,
+                'passages': passages,
+                'fallback': gemini_service.used_fallback,
+            })
+        except ParseError:
+            # Malformed request body, answered with 400 by DRF
+            raise
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to answer question: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class CitationListView(APIView):
-    """List citations for a document"""
+    """List citations for a document, streamed from ``.values()`` rows (see ``fast_json``)"""
     
     def get(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
-            citations = document.citations.all()
-            serializer = CitationSerializer(citations, many=True)
-            return Response(serializer.data)
+            rows = ValuesSerializer(CitationSerializer()).rows(document.citations.all())
+            return StreamingHttpResponse(fast_json.stream_array(rows), content_type='application/json')
         except Exception as e:
             return Response(
                 {'error': f'Failed to get citations: {str(e)}'}, 
@@ -348,14 +660,13 @@ class CitationListView(APIView):
 
 
 class PlagiarismListView(APIView):
-    """List plagiarism checks for a document"""
+    """List plagiarism checks for a document, streamed from ``.values()`` rows (see ``fast_json``)"""
     
     def get(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
-            plagiarism_checks = document.plagiarism_checks.all()
-            serializer = PlagiarismCheckSerializer(plagiarism_checks, many=True)
-            return Response(serializer.data)
+            rows = ValuesSerializer(PlagiarismCheckSerializer()).rows(document.plagiarism_checks.all())
+            return StreamingHttpResponse(fast_json.stream_array(rows), content_type='application/json')
         except Exception as e:
             return Response(
                 {'error': f'Failed to get plagiarism checks: {str(e)}'}, 
@@ -364,14 +675,13 @@ class PlagiarismListView(APIView):
 
 
 class ConferenceSuggestionsView(APIView):
-    """List conference suggestions for a document"""
+    """List conference suggestions for a document, streamed from ``.values()`` rows (see ``fast_json``)"""
     
     def get(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
-            suggestions = document.conference_suggestions.all()
-            serializer = ConferenceSuggestionSerializer(suggestions, many=True)
-            return Response(serializer.data)
+            rows = ValuesSerializer(ConferenceSuggestionSerializer()).rows(document.conference_suggestions.all())
+            return StreamingHttpResponse(fast_json.stream_array(rows), content_type='application/json')
         except Exception as e:
             return Response(
                 {'error': f'Failed to get conference suggestions: {str(e)}'}, 
@@ -388,35 +698,100 @@ def health_check(request):
     })
 
 
+@api_view(['GET'])
+def admission_status(request):
+    """Concurrency, queue depth and rejection counters for admission-controlled endpoints"""
+    return Response({
+        'endpoints': admission_stats(),
+        'job_queue_depth': JobQueue.depth(),
+        'timestamp': timezone.now().isoformat()
+    })
+
+
+@require_GET
+def document_events(request, document_id):
+    """Analysis progress events are only streamed by the ASGI deployment
+    (``async_views.document_events``): here an open stream would hold a
+    worker for minutes. Answers 501 pointing to job polling.
+
+    A plain Django view: DRF's content negotiation would reject
+    ``Accept: text/event-stream``.
+    """
+    get_object_or_404(Document, id=document_id)
+    job_id = request.GET.get('job')
+    return JsonResponse({
+        'error': 'Progress events are only streamed by the ASGI server; poll the job status instead',
+        'status_url': f'/api/jobs/{job_id}/' if job_id else None,
+    }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+
+@require_GET
+def export_dataset(request, dataset):
+    """Stream a dataset of analysis results as JSON Lines, CSV or Parquet (see
+    ``data_export.py``). A plain Django view: DRF claims the ``format`` query
+    parameter for its own renderers."""
+    export_format = request.GET.get('format', 'jsonl')
+    try:
+        document_id = data_export.validate(dataset, export_format, request.GET.get('document'))
+    except data_export.InvalidExport as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    response = StreamingHttpResponse(
+        data_export.stream(dataset, export_format, document_id),
+        content_type=data_export.FORMATS[export_format][0]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{data_export.filename(dataset, export_format, timezone.now())}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class ExportDocumentView(APIView):
-    """Export document results as PDF"""
+    """Export document results as PDF.
+    
+    The report is rendered into a spooled temporary file (memory up to
+    PDF_REPORT_SPOOL_BYTES, then disk) and streamed from it. Rendered
+    reports are cached on disk per results snapshot version (see
+    ``report_cache.py``), so repeat downloads are served from the file.
+    """
     
+    @admission_controlled('export')
     def get(self, request, document_id):
         try:
             document = get_object_or_404(Document, id=document_id)
+            version = snapshots.current_version(document.id)
             
-            # Get all related data
-            summaries = document.summaries.all()
-            citations = document.citations.all()
-            plagiarism_checks = document.plagiarism_checks.all()
-            conference_suggestions = document.conference_suggestions.all()
-            
-            # Generate PDF report
-            pdf_service = PDFReportService()
-            pdf_content = pdf_service.generate_document_report(
-                document=document,
-                summaries=summaries,
-                citations=citations,
-                plagiarism_checks=plagiarism_checks,
-                conference_suggestions=conference_suggestions
-            )
+            report = report_cache.open_report(document.id, PDFReportService.VERSION, version)
+            if report is None:
+                # Get all related data
+                summaries = document.summaries.all()
+                citations = document.citations.all()
+                plagiarism_checks = document.plagiarism_checks.all()
+                conference_suggestions = document.conference_suggestions.all()
+                
+                # Generate PDF report
+                report = tempfile.SpooledTemporaryFile(max_size=settings.PDF_REPORT_SPOOL_BYTES)
+                try:
+                    PDFReportService().write_document_report(
+                        report,
+                        document=document,
+                        summaries=summaries,
+                        citations=citations,
+                        plagiarism_checks=plagiarism_checks,
+                        conference_suggestions=conference_suggestions
+                    )
+                    report.seek(0)
+                    if report_cache.enabled():
+                        with report:
+                            report = report_cache.store(document.id, PDFReportService.VERSION, version, report)
+                except BaseException:
+                    report.close()
+                    raise
             
             # Create filename
             filename = f"document_report_{document.name.replace('.', '_')}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             
-            # Create HTTP response with PDF content
-            response = HttpResponse(pdf_content, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            # Streamed from the file (sendfile for cached reports when the server supports it)
+            response = FileResponse(report, as_attachment=True, filename=filename, content_type='application/pdf')
+            response['ETag'] = snapshots.etag(version)
             
             return response
             
@@ -425,3 +800,47 @@ class ExportDocumentView(APIView):
                 {'error': f'PDF export failed: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class DocumentBatchExportView(APIView):
+    """Queue a job rendering the PDF reports of many documents into one ZIP
+    archive (see ``bulk_export.py``), downloaded from the job once completed"""
+    
+    @admission_controlled('export')
+    def post(self, request):
+        try:
+            document_ids, error = _batch_document_ids(request, settings.BULK_EXPORT_MAX_DOCUMENTS)
+            if error is not None:
+                return error
+            
+            if JobQueue.is_full():
+                response = Response(
+                    {'error': 'Export queue is full, please retry later'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+                response['Retry-After'] = str(settings.ADMISSION_LIMITS['export']['retry_after'])
+                return response
+            
+            job = JobQueue.enqueue(
+                'bulk-export',
+                params={'document_ids': document_ids},
+                stages=document_ids
+            )
+            
+            return Response({
+                'message': 'Bulk export queued',
+                'job_id': str(job.id),
+                'total': len(document_ids),
+                'status': job.status,
+                'status_url': f'/api/jobs/{job.id}/',
+                'download_url': f'/api/jobs/{job.id}/download/'
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except ParseError:
+            # Malformed request body, answered with 400 by DRF
+            raise
+        except Exception as e:
+            return Response(
+                {'error': f'Bulk export failed: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,13 @@
+"""
+URL configuration used under ASGI (settings.SERVER_INTERFACE == 'asgi').
+
+Upload, summary and analysis resolve to the native async views in
+``api.async_views``; every other route is the same as ``urls.py``.
+"""
+from django.urls import path, include
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.async_urls')),
+] + wsgi_urlpatterns
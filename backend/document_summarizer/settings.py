@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import multiprocessing
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -58,7 +59,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'document_summarizer.urls'
+# 'asgi' when loaded by document_summarizer/asgi.py; the ASGI urlconf routes
+# upload, summary and analysis to native async views
+SERVER_INTERFACE = os.getenv('DJANGO_SERVER_INTERFACE', 'wsgi')
+
+ROOT_URLCONF = 'document_summarizer.asgi_urls' if SERVER_INTERFACE == 'asgi' else 'document_summarizer.urls'
 
 TEMPLATES = [
     {
@@ -130,6 +135,17 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per content under MEDIA_ROOT/blobs (api/media_store.py).
+# Text formats are compressed with MEDIA_COMPRESSION: 'zstd' (needs the zstandard
+# package, else zlib), 'zlib' or 'none'
+STORAGES = {
+    'default': {'BACKEND': 'api.media_store.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_COMPRESSION = os.getenv('MEDIA_COMPRESSION', 'zstd')
+# `manage.py collect_media` leaves blobs referenced this recently alone
+MEDIA_COLLECT_GRACE_HOURS = int(os.getenv('MEDIA_COLLECT_GRACE_HOURS', 1))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -160,6 +176,134 @@ GOOGLE_GEMINI_API_KEY = os.getenv('GOOGLE_GEMINI_API_KEY')
 COPYLEAKS_API_KEY = os.getenv('COPYLEAKS_API_KEY')
 COPYLEAKS_EMAIL = os.getenv('COPYLEAKS_EMAIL')
 
+# Conference model
+CONFERENCE_MODELS_DIR = os.getenv('CONFERENCE_MODELS_DIR', os.path.join(BASE_DIR.parent, 'Conference_models'))
+CONFERENCE_MODEL_ARTIFACTS_DIR = os.getenv(
+    'CONFERENCE_MODEL_ARTIFACTS_DIR', os.path.join(CONFERENCE_MODELS_DIR, 'artifacts')
+)
+CONFERENCE_MODEL_VERSION = os.getenv('CONFERENCE_MODEL_VERSION')  # None means LATEST
+# Memory-map artifact arrays so prefork workers share one copy through the page cache
+CONFERENCE_MODEL_MMAP = os.getenv('CONFERENCE_MODEL_MMAP', 'True').lower() == 'true'
+# Load the conference model when the WSGI application is imported (before gunicorn --preload forks)
+CONFERENCE_MODEL_PRELOAD = os.getenv('CONFERENCE_MODEL_PRELOAD', 'False').lower() == 'true'
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Document list pagination
+DOCUMENT_LIST_PAGE_SIZE = int(os.getenv('DOCUMENT_LIST_PAGE_SIZE', 50))
+DOCUMENT_LIST_MAX_PAGE_SIZE = int(os.getenv('DOCUMENT_LIST_MAX_PAGE_SIZE', 200))
+# Most documents one /api/documents/results/ request may ask for
+DOCUMENT_RESULTS_MAX_IDS = int(os.getenv('DOCUMENT_RESULTS_MAX_IDS', 100))
+
+# Full-text search (/api/search/) page sizes
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', 100))
+# Only the newest matches are ranked, which bounds the cost of very common words
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 5000))
+
+# Similar documents (/api/documents/<id>/similar/): corpora up to this size are
+# searched exactly, larger ones with an inverted-file index probing this many lists
+SIMILARITY_EXACT_MAX_DOCUMENTS = int(os.getenv('SIMILARITY_EXACT_MAX_DOCUMENTS', 50000))
+SIMILARITY_PROBES = int(os.getenv('SIMILARITY_PROBES', 16))
+SIMILARITY_MAX_RESULTS = int(os.getenv('SIMILARITY_MAX_RESULTS', 50))
+
+# Rendered PDF reports (/api/documents/<id>/export/) cached on disk, least recently
+# used evicted beyond this many bytes (0 disables the cache)
+PDF_REPORT_CACHE_DIR = os.getenv('PDF_REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'report_cache'))
+PDF_REPORT_CACHE_MAX_BYTES = int(os.getenv('PDF_REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Reports are rendered into a temporary file kept in memory up to this size
+PDF_REPORT_SPOOL_BYTES = int(os.getenv('PDF_REPORT_SPOOL_BYTES', 1024 * 1024))
+
+# Bulk report export (/api/documents/export-batch/): ZIP archives are written here
+# and deleted after BULK_EXPORT_RETENTION_HOURS; reports render on this many
+# processes (0 renders them in the job's thread)
+BULK_EXPORT_DIR = os.getenv('BULK_EXPORT_DIR', os.path.join(BASE_DIR, 'exports'))
+BULK_EXPORT_PROCESSES = int(os.getenv('BULK_EXPORT_PROCESSES', 2))
+BULK_EXPORT_MAX_DOCUMENTS = int(os.getenv('BULK_EXPORT_MAX_DOCUMENTS', 500))
+BULK_EXPORT_RETENTION_HOURS = int(os.getenv('BULK_EXPORT_RETENTION_HOURS', 24))
+
+# Result exports (/api/export/<dataset>/, manage.py export_results): rows read and
+# encoded per chunk (one Parquet row group each)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 5000))
+
+# Questions about a document (/api/documents/<id>/ask/): passage size in words,
+# passages sent to Gemini by default and at most, and longest question accepted
+ASK_PASSAGE_WORDS = int(os.getenv('ASK_PASSAGE_WORDS', 150))
+ASK_TOP_PASSAGES = int(os.getenv('ASK_TOP_PASSAGES', 4))
+ASK_MAX_TOP_PASSAGES = int(os.getenv('ASK_MAX_TOP_PASSAGES', 10))
+ASK_MAX_QUESTION_CHARS = int(os.getenv('ASK_MAX_QUESTION_CHARS', 1000))
+# Passage indexes kept loaded per process
+ASK_INDEX_CACHE_SIZE = int(os.getenv('ASK_INDEX_CACHE_SIZE', 32))
+
+# Analytics timeseries: most buckets one /api/analytics/timeseries/ request may span
+ANALYTICS_TIMESERIES_MAX_BUCKETS = int(os.getenv('ANALYTICS_TIMESERIES_MAX_BUCKETS', 1000))
+
+# Background jobs
+# Run jobs inside the request instead of in `manage.py run_job_worker` (useful for tests/dev)
+JOB_QUEUE_EAGER = os.getenv('JOB_QUEUE_EAGER', 'False').lower() == 'true'
+# Running jobs record a heartbeat at most this often (seconds); `run_job_worker`
+# requeues jobs whose heartbeat is older than --stale-after
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 30))
+# Jobs whose worker died this many times are failed instead of requeued
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+# Analysis stage executor: threads for I/O-bound stages, processes for CPU-bound ones
+STAGE_EXECUTOR_THREADS = int(os.getenv('STAGE_EXECUTOR_THREADS', 8))
+STAGE_EXECUTOR_PROCESSES = int(os.getenv('STAGE_EXECUTOR_PROCESSES', 2))  # 0 runs CPU stages on threads
+# How process pools start workers: 'forkserver' (or 'spawn' where it is unavailable).
+# 'fork' starts faster but can deadlock a child forked from a multithreaded process
+STAGE_EXECUTOR_START_METHOD = os.getenv(
+    'STAGE_EXECUTOR_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# Analysis pipeline
+PIPELINE_SEGMENT_WORDS = int(os.getenv('PIPELINE_SEGMENT_WORDS', 200))
+# Stage cache entries are deleted this many days after they were computed
+STAGE_CACHE_RETENTION_DAYS = int(os.getenv('STAGE_CACHE_RETENTION_DAYS', 30))
+
+# Admission control for expensive endpoints.
+# concurrency: requests running at once across all server processes,
+# queue: requests allowed to wait for a slot in each process,
+# timeout: seconds a request waits before 503, retry_after: Retry-After header value
+def _admission_limit(scope, concurrency, queue, timeout, retry_after):
+    prefix = f'ADMISSION_{scope.upper()}_'
+    return {
+        'concurrency': int(os.getenv(prefix + 'CONCURRENCY', concurrency)),
+        'queue': int(os.getenv(prefix + 'QUEUE', queue)),
+        'timeout': float(os.getenv(prefix + 'TIMEOUT', timeout)),
+        'retry_after': int(os.getenv(prefix + 'RETRY_AFTER', retry_after)),
+    }
+
+
+ADMISSION_LIMITS = {
+    'summary': _admission_limit('summary', concurrency=4, queue=8, timeout=10, retry_after=5),
+    'analyze': _admission_limit('analyze', concurrency=8, queue=16, timeout=5, retry_after=5),
+    'export': _admission_limit('export', concurrency=2, queue=4, timeout=15, retry_after=10),
+    'ask': _admission_limit('ask', concurrency=4, queue=8, timeout=10, retry_after=5),
+}
+# Slot lease, renewed while the request runs; a process that died frees its slots after this
+ADMISSION_LEASE_SECONDS = int(os.getenv('ADMISSION_LEASE_SECONDS', 300))
+
+# Reject new analysis requests with 429 once this many jobs are waiting (0 = unbounded)
+JOB_QUEUE_MAX_DEPTH = int(os.getenv('JOB_QUEUE_MAX_DEPTH', 500))
+
+# Under ASGI, run analysis jobs as tasks on the server's event loop instead of
+# leaving them for `manage.py run_job_worker`
+JOB_QUEUE_RUN_IN_ASGI = os.getenv('JOB_QUEUE_RUN_IN_ASGI', 'False').lower() == 'true'
+# Most jobs one ASGI process runs at once; further jobs stay queued for the workers
+JOB_QUEUE_ASGI_MAX_RUNNING = int(os.getenv('JOB_QUEUE_ASGI_MAX_RUNNING', 4))
+
+# Batch analysis: documents analyzed at once per batch job, and the largest batch accepted
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv('BATCH_ANALYSIS_CONCURRENCY', 4))
+BATCH_ANALYSIS_MAX_DOCUMENTS = int(os.getenv('BATCH_ANALYSIS_MAX_DOCUMENTS', 500))
+
+# Analysis progress event streams (SSE)
+EVENT_STREAM_POLL_INTERVAL = float(os.getenv('EVENT_STREAM_POLL_INTERVAL', 0.5))
+EVENT_STREAM_HEARTBEAT = float(os.getenv('EVENT_STREAM_HEARTBEAT', 15))
+# Streams close after this many seconds; clients reconnect with Last-Event-ID
+EVENT_STREAM_TIMEOUT = float(os.getenv('EVENT_STREAM_TIMEOUT', 300))
+EVENT_STREAM_RETRY_MS = int(os.getenv('EVENT_STREAM_RETRY_MS', 2000))
+EVENT_RETENTION_HOURS = int(os.getenv('EVENT_RETENTION_HOURS', 24))
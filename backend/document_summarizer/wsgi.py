@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_summarizer.settings')
 
 application = get_wsgi_application()
+
+# Load read-only models once in the master process so forked workers share them
+from django.conf import settings  # noqa: E402
+
+if settings.CONFERENCE_MODEL_PRELOAD:
+    from api.services import get_conference_suggestion_service  # noqa: E402
+
+    get_conference_suggestion_service()
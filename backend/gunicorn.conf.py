@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for the document summarizer backend.
+
+Usage: gunicorn -c gunicorn.conf.py document_summarizer.wsgi
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# Threads per worker (gthread workers): a request waiting for an admission
+# slot or streaming a download then holds a thread, not a whole worker
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Import the application (and the conference model, see wsgi.py) in the master
+# before forking so every worker shares the same read-only pages.
+preload_app = True
+os.environ.setdefault('CONFERENCE_MODEL_PRELOAD', 'True')
@@ -16,6 +16,9 @@ django.setup()
 
 from api.models import Document, Summary, Citation, PlagiarismCheck, ConferenceSuggestion, Analytics
 
+# Rows fetched from the database at a time
+CHUNK_SIZE = 2000
+
 def view_database():
     """View all database contents"""
     print("🗄️ DATABASE CONTENTS")
@@ -25,8 +28,8 @@ def view_database():
     print("\n📄 DOCUMENTS:")
     print("-" * 30)
     documents = Document.objects.all()
-    if documents:
-        for doc in documents:
+    if documents.exists():
+        for doc in documents.iterator(chunk_size=CHUNK_SIZE):
             print(f"ID: {doc.id}")
             print(f"Name: {doc.name}")
             print(f"File Type: {doc.file_type}")
@@ -41,9 +44,9 @@ def view_database():
     # Summaries
     print("\n📊 SUMMARIES:")
     print("-" * 30)
-    summaries = Summary.objects.all()
-    if summaries:
-        for summary in summaries:
+    summaries = Summary.objects.select_related('document')
+    if summaries.exists():
+        for summary in summaries.iterator(chunk_size=CHUNK_SIZE):
             print(f"ID: {summary.id}")
             print(f"Document: {summary.document.name if summary.document else 'No document'}")
             print(f"Content: {summary.content[:100]}...")
@@ -56,9 +59,9 @@ def view_database():
     # Citations
     print("\n📚 CITATIONS:")
     print("-" * 30)
-    citations = Citation.objects.all()
-    if citations:
-        for citation in citations:
+    citations = Citation.objects.select_related('document')
+    if citations.exists():
+        for citation in citations.iterator(chunk_size=CHUNK_SIZE):
             print(f"ID: {citation.id}")
             print(f"Document: {citation.document.name if citation.document else 'No document'}")
             print(f"Text: {citation.text[:100]}...")
@@ -72,9 +75,9 @@ def view_database():
     # Plagiarism Checks
     print("\n🔍 PLAGIARISM CHECKS:")
     print("-" * 30)
-    plagiarism_checks = PlagiarismCheck.objects.all()
-    if plagiarism_checks:
-        for check in plagiarism_checks:
+    plagiarism_checks = PlagiarismCheck.objects.select_related('document')
+    if plagiarism_checks.exists():
+        for check in plagiarism_checks.iterator(chunk_size=CHUNK_SIZE):
             print(f"ID: {check.id}")
             print(f"Document: {check.document.name if check.document else 'No document'}")
             print(f"Similarity: {check.similarity_percentage}%")
@@ -87,9 +90,9 @@ def view_database():
     # Conference Suggestions
     print("\n🎯 CONFERENCE SUGGESTIONS:")
     print("-" * 30)
-    suggestions = ConferenceSuggestion.objects.all()
-    if suggestions:
-        for suggestion in suggestions:
+    suggestions = ConferenceSuggestion.objects.select_related('document')
+    if suggestions.exists():
+        for suggestion in suggestions.iterator(chunk_size=CHUNK_SIZE):
             print(f"ID: {suggestion.id}")
             print(f"Document: {suggestion.document.name if suggestion.document else 'No document'}")
             print(f"Conference: {suggestion.conference_name}")